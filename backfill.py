@@ -0,0 +1,173 @@
+"""
+Rebuild the deposits store from the intermediary wallets' on-chain history.
+
+    python backfill.py                      # every pool wallet, whole history
+    python backfill.py --since-hours 24     # just the last day
+    python backfill.py --address <USDC ATA>
+
+Each address's signatures are paged newest to oldest while the previous
+page's transactions are fetched and decoded in parallel. Transfers are
+bulk-upserted into the deposits collection, so re-running is harmless. A
+checkpoint per address records how far back the run got; an interrupted run
+resumes from there, and a finished one makes the next run stop at the
+newest signature it already covered.
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from config import get_deposits_collection, get_mongo_db, get_settings, get_wallet_pool
+from constants import BACKFILL_CONCURRENCY, BACKFILL_PAGE_SIZE
+from rpcRouter import rpc_call
+from transferDecoder import decode_transfers
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_indexes(deposits):
+    deposits.create_index([("destination", 1), ("block_time", -1)])
+    deposits.create_index("source")
+    deposits.create_index("memo", sparse=True)
+
+
+def deposit_documents(transfers, slot):
+    """One document per transfer, keyed by signature and position so upserts are idempotent."""
+    return [
+        {
+            "_id": f"{t.signature}:{n}",
+            "signature": t.signature,
+            "source": t.source,
+            "destination": t.destination,
+            "raw_amount": t.raw_amount,
+            "memo": t.memo,
+            "block_time": t.block_time,
+            "slot": slot,
+        }
+        for n, t in enumerate(transfers)
+    ]
+
+
+class Backfill:
+    """Backfills one intermediary USDC address, checkpointing after every page."""
+
+    def __init__(self, address, deposits, checkpoints, since_hours=None, concurrency=BACKFILL_CONCURRENCY):
+        self.address = address
+        self.deposits = deposits
+        self.checkpoints = checkpoints
+        self.since_hours = since_hours
+        self.since = None  # oldest block time covered; fixed when the run starts, kept when it resumes
+        # A partial (--since-hours) run keeps its own checkpoint so it never marks older history as covered
+        self.checkpoint_id = address if since_hours is None else f"{address}@{since_hours:g}h"
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.transfers = 0
+        self.signatures = 0
+
+    async def _page(self, before, until):
+        options = {"limit": BACKFILL_PAGE_SIZE, "commitment": "confirmed"}
+        if before:
+            options["before"] = before
+        if until:
+            options["until"] = until
+        return await rpc_call("getSignaturesForAddress", [self.address, options], hedge=False) or []
+
+    async def _decode(self, entry, mint):
+        async with self._semaphore:
+            tx_data = await rpc_call("getTransaction", [
+                entry["signature"],
+                {"encoding": "base64", "commitment": "confirmed", "maxSupportedTransactionVersion": 0},
+            ], hedge=False)
+        if not tx_data:
+            return []
+        try:
+            transfers = decode_transfers(tx_data, entry["signature"], self.address, mint)
+        except Exception as e:
+            logger.warning("Undecodable transaction", extra={"signature": entry["signature"], "error": str(e)})
+            return []
+        return deposit_documents(transfers, tx_data.get("slot"))
+
+    async def _store(self, documents):
+        if not documents:
+            return
+        from pymongo import ReplaceOne
+
+        await asyncio.to_thread(
+            self.deposits.bulk_write,
+            [ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in documents],
+            ordered=False,
+        )
+
+    async def _save_checkpoint(self, fields):
+        await asyncio.to_thread(self.checkpoints.update_one, {"_id": self.checkpoint_id}, {"$set": fields}, upsert=True)
+
+    async def run(self):
+        mint = get_settings().USDC_MINT
+        checkpoint = await asyncio.to_thread(self.checkpoints.find_one, {"_id": self.checkpoint_id}) or {}
+        until = checkpoint.get("until")  # newest signature a finished run covered
+        before = checkpoint.get("before")  # where an interrupted run stopped
+        newest = checkpoint.get("newest") if before else None
+        if self.since_hours is not None:
+            # An interrupted run keeps the window it started with, so it resumes rather than starting over
+            self.since = (before and checkpoint.get("since")) or time.time() - self.since_hours * 3600
+        if before:
+            logger.info("Resuming backfill", extra={"address": self.address, "before": before})
+
+        page = await self._page(before, until)
+        while page:
+            newest = newest or page[0]["signature"]
+            last = page[-1]
+            # Fetch the next page while this one's transactions are decoded
+            next_page = asyncio.create_task(self._page(last["signature"], until))
+            entries = [e for e in page if e.get("err") is None]
+            if self.since is not None:
+                entries = [e for e in entries if (e.get("blockTime") or 0) >= self.since]
+            try:
+                results = await asyncio.gather(*(self._decode(e, mint) for e in entries))
+                documents = [d for docs in results for d in docs]
+                await self._store(documents)
+            except BaseException:
+                next_page.cancel()
+                raise
+            self.signatures += len(page)
+            self.transfers += len(documents)
+            await self._save_checkpoint({"before": last["signature"], "newest": newest, "since": self.since,
+                                         "updated_at": time.time()})
+            logger.info("Backfilled page", extra={"address": self.address, "signatures": self.signatures,
+                                                 "transfers": self.transfers})
+            if self.since is not None and (last.get("blockTime") or 0) < self.since:
+                next_page.cancel()
+                break
+            page = await next_page
+
+        await self._save_checkpoint({"before": None, "newest": None, "since": None, "until": newest or until,
+                                     "completed_at": time.time()})
+        return self.signatures, self.transfers
+
+
+async def backfill(addresses, since_hours=None, concurrency=BACKFILL_CONCURRENCY):
+    """Backfill every address in parallel; returns {address: (signatures, transfers)}."""
+    deposits = get_deposits_collection()
+    checkpoints = get_mongo_db()["backfill_checkpoints"]
+    await asyncio.to_thread(ensure_indexes, deposits)
+    runs = [Backfill(a, deposits, checkpoints, since_hours, concurrency) for a in addresses]
+    results = await asyncio.gather(*(run.run() for run in runs))
+    return dict(zip(addresses, results))
+
+
+if __name__ == "__main__":
+    from logSetup import setup_logging
+
+    parser = argparse.ArgumentParser(description="Backfill intermediary wallet deposits into MongoDB")
+    parser.add_argument("--address", action="append", help="USDC account to backfill (default: every pool wallet)")
+    parser.add_argument("--since-hours", type=float, help="only backfill this many hours back")
+    parser.add_argument("--concurrency", type=int, default=BACKFILL_CONCURRENCY,
+                        help="getTransaction calls in flight per address")
+    args = parser.parse_args()
+
+    setup_logging()
+    addresses = args.address or [wallet.usdc_address for wallet in get_wallet_pool().wallets]
+    start = time.perf_counter()
+    totals = asyncio.run(backfill(addresses, args.since_hours or None, args.concurrency))
+    for address, (signatures, transfers) in totals.items():
+        print(f"{address}: {signatures} signatures, {transfers} transfers")
+    print(f"Done in {time.perf_counter() - start:.1f}s")
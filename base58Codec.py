@@ -0,0 +1,23 @@
+ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+INDEX = {c: i for i, c in enumerate(ALPHABET)}
+
+
+def b58decode(text):
+    """Decode base58 (Bitcoin alphabet). Raises ValueError on characters outside it."""
+    number = 0
+    for char in text:
+        try:
+            number = number * 58 + INDEX[char]
+        except KeyError:
+            raise ValueError(f"Invalid base58 character {char!r}") from None
+    body = number.to_bytes((number.bit_length() + 7) // 8, "big")
+    return b"\0" * (len(text) - len(text.lstrip("1"))) + body
+
+
+def b58encode(data):
+    number = int.from_bytes(data, "big")
+    chars = []
+    while number:
+        number, digit = divmod(number, 58)
+        chars.append(ALPHABET[digit])
+    return "1" * (len(data) - len(data.lstrip(b"\0"))) + "".join(reversed(chars))
@@ -0,0 +1,517 @@
+"""
+Local stand-ins for every upstream the bot talks to, for hermetic load tests.
+
+Each fake runs an HTTP server on an ephemeral localhost port with configurable
+latency and error injection. Solana RPC and Jito share a FakeChain so deposits
+"sent" by simulated users show up in the RPC scans and bundles land after a
+configurable delay.
+"""
+import base64
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+from constants import USDC_MINT, USDC_DECIMALS, WBTC_MINT
+
+TOKEN_PROGRAM_ID = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+
+
+class FaultConfig:
+    """Latency and error injection for one fake upstream."""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+
+    def apply(self):
+        """Sleep for the configured latency. Returns True if this request should fail."""
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay:
+            time.sleep(delay / 1000)
+        return random.random() < self.error_rate
+
+
+class FakeChain:
+    """Shared in-memory ledger of deposits and submitted bundles."""
+
+    def __init__(self, landing_delay=0.5, starting_usdc=1000000, starting_sol=1000):
+        self.landing_delay = landing_delay
+        self.starting_usdc = starting_usdc  # balance every account holds before deposits
+        self.starting_sol = starting_sol
+        self.slot = 1000
+        self.deposits = []  # newest last
+        self.deposits_by_signature = {}
+        self.bundles = {}  # bundle_id -> submitted_at
+        self._lock = threading.Lock()
+
+    def next_slot(self):
+        with self._lock:
+            self.slot += 1
+            return self.slot
+
+    def add_deposit(self, source, destination, amount):
+        """Record a USDC transferChecked from `source` to `destination` and return its signature."""
+        from solders.signature import Signature
+
+        signature = str(Signature(os.urandom(64)))
+        deposit = {
+            "signature": signature,
+            "source": source,
+            "destination": destination,
+            "amount": amount,
+            "slot": self.next_slot(),
+            "block_time": int(time.time()),
+        }
+        with self._lock:
+            self.deposits.append(deposit)
+            self.deposits_by_signature[signature] = deposit
+        return signature
+
+    def submit_bundle(self, bundle_id=None):
+        """Record a bundle; resubmitting the same bundle (e.g. to another region) keeps its first submit time."""
+        bundle_id = bundle_id or uuid.uuid4().hex
+        with self._lock:
+            self.bundles.setdefault(bundle_id, time.monotonic())
+        return bundle_id
+
+
+class UpstreamServer:
+    """Threaded HTTP server dispatching every request to a fake's `route` method."""
+
+    def __init__(self, fake, faults=None):
+        self.fake = fake
+        self.faults = faults or FaultConfig()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                parsed = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+
+                if server.faults.apply():
+                    status, payload = 503, {"error": "injected failure"}
+                else:
+                    status, payload = server.fake.route(method, parsed.path, query, body)
+
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class SolanaRpcFake:
+    """JSON-RPC subset used by the bot, backed by a FakeChain."""
+
+    def __init__(self, chain):
+        self.chain = chain
+
+    def route(self, method, path, query, body):
+        handler = getattr(self, f"rpc_{body['method']}", None)
+        if handler is None:
+            return 200, {"jsonrpc": "2.0", "id": body.get("id"),
+                         "error": {"code": -32601, "message": "Method not found"}}
+        return 200, {"jsonrpc": "2.0", "id": body.get("id"), "result": handler(body.get("params") or [])}
+
+    def _context(self):
+        return {"slot": self.chain.slot}
+
+    def rpc_getLatestBlockhash(self, params):
+        from solders.hash import Hash
+
+        return {"context": self._context(),
+                "value": {"blockhash": str(Hash.new_unique()), "lastValidBlockHeight": self.chain.slot + 150}}
+
+    def rpc_getBlockHeight(self, params):
+        return self.chain.slot
+
+    def rpc_getAccountInfo(self, params):
+        return {"context": self._context(), "value": None}
+
+    def rpc_getTokenAccountBalance(self, params):
+        raw_amount = int(round(self.chain.starting_usdc * 10 ** USDC_DECIMALS))
+        raw_amount += sum(
+            int(round(d["amount"] * 10 ** USDC_DECIMALS)) for d in self.chain.deposits if d["destination"] == params[0]
+        )
+        return {"context": self._context(),
+                "value": {"amount": str(raw_amount), "decimals": USDC_DECIMALS,
+                          "uiAmountString": str(raw_amount / 10 ** USDC_DECIMALS)}}
+
+    def rpc_getBalance(self, params):
+        return {"context": self._context(), "value": self.chain.starting_sol * 10 ** 9}
+
+    def rpc_getSignaturesForAddress(self, params):
+        address = params[0]
+        options = params[1] if len(params) > 1 else {}
+        limit = options.get("limit", 1000)
+        matches = []
+        started = "before" not in options
+        for d in reversed(self.chain.deposits):
+            if d["destination"] != address:
+                continue
+            if not started:
+                started = d["signature"] == options["before"]
+                continue
+            if d["signature"] == options.get("until") or len(matches) >= limit:
+                break
+            matches.append(d)
+        return [
+            {"signature": d["signature"], "slot": d["slot"], "err": None, "memo": None,
+             "blockTime": d["block_time"], "confirmationStatus": "confirmed"}
+            for d in matches
+        ]
+
+    def rpc_getTransaction(self, params):
+        from solders.pubkey import Pubkey
+        from spl.token.instructions import TransferCheckedParams, transfer_checked
+
+        deposit = self.chain.deposits_by_signature.get(params[0])
+        if deposit is None:
+            return None
+        source = Pubkey.from_string(deposit["source"])
+        instruction = transfer_checked(TransferCheckedParams(
+            program_id=Pubkey.from_string(TOKEN_PROGRAM_ID),
+            source=source,
+            mint=Pubkey.from_string(USDC_MINT),
+            dest=Pubkey.from_string(deposit["destination"]),
+            owner=source,
+            amount=int(round(deposit["amount"] * 10 ** USDC_DECIMALS)),
+            decimals=USDC_DECIMALS,
+        ))
+        return encode_transaction(source, [instruction], deposit["signature"],
+                                  slot=deposit["slot"], block_time=deposit["block_time"])
+
+
+def encode_transaction(payer, instructions, signature, slot=0, block_time=None,
+                       inner_instructions=None, lookup_tables=()):
+    """
+    A getTransaction result (base64 encoding) as the RPC returns it for
+    `instructions` compiled into a v0 transaction paid by `payer`.
+
+    `inner_instructions` maps an outer instruction's index to the solders
+    Instructions it invoked; their accounts must appear in the transaction.
+    Accounts found in `lookup_tables` (AddressLookupTableAccounts) are loaded
+    from them and reported in meta.loadedAddresses.
+    """
+    from solders.hash import Hash
+    from solders.message import MessageV0
+    from solders.signature import Signature
+    from solders.transaction import VersionedTransaction
+
+    from base58Codec import b58encode
+
+    message = MessageV0.try_compile(payer, instructions, list(lookup_tables), Hash.default())
+    tables = {str(t.key): t.addresses for t in lookup_tables}
+    loaded = {"writable": [], "readonly": []}
+    for lookup in message.address_table_lookups:
+        addresses = tables[str(lookup.account_key)]
+        loaded["writable"] += [str(addresses[i]) for i in bytes(lookup.writable_indexes)]
+        loaded["readonly"] += [str(addresses[i]) for i in bytes(lookup.readonly_indexes)]
+    keys = [str(k) for k in message.account_keys] + loaded["writable"] + loaded["readonly"]
+
+    inner = [
+        {"index": index, "instructions": [
+            {
+                "programIdIndex": keys.index(str(ix.program_id)),
+                "accounts": [keys.index(str(meta.pubkey)) for meta in ix.accounts],
+                "data": b58encode(bytes(ix.data)),
+            }
+            for ix in invoked
+        ]}
+        for index, invoked in (inner_instructions or {}).items()
+    ]
+    tx = VersionedTransaction.populate(message, [Signature.from_string(signature)])
+    return {
+        "slot": slot,
+        "blockTime": block_time,
+        "meta": {"err": None, "innerInstructions": inner, "loadedAddresses": loaded},
+        "transaction": [base64.b64encode(bytes(tx)).decode(), "base64"],
+        "version": 0,
+    }
+
+
+class JupiterFake:
+    def __init__(self, btc_price_usd):
+        self.btc_price_usd = btc_price_usd
+
+    def route(self, method, path, query, body):
+        if path.endswith("/quote"):
+            out_amount = query.get("amount")
+            if query.get("outputMint") == WBTC_MINT:
+                # USDC (6 decimals) into wrapped BTC (8 decimals) at the fake price
+                out_amount = str(int(int(out_amount) * 100 / self.btc_price_usd))
+            return 200, {
+                "inputMint": query.get("inputMint"),
+                "outputMint": query.get("outputMint"),
+                "inAmount": query.get("amount"),
+                "outAmount": out_amount,
+                "slippageBps": int(query.get("slippageBps", 100)),
+                "routePlan": [],
+            }
+        if path.endswith("/swap"):
+            return 200, {"swapTransaction": self._unsigned_tx(body["userPublicKey"])}
+        return 404, {"error": "not found"}
+
+    def _unsigned_tx(self, user_public_key):
+        from solders.hash import Hash
+        from solders.message import MessageV0
+        from solders.pubkey import Pubkey
+        from solders.signature import Signature
+        from solders.system_program import TransferParams, transfer
+        from solders.transaction import VersionedTransaction
+
+        payer = Pubkey.from_string(user_public_key)
+        instruction = transfer(TransferParams(from_pubkey=payer, to_pubkey=payer, lamports=1))
+        message = MessageV0.try_compile(payer, [instruction], [], Hash.new_unique())
+        tx = VersionedTransaction.populate(message, [Signature.default()])
+        return base64.b64encode(bytes(tx)).decode()
+
+
+class ChangeNowFake:
+    def __init__(self, btc_price_usd, min_amount=2):
+        self.btc_price_usd = btc_price_usd
+        self.min_amount = min_amount
+        self.exchanges = {}
+
+    def route(self, method, path, query, body):
+        if path.endswith("/exchange/min-amount"):
+            return 200, {"minAmount": self.min_amount}
+        if path.endswith("/exchange/estimated-amount"):
+            from_amount = float(query.get("fromAmount", 0))
+            return 200, {"toAmount": from_amount / self.btc_price_usd}
+        if path.endswith("/exchange/by-id"):
+            exchange = self.exchanges.get(query.get("id"))
+            return (200, exchange) if exchange else (404, {"error": "not found"})
+        if path.endswith("/exchange") and method == "POST":
+            from solders.keypair import Keypair
+
+            tx_id = uuid.uuid4().hex[:14]
+            exchange = {
+                "id": tx_id,
+                "status": "waiting",
+                "fromCurrency": body["fromCurrency"],
+                "toCurrency": body["toCurrency"],
+                "fromNetwork": body["fromNetwork"],
+                "toNetwork": body["toNetwork"],
+                "amountFrom": body["fromAmount"],
+                "amountTo": float(body["fromAmount"]) / self.btc_price_usd,
+                "toAmount": float(body["fromAmount"]) / self.btc_price_usd,
+                "payinAddress": str(Keypair().pubkey()),
+                "payoutAddress": body["address"],
+                "createdAt": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+            }
+            self.exchanges[tx_id] = exchange
+            return 200, exchange
+        return 404, {"error": "not found"}
+
+
+class CoinGeckoFake:
+    def __init__(self, btc_price_usd):
+        self.btc_price_usd = btc_price_usd
+
+    def route(self, method, path, query, body):
+        if path.endswith("/simple/price"):
+            return 200, {"bitcoin": {"usd": self.btc_price_usd}}
+        return 404, {"error": "not found"}
+
+
+class JitoFake:
+    """Jito block engine bundles JSON-RPC endpoint."""
+
+    def __init__(self, chain):
+        self.chain = chain
+
+    def route(self, method, path, query, body):
+        if not path.endswith("/api/v1/bundles"):
+            return 404, {"error": "not found"}
+        rpc_id = body.get("id")
+        if body["method"] == "sendBundle":
+            # Like Jito, the bundle id is derived from its transactions, so it is the same in every region
+            bundle_id = hashlib.sha256("".join(body["params"][0]).encode()).hexdigest()
+            return 200, {"jsonrpc": "2.0", "id": rpc_id, "result": self.chain.submit_bundle(bundle_id)}
+        if body["method"] == "simulateBundle":
+            return 200, {"jsonrpc": "2.0", "id": rpc_id, "result": {
+                "context": {"slot": self.chain.slot},
+                "value": {"summary": "succeeded", "transactionResults": [
+                    {"err": None, "logs": [], "unitsConsumed": 30000}
+                    for _ in body["params"][0]["encodedTransactions"]
+                ]},
+            }}
+        if body["method"] == "getBundleStatuses":
+            statuses = []
+            for bundle_id in body["params"][0]:
+                submitted_at = self.chain.bundles.get(bundle_id)
+                if submitted_at is not None and time.monotonic() - submitted_at >= self.chain.landing_delay:
+                    statuses.append({
+                        "bundle_id": bundle_id,
+                        "transactions": [],
+                        "slot": self.chain.next_slot(),
+                        "confirmation_status": "finalized",
+                        "err": {"Ok": None},
+                    })
+            return 200, {"jsonrpc": "2.0", "id": rpc_id,
+                         "result": {"context": {"slot": self.chain.slot}, "value": statuses}}
+        return 200, {"jsonrpc": "2.0", "id": rpc_id, "error": {"code": -32601, "message": "Method not found"}}
+
+
+class FakeSearcherClient:
+    """Stands in for the Jito gRPC searcher client by forwarding SendBundle to the fake's JSON-RPC endpoint."""
+
+    def __init__(self, jito_url):
+        self.bundles_url = f"{jito_url}/api/v1/bundles"
+
+    def SendBundle(self, request):
+        encoded = [base64.b64encode(packet.data).decode() for packet in request.bundle.packets]
+        response = requests.post(self.bundles_url, json={
+            "jsonrpc": "2.0", "id": 1, "method": "sendBundle", "params": [encoded, {"encoding": "base64"}],
+        }, timeout=10)
+        response.raise_for_status()
+        return SimpleNamespace(uuid=response.json()["result"])
+
+
+class FakeCollection:
+    """
+    Minimal in-memory stand-in for a pymongo collection.
+
+    Supports equality filters (including membership in array fields), the
+    $set / $push / $inc update operators the bot uses, and bulk_write of
+    UpdateOne requests (counted as one operation).
+    """
+
+    def __init__(self):
+        self.docs = {}
+        self._lock = threading.Lock()
+        self.operations = 0
+
+    @staticmethod
+    def _matches(doc, filter):
+        for key, expected in filter.items():
+            value = doc
+            for part in key.split("."):
+                value = value.get(part) if isinstance(value, dict) else None
+            if isinstance(expected, dict) and "$in" in expected:
+                if value not in expected["$in"]:
+                    return False
+            elif isinstance(value, list) and not isinstance(expected, list):
+                if expected not in value:
+                    return False
+            elif value != expected:
+                return False
+        return True
+
+    @staticmethod
+    def _project(doc, projection):
+        if not projection:
+            return dict(doc)
+        fields = [k for k, v in projection.items() if v]
+        return {k: doc[k] for k in ["_id", *fields] if k in doc}
+
+    def _find(self, filter):
+        if "_id" in filter and not isinstance(filter["_id"], dict):
+            doc = self.docs.get(filter["_id"])
+            return [doc] if doc is not None and self._matches(doc, filter) else []
+        return [doc for doc in self.docs.values() if self._matches(doc, filter)]
+
+    def find_one(self, filter=None, projection=None):
+        with self._lock:
+            self.operations += 1
+            found = self._find(filter or {})
+            return self._project(found[0], projection) if found else None
+
+    def find(self, filter=None, projection=None):
+        with self._lock:
+            self.operations += 1
+            return [self._project(doc, projection) for doc in self._find(filter or {})]
+
+    def insert_one(self, doc):
+        with self._lock:
+            self.operations += 1
+            doc = dict(doc)
+            doc.setdefault("_id", uuid.uuid4().hex)
+            self.docs[doc["_id"]] = doc
+            return SimpleNamespace(inserted_id=doc["_id"])
+
+    def _apply(self, doc, update):
+        for key, value in update.get("$set", {}).items():
+            doc[key] = value
+        for key, value in update.get("$setOnInsert", {}).items():
+            doc.setdefault(key, value)
+        for key, value in update.get("$inc", {}).items():
+            doc[key] = doc.get(key, 0) + value
+        for key, value in update.get("$push", {}).items():
+            if isinstance(value, dict) and "$each" in value:
+                doc.setdefault(key, []).extend(value["$each"])
+            else:
+                doc.setdefault(key, []).append(value)
+
+    def update_one(self, filter, update, upsert=False):
+        with self._lock:
+            self.operations += 1
+        return self._update(filter, update, upsert)
+
+    def _update(self, filter, update, upsert):
+        with self._lock:
+            found = self._find(filter)
+            if found:
+                self._apply(found[0], update)
+                return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+            if not upsert:
+                return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+            doc = {k: v for k, v in filter.items() if not isinstance(v, dict)}
+            doc.setdefault("_id", uuid.uuid4().hex)
+            self._apply(doc, update)
+            self.docs[doc["_id"]] = doc
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=doc["_id"])
+
+    def bulk_write(self, requests, ordered=True):
+        with self._lock:
+            self.operations += 1
+        for request in requests:
+            self._update(request._filter, request._doc, request._upsert)
+        return SimpleNamespace(matched_count=len(requests), modified_count=len(requests))
+
+    def update_many(self, filter, update):
+        with self._lock:
+            self.operations += 1
+            found = self._find(filter)
+            for doc in found:
+                self._apply(doc, update)
+            return SimpleNamespace(matched_count=len(found), modified_count=len(found))
+
+    def create_index(self, *args, **kwargs):
+        return None
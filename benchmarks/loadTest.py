@@ -0,0 +1,237 @@
+"""
+Hermetic load test: drives N simulated users through /swap -> confirm -> process_swap
+against local stand-ins for every upstream and reports throughput, per-stage
+latency percentiles and event-loop lag.
+
+Run from the repository root:
+
+    python -m benchmarks.loadTest --users 200 --latency-ms 30 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+from benchmarks.fakeUpstreams import (
+    ChangeNowFake,
+    CoinGeckoFake,
+    FakeChain,
+    FakeCollection,
+    FakeSearcherClient,
+    FaultConfig,
+    JitoFake,
+    JupiterFake,
+    SolanaRpcFake,
+    UpstreamServer,
+)
+
+BTC_PRICE_USD = 65000.0
+TARGET_TOKEN_MINT = "8Ki8DpuWNxu9VsS3kQbarsCWMcFGWkzzA8pD5to9zBd5"
+
+
+class FakeMessage:
+    """Records replies and edits instead of talking to Telegram."""
+
+    def __init__(self, chat_id, text=""):
+        self.chat = SimpleNamespace(id=chat_id)
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        reply = FakeMessage(self.chat.id, text)
+        self.replies.append(reply)
+        return reply
+
+    async def edit_text(self, text, **kwargs):
+        self.text = text
+        return self
+
+    async def edit_reply_markup(self, reply_markup=None):
+        return self
+
+
+class FakeCallbackQuery:
+    def __init__(self, user, message, data):
+        self.from_user = user
+        self.message = message
+        self.data = data
+
+    async def answer(self, text=None):
+        return True
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def start_upstreams(args):
+    faults = FaultConfig(args.latency_ms, args.jitter_ms, args.error_rate)
+    chain = FakeChain(landing_delay=args.landing_delay)
+    servers = {
+        "jupiter": UpstreamServer(JupiterFake(BTC_PRICE_USD), faults).start(),
+        "changenow": UpstreamServer(ChangeNowFake(BTC_PRICE_USD), faults).start(),
+        "coingecko": UpstreamServer(CoinGeckoFake(BTC_PRICE_USD), faults).start(),
+    }
+    # Several RPC providers and one block engine stand-in per region, all sharing the same chain
+    for endpoint in range(args.rpc_endpoints):
+        servers[f"rpc{endpoint}"] = UpstreamServer(SolanaRpcFake(chain), faults).start()
+    for region in range(args.regions):
+        servers[f"jito{region}"] = UpstreamServer(JitoFake(chain), faults).start()
+    return chain, servers
+
+
+def configure_environment(servers, wallets=1):
+    """Point the bot's settings at the fakes. Must run before settings are first read."""
+    from solders.keypair import Keypair
+
+    os.environ.update({
+        "CHANGE_NOW_API_BASE": f"{servers['changenow'].url}/v2",
+        "JUPITER_API_BASE": f"{servers['jupiter'].url}/v6",
+        "COINGECKO_API_BASE": f"{servers['coingecko'].url}/api/v3",
+        "PRIVATE_KEY": str(Keypair()),
+        "SOLANA_RPC_URLS": ",".join(s.url for name, s in servers.items() if name.startswith("rpc")),
+        "BLOCK_ENGINE_URLS": ",".join(s.url for name, s in servers.items() if name.startswith("jito")),
+        "BUNDLE_SIMULATION_URL": f"{servers['jito0'].url}/api/v1/bundles",
+        "CHANGE_NOW_API_KEY": "load-test",
+        "TARGET_TOKEN_MINT_ADDRESS": TARGET_TOKEN_MINT,
+        "INTERMEDIARY_PRIVATE_KEYS": ",".join(str(Keypair()) for _ in range(wallets)),
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+    })
+
+
+async def simulate_user(index, args, bot, chain, users):
+    """One user: register, /swap <amount>, press Confirm, send the deposit, wait for the result."""
+    from solders.keypair import Keypair
+    from solders.pubkey import Pubkey
+    from spl.token.instructions import get_associated_token_address
+    from config import get_settings
+    from verifyDeposit import deposit_index
+
+    user_id = 100000 + index
+    wallet = Keypair().pubkey()
+    users.insert_one({"_id": user_id, "sol_wallet": str(wallet), "btc_address": "bc1qloadtest0000000000000000000000000000"})
+    user = SimpleNamespace(id=user_id)
+    chat_message = FakeMessage(user_id)
+
+    start = time.perf_counter()
+    context = SimpleNamespace(args=[str(args.amount)], user_data={})
+    await bot.swap(SimpleNamespace(effective_user=user, message=chat_message, callback_query=None), context)
+
+    async def send_deposit():
+        await asyncio.sleep(args.deposit_delay)
+        settings = get_settings()
+        source = str(get_associated_token_address(wallet, Pubkey.from_string(settings.USDC_MINT)))
+        # Send the exact reference amount the bot asked this user for
+        pending = next(iter(deposit_index.by_source.get(source, {}).values()), None)
+        if pending is not None:
+            chain.add_deposit(source, pending.deposit_address, pending.reference_amount)
+
+    deposit_task = asyncio.create_task(send_deposit())
+    preview = chat_message.replies[-1] if chat_message.replies else FakeMessage(user_id)
+    query = FakeCallbackQuery(user, preview, f"confirm_swap_{args.amount}")
+    await bot.button_callback(SimpleNamespace(effective_user=user, callback_query=query, effective_message=preview), context)
+    await deposit_task
+
+    progress = preview.replies[-1] if preview.replies else preview
+    ok = progress.text.startswith("✅ Swap initiated")
+    return ok, time.perf_counter() - start
+
+
+async def monitor_loop_lag(samples, stop, interval=0.05):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - started - interval)
+
+
+async def run(args, chain):
+    import main as bot
+    import config
+    import metrics
+    import verifyDeposit
+
+    users = FakeCollection()
+    config.override("users_collection", users)
+    config.override("fees_collection", FakeCollection())
+    config.override("jito_clients", {
+        url: FakeSearcherClient(url) for url in config.get_settings().block_engine_urls()
+    })
+    verifyDeposit.CHECK_INTERVAL_SECONDS = args.check_interval
+
+    stage_samples = {}
+    metrics.add_stage_listener(lambda stage, seconds, ok: stage_samples.setdefault(stage, []).append(seconds))
+
+    lag_samples = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(monitor_loop_lag(lag_samples, stop))
+
+    start = time.perf_counter()
+    semaphore = asyncio.Semaphore(args.concurrency or args.users)
+
+    async def limited(index):
+        async with semaphore:
+            return await simulate_user(index, args, bot, chain, users)
+
+    results = await asyncio.gather(*(limited(i) for i in range(args.users)), return_exceptions=True)
+    await config.get_users_writes().flush()
+    await config.get_fees_writes().flush()
+    wall = time.perf_counter() - start
+    stop.set()
+    await lag_task
+
+    succeeded = [r for r in results if isinstance(r, tuple) and r[0]]
+    errors = [r for r in results if isinstance(r, BaseException)]
+    end_to_end = [r[1] for r in results if isinstance(r, tuple)]
+
+    print(f"\n=== Load Test: {args.users} users, concurrency {args.concurrency or args.users} ===")
+    print(f"Upstream latency {args.latency_ms}ms (+{args.jitter_ms}ms jitter), error rate {args.error_rate:.1%}")
+    print(f"Succeeded: {len(succeeded)}/{args.users}   Exceptions: {len(errors)}")
+    print(f"Wall time: {wall:.2f}s   Throughput: {len(succeeded) / wall:.2f} swaps/s")
+    print(f"Mongo operations: {users.operations}")
+    print(f"\n{'stage':<22}{'count':>7}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for stage, samples in [*stage_samples.items(), ("end_to_end", end_to_end)]:
+        print(f"{stage:<22}{len(samples):>7}{percentile(samples, 0.5) * 1000:>10.1f}"
+              f"{percentile(samples, 0.99) * 1000:>10.1f}{max(samples, default=0) * 1000:>10.1f}")
+    print(f"\nEvent loop lag: p50 {percentile(lag_samples, 0.5) * 1000:.1f}ms  "
+          f"p99 {percentile(lag_samples, 0.99) * 1000:.1f}ms  max {max(lag_samples, default=0) * 1000:.1f}ms")
+    for error in errors[:5]:
+        print(f"Exception: {error!r}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Hermetic load test for the swap pipeline")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=0, help="max users in flight (default: all)")
+    parser.add_argument("--amount", type=float, default=100.0)
+    parser.add_argument("--wallets", type=int, default=1, help="size of the intermediary wallet pool")
+    parser.add_argument("--regions", type=int, default=1, help="block engine regions bundles are fanned out to")
+    parser.add_argument("--rpc-endpoints", type=int, default=1, help="Solana RPC endpoints the router balances across")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--deposit-delay", type=float, default=0.5, help="seconds before a user's deposit lands")
+    parser.add_argument("--landing-delay", type=float, default=0.5, help="seconds before a bundle is finalized")
+    parser.add_argument("--check-interval", type=float, default=0.25, help="deposit scan interval in seconds")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    chain, servers = start_upstreams(args)
+    configure_environment(servers, args.wallets)
+
+    from logSetup import setup_logging
+    setup_logging()
+    try:
+        asyncio.run(run(args, chain))
+    finally:
+        for server in servers.values():
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,25 @@
-import os
-from solana.rpc.api import Client
-from solana.rpc.commitment import Processed
+import logging
 from solders.transaction import VersionedTransaction
-from solders.system_program import TransferParams, transfer
+from typing import List, Optional
 from solders.keypair import Keypair
-from dotenv import load_dotenv
-from typing import List
-from jito_searcher_client.generated.bundle_pb2 import Bundle
-from jito_searcher_client.generated.searcher_pb2 import SendBundleRequest
-from jito_searcher_client.searcher import get_searcher_client
-from solders.pubkey import Pubkey
-from jito_searcher_client.generated.packet_pb2 import Packet
-from solders.message import MessageV0
-from time import sleep
+import asyncio
+import time
+from urllib.parse import urlparse
 from enum import Enum
 import requests
-
-# Constants for tip accounts
-TIP_ACCOUNTS = [
-    "96gYZGLnJYVFmbjzopPSU6QiEV5fGqZNyN9nmNhvrZU5",
-    "HFqU5x63VTqvQss8hp11i4wVV8bD44PvwucfZ2bU7gRe", 
-    "Cw8CFyM9FkoMi7K7Crf6HNQqf4uEMzpKw6QNghXLvLkY",
-    "ADaUMid9yfUytqMBgopwjb2DTLSokTSzL1zt6iGPaS49",
-    "DfXygSm4jCyNCybVYYK6DwvWqjKee8pbDmJGcLWNDXjh",
-    "ADuUkR4vqLUMWXxW9gh6D6L8pMSawimctcNZ5pGwDcEt",
-    "DttWaMuVvTiduZRnguLF7jNxTgiMBZ1hyAumKUiL2KRL",
-    "3AVi9Tg9Uo68tJfuvoKvqKNWKkC5wPdSSdeBnizKZ6jT"
-]
+import metrics
+from metrics import track_stage
+from circuitBreaker import ahttp_request, get_breaker, CircuitOpenError, BulkheadFullError, JITO
+from config import get_jito_clients, get_keypair, get_settings
+from rpcRouter import rpc_call
+from solders.hash import Hash
+from constants import REGION_LATENCY_ALPHA
+from bundleSimulation import simulate_bundle
+from bundleBuilder import compile_transaction
 
 MINIMUM_TIP = 1000  # Minimum tip in lamports
 
-load_dotenv()
-
-# Load and validate environment variables
-def validate_env_variables():
-    print("Validating environment variables...")
-    required_vars = ["PRIVATE_KEY", "BLOCK_ENGINE_URL", "SOLANA_RPC_URL"]
-    for var in required_vars:
-        if not os.getenv(var):
-            raise ValueError(f"Missing required environment variable: {var}")
-    print("\u2713 All required environment variables found")
-
-validate_env_variables()
-
-PRIVATE_KEY = os.getenv("PRIVATE_KEY")
-BLOCK_ENGINE_URL = os.getenv("BLOCK_ENGINE_URL")
-RPC_URL = os.getenv("SOLANA_RPC_URL")
-SENDER_KEYPAIR = Keypair.from_base58_string(PRIVATE_KEY)
-
-def get_random_tip_account() -> Pubkey:
-    """Returns a random tip account from the list of valid tip accounts."""
-    import random
-    tip_account = random.choice(TIP_ACCOUNTS)
-    return Pubkey.from_string(tip_account)
+logger = logging.getLogger(__name__)
 
 class BundleStatus(Enum):
     INVALID = "Invalid"  # Bundle ID not in system (5 minute look back)
@@ -60,106 +27,218 @@ class BundleStatus(Enum):
     FAILED = "Failed"   # All regions marked as failed, not forwarded
     LANDED = "Landed"   # Landed on-chain
 
-def check_bundle_status(jito_client, bundle_id: str, max_retries: int = 30, retry_delay: float = 1.0):
+def bundles_url(block_engine_url: str) -> str:
+    """JSON-RPC bundles endpoint of a block engine (matches the TypeScript implementation URL format)."""
+    base_url = block_engine_url.rstrip('/')  # Remove any trailing slashes
+    if not base_url.startswith(("http://", "https://")):
+        base_url = f"https://{base_url}"
+    return f"{base_url}/api/v1/bundles"
+
+
+def region_name(block_engine_url: str) -> str:
+    return urlparse(bundles_url(block_engine_url)).netloc
+
+
+class RegionStats:
+    """Acceptance latency and landing rate of one block engine region, for ranking regions."""
+
+    def __init__(self, region):
+        self.region = region
+        self.submitted = 0
+        self.accepted = 0
+        self.landed = 0  # bundles whose landing this region reported first
+        self.accept_seconds = None  # moving average of SendBundle latency
+
+    def record_submission(self, accepted, seconds=None):
+        self.submitted += 1
+        if accepted:
+            self.accepted += 1
+            if self.accept_seconds is None:
+                self.accept_seconds = seconds
+            else:
+                self.accept_seconds += REGION_LATENCY_ALPHA * (seconds - self.accept_seconds)
+        metrics.JITO_REGION_BUNDLES_TOTAL.labels(self.region, "accepted" if accepted else "rejected").inc()
+        if seconds is not None:
+            metrics.JITO_REGION_ACCEPT_SECONDS.labels(self.region).observe(seconds)
+
+    def record_landed(self):
+        self.landed += 1
+        metrics.JITO_REGION_BUNDLES_TOTAL.labels(self.region, "landed").inc()
+
+    @property
+    def landing_rate(self):
+        return self.landed / self.accepted if self.accepted else 0.0
+
+    def snapshot(self):
+        return {
+            "region": self.region,
+            "submitted": self.submitted,
+            "accepted": self.accepted,
+            "landed": self.landed,
+            "landing_rate": self.landing_rate,
+            "accept_seconds": self.accept_seconds,
+        }
+
+
+_region_stats = {}
+
+
+def get_region_stats(region: str) -> RegionStats:
+    stats = _region_stats.get(region)
+    if stats is None:
+        stats = _region_stats[region] = RegionStats(region)
+    return stats
+
+
+def region_rankings():
+    """Regions best first: highest landing rate, then fastest acceptance."""
+    ranked = sorted(
+        _region_stats.values(),
+        key=lambda s: (-s.landing_rate, s.accept_seconds if s.accept_seconds is not None else float("inf")),
+    )
+    return [s.snapshot() for s in ranked]
+
+
+def _status_from_info(bundle_info):
+    # Map the confirmation_status to our BundleStatus enum
+    confirmation_status = bundle_info.get("confirmation_status", "").upper()
+    if confirmation_status == "FINALIZED":
+        return BundleStatus.LANDED
+    if confirmation_status == "PROCESSED" or confirmation_status == "CONFIRMED":
+        return BundleStatus.PENDING
+    if bundle_info.get("err"):
+        return BundleStatus.FAILED
+    return BundleStatus.INVALID
+
+
+async def fetch_bundle_status(block_engine_url: str, bundle_id: str):
     """
-    Checks the status of a bundle using getBundleStatuses.
+    One getBundleStatuses call against one region.
+
+    Returns:
+        tuple: (status: Optional[BundleStatus], landed_slot: Optional[int]); status is None while the
+        region does not know the bundle yet
+    """
+    region = region_name(block_engine_url)
+    payload = {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "getBundleStatuses",
+        "params": [[bundle_id]]
+    }
+    response = await ahttp_request(
+        f"{JITO}:{region}", "POST", bundles_url(block_engine_url),
+        headers={"Content-Type": "application/json"}, json=payload, timeout=5,
+    )
+    response.raise_for_status()
+
+    result = response.json()
+    logger.debug("Bundle status response: %s", result)
+    if "error" in result:
+        logger.warning("Bundle status error from server: %s", result["error"], extra={"region": region})
+        return None, None
+    if not result.get("result", {}).get("value"):
+        return None, None
+
+    bundle_info = result["result"]["value"][0]
+    return _status_from_info(bundle_info), bundle_info.get("slot")
+
+
+async def check_bundle_status(bundle_id: str, block_engine_urls: Optional[List[str]] = None,
+                              max_retries: int = 30, retry_delay: float = 1.0):
+    """
+    Tracks a bundle submitted to one or more block engine regions using getBundleStatuses.
+
+    Every attempt polls all regions in parallel. The first region to report
+    the bundle landed wins (and is credited with the landing); the bundle has
+    failed only once every region reports a final non-landed status. While no
+    region is reachable, polling goes on until `max_retries` is used up.
     
     Args:
-        jito_client: The initialized Jito client (used only to get the URL)
         bundle_id: The bundle ID to check
+        block_engine_urls: Regions the bundle was accepted by (default: all configured regions)
         max_retries: Maximum number of status check attempts
         retry_delay: Delay between retries in seconds
         
     Returns:
         tuple: (status: BundleStatus, landed_slot: Optional[int])
     """
-    print(f"\n=== Checking Bundle Status: {bundle_id} ===")
-    
-    # Match the TypeScript implementation URL format
-    base_url = BLOCK_ENGINE_URL.rstrip('/')  # Remove any trailing slashes
-    json_rpc_url = f"https://{base_url}/api/v1/bundles"  # Base URL without path
-    
-    print(f"Checking bundle status at: {json_rpc_url}")
-    
-    headers = {
-        "Content-Type": "application/json",
-    }
+    block_engine_urls = block_engine_urls or get_settings().block_engine_urls()
+    logger.info("Checking bundle status", extra={"bundle_id": bundle_id, "regions": len(block_engine_urls)})
     
     for attempt in range(max_retries):
+        polls = {asyncio.create_task(fetch_bundle_status(url, bundle_id)): url for url in block_engine_urls}
+        pending = set(polls)
+        statuses = []
+        unavailable = 0
         try:
-            # Create JSON-RPC request payload
-            payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "getBundleStatuses",
-                "params": [[bundle_id]]
-            }
-            
-            response = requests.post(json_rpc_url, headers=headers, json=payload, timeout=5)
-            response.raise_for_status()
-            
-            result = response.json()
-            print(f"Response: {result}")
-            
-            if "error" in result:
-                print(f"Error from server: {result['error']}")
-                sleep(retry_delay)
-                continue
-            
-            # Check if we have a valid result structure
-            if not result.get("result", {}).get("value"):
-                print(f"Attempt {attempt + 1}/{max_retries}: Bundle status not found, retrying...")
-                sleep(retry_delay)
-                continue
-            
-            bundle_info = result["result"]["value"][0]
-            print(f"Bundle info: {bundle_info}")
-            
-            # Map the confirmation_status to our BundleStatus enum
-            confirmation_status = bundle_info.get("confirmation_status", "").upper()
-            if confirmation_status == "FINALIZED":
-                status = BundleStatus.LANDED
-            elif confirmation_status == "PROCESSED" or confirmation_status == "CONFIRMED":
-                status = BundleStatus.PENDING
-            elif bundle_info.get("err"):
-                status = BundleStatus.FAILED
-            else:
-                status = BundleStatus.INVALID
-            
-            landed_slot = bundle_info.get("slot")
-            
-            status_msg = f"Status: {status.value}"
-            if landed_slot:
-                status_msg += f", Slot: {landed_slot}"
-            print(f"\u2713 {status_msg}")
-            
-            # Return immediately if we have a final status
-            if status in [BundleStatus.LANDED, BundleStatus.FAILED]:
-                return status, landed_slot
-            
-            # For PENDING, keep checking
-            if status == BundleStatus.PENDING:
-                print(f"Bundle is pending, checking again in {retry_delay} seconds...")
-                sleep(retry_delay)
-                continue
-            
-            # For INVALID, stop checking
+            # Handle answers as they arrive, so landing is credited to the region that reported it first
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for poll in done:
+                    url = polls[poll]
+                    error = poll.exception()
+                    if isinstance(error, (CircuitOpenError, BulkheadFullError)):
+                        logger.warning("Jito block engine unavailable: %s", error, extra={"region": region_name(url)})
+                        unavailable += 1
+                        continue
+                    if isinstance(error, requests.exceptions.RequestException):
+                        logger.warning("Bundle status HTTP request error: %s", error, extra={"region": region_name(url)})
+                        continue
+                    if error is not None:
+                        logger.error("Error checking bundle status", exc_info=error, extra={"region": region_name(url)})
+                        continue
+
+                    status, landed_slot = poll.result()
+                    if status == BundleStatus.LANDED:
+                        get_region_stats(region_name(url)).record_landed()
+                        logger.debug("Bundle landed", extra={"bundle_id": bundle_id, "region": region_name(url),
+                                                             "slot": landed_slot})
+                        return status, landed_slot
+                    statuses.append(status)
+        finally:
+            for poll in pending:
+                poll.cancel()
+
+        if unavailable == len(block_engine_urls):
+            # Every region's status endpoint is down for now; keep polling until the deadline rather than give up
+            logger.warning("No block engine region reachable for bundle status",
+                           extra={"bundle_id": bundle_id, "attempt": attempt + 1})
+
+        # Return once every region has given up on the bundle
+        if len(statuses) == len(block_engine_urls) and all(
+            s in (BundleStatus.FAILED, BundleStatus.INVALID) for s in statuses
+        ):
+            status = BundleStatus.FAILED if BundleStatus.FAILED in statuses else BundleStatus.INVALID
             if status == BundleStatus.INVALID:
-                print("Bundle is invalid or expired")
-                return status, None
-            
-        except requests.exceptions.RequestException as e:
-            print(f"HTTP request error: {e}")
-            sleep(retry_delay)
-        except Exception as e:
-            print(f"Error checking bundle status: {e}")
-            print(f"Full error details: {str(e)}")
-            sleep(retry_delay)
+                logger.warning("Bundle is invalid or expired", extra={"bundle_id": bundle_id})
+            return status, None
+
+        logger.debug("Bundle not final yet, retrying", extra={"attempt": attempt + 1, "max_retries": max_retries})
+        await asyncio.sleep(retry_delay)
     
-    print(f"\u2757 Max retries ({max_retries}) reached without final status")
+    logger.warning("Max retries reached without final bundle status", extra={"bundle_id": bundle_id, "max_retries": max_retries})
     return BundleStatus.PENDING, None
 
-async def send_bundle_with_tip(signed_transactions: List[VersionedTransaction], tip_lamports: int):
+
+async def _submit_to_region(block_engine_url: str, jito_client, request):
+    """Send the bundle to one region; returns its bundle id, or None if the region did not accept it."""
+    region = region_name(block_engine_url)
+    stats = get_region_stats(region)
+    start = time.perf_counter()
+    try:
+        response = await get_breaker(f"{JITO}:{region}").acall(jito_client.SendBundle, request)
+    except Exception as e:
+        stats.record_submission(False)
+        logger.warning("Block engine rejected bundle", extra={"region": region, "error": str(e)})
+        return None
+    stats.record_submission(True, time.perf_counter() - start)
+    logger.debug("SendBundle response: %s", response, extra={"region": region})
+    return response.uuid
+
+
+async def send_bundle_with_tip(signed_transactions: List[VersionedTransaction], tip_lamports: int,
+                               tip_keypair: Optional[Keypair] = None, tip_included: bool = False):
     """
     Bundles and sends signed versioned transactions with a built-in tip.
     The tip must be at least 1000 lamports.
@@ -167,6 +246,9 @@ async def send_bundle_with_tip(signed_transactions: List[VersionedTransaction],
     Args:
         signed_transactions: List of signed transactions to bundle
         tip_lamports: Amount of lamports to tip (minimum 1000)
+        tip_keypair: Wallet paying the tip (default PRIVATE_KEY)
+        tip_included: The last transaction already carries the tip (see
+            bundleBuilder.compile_transaction), so no tip transaction is added
     
     Returns:
         tuple: (bundle_id: str, status: BundleStatus, landed_slot: Optional[int])
@@ -174,71 +256,60 @@ async def send_bundle_with_tip(signed_transactions: List[VersionedTransaction],
     if tip_lamports < MINIMUM_TIP:
         raise ValueError(f"Tip must be at least {MINIMUM_TIP} lamports")
 
-    if len(signed_transactions) > 5:
+    if len(signed_transactions) + (0 if tip_included else 1) > 5:
         raise ValueError("Maximum bundle size is 5 transactions")
 
-    print("\n=== Initializing Bundle Send Process ===")
-    print(f"Number of transactions to bundle: {len(signed_transactions)}")
-    print(f"Tip amount: {tip_lamports} lamports")
+    logger.info("Sending bundle", extra={"transactions": len(signed_transactions), "tip_lamports": tip_lamports})
 
-    print("\nInitializing clients...")
-    jito_client = get_searcher_client(BLOCK_ENGINE_URL)
-    print("\u2713 Jito client initialized")
+    # Deferred: the Jito SDK pulls in grpc and generated protobuf modules
+    from jito_searcher_client.generated.bundle_pb2 import Bundle
+    from jito_searcher_client.generated.packet_pb2 import Packet
+    from jito_searcher_client.generated.searcher_pb2 import SendBundleRequest
 
-    print("\n=== Getting Blockchain Info ===")
-    rpc_client = Client(RPC_URL)
-    blockhash = rpc_client.get_latest_blockhash().value.blockhash
-    block_height = rpc_client.get_block_height(Processed).value
-    print(f"\u2713 Latest blockhash: {blockhash}")
-    print(f"\u2713 Current block height: {block_height}")
+    jito_clients = get_jito_clients()
 
     try:
-        print("\n=== Creating Bundle ===")
-        tip_account_pubkey = get_random_tip_account()
-        
-        # Create tip instruction and transaction
-        tip_instruction = transfer(
-            TransferParams(
-                from_pubkey=SENDER_KEYPAIR.pubkey(),
-                to_pubkey=tip_account_pubkey,
-                lamports=tip_lamports
-            )
-        )
-        message = MessageV0.try_compile(
-            payer=SENDER_KEYPAIR.pubkey(),
-            instructions=[tip_instruction],
-            recent_blockhash=blockhash,
-            address_lookup_table_accounts=[]
-        )
-        tip_tx = VersionedTransaction(message, [SENDER_KEYPAIR])
-        
-        # Insert tip transaction at the beginning
-        signed_transactions.insert(0, tip_tx)
+        if not tip_included:
+            sender_keypair = tip_keypair or get_keypair()
+            latest = await rpc_call("getLatestBlockhash", [{"commitment": "confirmed"}])
+            blockhash = Hash.from_string(latest["value"]["blockhash"])
+            logger.debug("Latest blockhash %s valid until block height %s",
+                         blockhash, latest["value"]["lastValidBlockHeight"])
+
+            # Tip transaction goes last, so the tip is only paid if everything before it executes
+            tip_tx = await compile_transaction(sender_keypair, [], blockhash, tip_lamports)
+            signed_transactions.append(tip_tx)
         
-        print("\n=== Converting Transactions to Packets ===")
+        # Fail fast on a transaction that would revert instead of paying the tip and polling for it
+        with track_stage(metrics.SIMULATION):
+            await simulate_bundle(signed_transactions)
+
         packets = [Packet(data=bytes(tx)) for tx in signed_transactions]
         
-        print("\n=== Sending Bundle to Network ===")
-        response = jito_client.SendBundle(SendBundleRequest(bundle=Bundle(header=None, packets=packets)))
-        print(f"Response: {response}")
-        bundle_id = response.uuid
-        print(f"\u2713 Bundle sent successfully! Bundle ID: {bundle_id}")
+        request = SendBundleRequest(bundle=Bundle(header=None, packets=packets))
+
+        # Fan out to every region at once; the bundle id is the same everywhere and it can land only once
+        with track_stage(metrics.BUNDLE_SEND):
+            urls = list(jito_clients)
+            bundle_ids = await asyncio.gather(
+                *(_submit_to_region(url, jito_clients[url], request) for url in urls)
+            )
+        accepted = [url for url, accepted_id in zip(urls, bundle_ids) if accepted_id]
+        if not accepted:
+            raise RuntimeError("No block engine region accepted the bundle")
+        bundle_id = next(b for b in bundle_ids if b)
+        logger.info("Bundle sent", extra={"bundle_id": bundle_id, "regions": [region_name(u) for u in accepted]})
 
         # Check bundle status
-        status, landed_slot = check_bundle_status(jito_client, bundle_id)
+        with track_stage(metrics.LANDING):
+            status, landed_slot = await check_bundle_status(bundle_id, accepted)
         
         # Provide a summary based on final status
-        if status == BundleStatus.LANDED:
-            print(f"\n\u2705 Bundle successfully landed in slot {landed_slot}")
-        elif status == BundleStatus.FAILED:
-            print("\n\u274c Bundle failed to land")
-        elif status == BundleStatus.INVALID:
-            print("\n\u26a0 Bundle is invalid or expired")
-        else:  # PENDING
-            print("\n\u231b Bundle status is still pending")
+        log = logger.info if status == BundleStatus.LANDED else logger.warning
+        log("Bundle finished", extra={"bundle_id": bundle_id, "status": status.value, "slot": landed_slot})
             
         return bundle_id, status, landed_slot
 
-    except Exception as e:
-        print(f"\n\u274c ERROR: Failed to send bundle: {e}")
+    except Exception:
+        logger.exception("Failed to send bundle")
         raise
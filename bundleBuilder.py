@@ -0,0 +1,225 @@
+import asyncio
+import base64
+import logging
+import random
+import struct
+import time
+from typing import List, Optional
+
+from solders.address_lookup_table_account import AddressLookupTableAccount
+from solders.hash import Hash
+from solders.instruction import AccountMeta, Instruction
+from solders.keypair import Keypair
+from solders.message import MessageV0
+from solders.pubkey import Pubkey
+from solders.system_program import ID as SYSTEM_PROGRAM_ID, TransferParams, transfer
+from solders.transaction import VersionedTransaction
+from spl.token.constants import ASSOCIATED_TOKEN_PROGRAM_ID, TOKEN_PROGRAM_ID
+
+from bundleSimulation import COMPUTE_BUDGET_PROGRAM, simulation_cache
+from config import get_settings, get_wallet_pool
+from constants import LOOKUP_TABLE_CACHE_TTL
+from rpcRouter import rpc_call
+
+logger = logging.getLogger(__name__)
+
+# Constants for tip accounts
+TIP_ACCOUNTS = [
+    "96gYZGLnJYVFmbjzopPSU6QiEV5fGqZNyN9nmNhvrZU5",
+    "HFqU5x63VTqvQss8hp11i4wVV8bD44PvwucfZ2bU7gRe",
+    "Cw8CFyM9FkoMi7K7Crf6HNQqf4uEMzpKw6QNghXLvLkY",
+    "ADaUMid9yfUytqMBgopwjb2DTLSokTSzL1zt6iGPaS49",
+    "DfXygSm4jCyNCybVYYK6DwvWqjKee8pbDmJGcLWNDXjh",
+    "ADuUkR4vqLUMWXxW9gh6D6L8pMSawimctcNZ5pGwDcEt",
+    "DttWaMuVvTiduZRnguLF7jNxTgiMBZ1hyAumKUiL2KRL",
+    "3AVi9Tg9Uo68tJfuvoKvqKNWKkC5wPdSSdeBnizKZ6jT"
+]
+
+LOOKUP_TABLE_PROGRAM_ID = Pubkey.from_string("AddressLookupTab1e1111111111111111111111111")
+LOOKUP_TABLE_META_SIZE = 56  # bytes before the address list in a lookup table account
+MAX_ADDRESSES_PER_EXTEND = 20  # keeps each extend transaction well under the size limit
+
+
+def get_random_tip_account() -> Pubkey:
+    """Returns a random tip account from the list of valid tip accounts."""
+    tip_account = random.choice(TIP_ACCOUNTS)
+    return Pubkey.from_string(tip_account)
+
+
+def tip_instruction(payer: Pubkey, tip_lamports: int) -> Instruction:
+    """Transfer `tip_lamports` from `payer` to a random Jito tip account."""
+    return transfer(TransferParams(from_pubkey=payer, to_pubkey=get_random_tip_account(), lamports=tip_lamports))
+
+
+def fixed_accounts() -> List[Pubkey]:
+    """
+    Accounts every swap bundle touches: programs, the USDC mint, pool wallets
+    and their ATAs. Tip accounts are left out on purpose: Jito only credits
+    tips to accounts referenced directly in the transaction.
+    """
+    settings = get_settings()
+    accounts = [
+        SYSTEM_PROGRAM_ID,
+        TOKEN_PROGRAM_ID,
+        ASSOCIATED_TOKEN_PROGRAM_ID,
+        Pubkey.from_string(COMPUTE_BUDGET_PROGRAM),
+        Pubkey.from_string(settings.USDC_MINT),
+    ]
+    for wallet in get_wallet_pool().wallets:
+        accounts.append(wallet.keypair.pubkey())
+        accounts.append(Pubkey.from_string(wallet.usdc_address))
+    return list(dict.fromkeys(accounts))
+
+
+def decode_lookup_table(key: Pubkey, data: bytes) -> AddressLookupTableAccount:
+    """Decode an on-chain lookup table account (metadata header followed by 32-byte addresses)."""
+    addresses = [
+        Pubkey.from_bytes(data[offset:offset + 32])
+        for offset in range(LOOKUP_TABLE_META_SIZE, len(data) - 31, 32)
+    ]
+    return AddressLookupTableAccount(key=key, addresses=addresses)
+
+
+class LookupTableCache:
+    """
+    The lookup tables listed in ADDRESS_LOOKUP_TABLES, fetched once and kept
+    for LOOKUP_TABLE_CACHE_TTL seconds. Compiling against them replaces each
+    32-byte account key the tables hold with a one-byte index.
+    """
+
+    def __init__(self, ttl=LOOKUP_TABLE_CACHE_TTL):
+        self.ttl = ttl
+        self._tables = []
+        self._fetched_at = None
+        self._lock = asyncio.Lock()
+
+    def addresses(self):
+        configured = get_settings().ADDRESS_LOOKUP_TABLES or ""
+        return [Pubkey.from_string(a.strip()) for a in configured.split(",") if a.strip()]
+
+    async def get(self) -> List[AddressLookupTableAccount]:
+        if self._fetched_at is not None and time.monotonic() - self._fetched_at < self.ttl:
+            return self._tables
+        async with self._lock:
+            if self._fetched_at is None or time.monotonic() - self._fetched_at >= self.ttl:
+                await self._refresh()
+        return self._tables
+
+    async def _refresh(self):
+        keys = self.addresses()
+        try:
+            results = await asyncio.gather(*(
+                rpc_call("getAccountInfo", [str(key), {"encoding": "base64", "commitment": "confirmed"}])
+                for key in keys
+            ))
+        except Exception as e:
+            # Keep compiling against the last known tables (or none) rather than failing the swap
+            logger.warning("Lookup table fetch failed", extra={"error": str(e)})
+            return
+        tables = []
+        for key, result in zip(keys, results):
+            value = (result or {}).get("value")
+            if value is None:
+                logger.warning("Lookup table not found", extra={"table": str(key)})
+                continue
+            tables.append(decode_lookup_table(key, base64.b64decode(value["data"][0])))
+        self._tables = tables
+        self._fetched_at = time.monotonic()
+
+
+lookup_tables = LookupTableCache()
+
+
+async def compile_transaction(payer: Keypair, instructions: List[Instruction], blockhash: Optional[Hash],
+                              tip_lamports: Optional[int] = None, nonce=None) -> VersionedTransaction:
+    """
+    Compile and sign a v0 transaction against the cached lookup tables.
+
+    With `tip_lamports`, the Jito tip is folded into this transaction (put it
+    on the bundle's last transaction) instead of costing a transaction of its
+    own. A compute unit limit sized from earlier simulations is prepended.
+    With a noncePool.NonceLease as `nonce`, the transaction uses the durable
+    nonce instead of `blockhash` and does not expire.
+    """
+    instructions = list(instructions)
+    if tip_lamports:
+        instructions.append(tip_instruction(payer.pubkey(), tip_lamports))
+    if nonce is not None:
+        instructions.insert(0, nonce.advance_instruction())
+        blockhash = nonce.blockhash
+        nonce.signed = True
+    # Sized from the final instruction list, as simulations record the compiled transaction's shape;
+    # the nonce advance has to stay first
+    instructions.insert(1 if nonce is not None else 0, simulation_cache.compute_limit_instruction(instructions))
+    message = MessageV0.try_compile(
+        payer=payer.pubkey(),
+        instructions=instructions,
+        recent_blockhash=blockhash,
+        address_lookup_table_accounts=await lookup_tables.get(),
+    )
+    return VersionedTransaction(message, [payer])
+
+
+def _create_lookup_table_instruction(authority: Pubkey, payer: Pubkey, recent_slot: int):
+    table, bump = Pubkey.find_program_address(
+        [bytes(authority), struct.pack("<Q", recent_slot)], LOOKUP_TABLE_PROGRAM_ID
+    )
+    data = struct.pack("<IQB", 0, recent_slot, bump)
+    accounts = [
+        AccountMeta(table, is_signer=False, is_writable=True),
+        AccountMeta(authority, is_signer=True, is_writable=False),
+        AccountMeta(payer, is_signer=True, is_writable=True),
+        AccountMeta(SYSTEM_PROGRAM_ID, is_signer=False, is_writable=False),
+    ]
+    return table, Instruction(LOOKUP_TABLE_PROGRAM_ID, data, accounts)
+
+
+def _extend_lookup_table_instruction(table: Pubkey, authority: Pubkey, payer: Pubkey, addresses: List[Pubkey]):
+    data = struct.pack("<IQ", 2, len(addresses)) + b"".join(bytes(a) for a in addresses)
+    accounts = [
+        AccountMeta(table, is_signer=False, is_writable=True),
+        AccountMeta(authority, is_signer=True, is_writable=False),
+        AccountMeta(payer, is_signer=True, is_writable=True),
+        AccountMeta(SYSTEM_PROGRAM_ID, is_signer=False, is_writable=False),
+    ]
+    return Instruction(LOOKUP_TABLE_PROGRAM_ID, data, accounts)
+
+
+async def create_lookup_table(authority: Keypair) -> Pubkey:
+    """
+    Create a lookup table holding fixed_accounts(), owned and paid for by
+    `authority`. Add the returned address to ADDRESS_LOOKUP_TABLES; it can be
+    used one slot after the last extend lands.
+    """
+    async def send(instructions):
+        latest = await rpc_call("getLatestBlockhash", [{"commitment": "finalized"}])
+        message = MessageV0.try_compile(
+            payer=authority.pubkey(),
+            instructions=instructions,
+            recent_blockhash=Hash.from_string(latest["value"]["blockhash"]),
+            address_lookup_table_accounts=[],
+        )
+        tx = VersionedTransaction(message, [authority])
+        return await rpc_call("sendTransaction", [base64.b64encode(bytes(tx)).decode(), {"encoding": "base64"}])
+
+    recent_slot = await rpc_call("getSlot", [{"commitment": "finalized"}])
+    table, create_ix = _create_lookup_table_instruction(authority.pubkey(), authority.pubkey(), recent_slot)
+    await send([create_ix])
+    logger.info("Lookup table created", extra={"table": str(table)})
+
+    accounts = fixed_accounts()
+    for start in range(0, len(accounts), MAX_ADDRESSES_PER_EXTEND):
+        # Let the previous transaction land before extending again
+        await asyncio.sleep(2)
+        chunk = accounts[start:start + MAX_ADDRESSES_PER_EXTEND]
+        await send([_extend_lookup_table_instruction(table, authority.pubkey(), authority.pubkey(), chunk)])
+    logger.info("Lookup table extended", extra={"table": str(table), "addresses": len(accounts)})
+    return table
+
+
+if __name__ == "__main__":
+    from logSetup import setup_logging
+
+    setup_logging()
+    table_address = asyncio.run(create_lookup_table(get_wallet_pool().wallets[0].keypair))
+    print(f"ADDRESS_LOOKUP_TABLES={table_address}")
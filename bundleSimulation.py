@@ -0,0 +1,157 @@
+import asyncio
+import base64
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from solders.compute_budget import set_compute_unit_limit
+from solders.transaction import VersionedTransaction
+
+from circuitBreaker import ahttp_request, SOLANA_RPC
+from config import get_settings
+from constants import (
+    COMPUTE_UNIT_MARGIN,
+    DEFAULT_COMPUTE_UNIT_LIMIT,
+    SIMULATION_CACHE_SIZE,
+    SIMULATION_CACHE_TTL,
+)
+from rpcRouter import rpc_call
+
+logger = logging.getLogger(__name__)
+
+COMPUTE_BUDGET_PROGRAM = "ComputeBudget111111111111111111111111111111"
+
+
+class BundleSimulationError(Exception):
+    """Raised when a bundle transaction fails simulation, so the bundle is not sent."""
+
+    def __init__(self, message, logs=None):
+        super().__init__(message)
+        self.logs = logs or []
+
+
+def instruction_shape(instructions):
+    """Shape of a transaction being built: the programs it calls, in order."""
+    return tuple(str(ix.program_id) for ix in instructions if str(ix.program_id) != COMPUTE_BUDGET_PROGRAM)
+
+
+def transaction_shape(tx: VersionedTransaction):
+    """Shape of a compiled transaction (program ids are always static account keys)."""
+    keys = tx.message.account_keys
+    programs = (str(keys[ix.program_id_index]) for ix in tx.message.instructions)
+    return tuple(p for p in programs if p != COMPUTE_BUDGET_PROGRAM)
+
+
+class SimulationCache:
+    """
+    Recent simulation results by transaction shape.
+
+    Keeps the peak compute units seen for each shape, so transactions we build
+    ourselves can request a right-sized compute limit instead of the default.
+    """
+
+    def __init__(self, max_entries=SIMULATION_CACHE_SIZE, ttl=SIMULATION_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # shape -> (peak_units, last_error, recorded_at)
+        self._lock = threading.Lock()
+
+    def record(self, shape, units, error=None):
+        with self._lock:
+            previous = self._entries.pop(shape, None)
+            peak = units or 0
+            if previous is not None and time.time() - previous[2] < self.ttl:
+                peak = max(peak, previous[0])
+            self._entries[shape] = (peak, error, time.time())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, shape):
+        with self._lock:
+            entry = self._entries.get(shape)
+            if entry is None or time.time() - entry[2] >= self.ttl:
+                return None
+            return entry
+
+    def dump_state(self):
+        with self._lock:
+            return [[list(shape), *entry] for shape, entry in self._entries.items()]
+
+    def load_state(self, state):
+        with self._lock:
+            for shape, peak, error, recorded_at in state:
+                if time.time() - recorded_at < self.ttl:
+                    self._entries.setdefault(tuple(shape), (peak, error, recorded_at))
+
+    def compute_limit(self, shape, default=DEFAULT_COMPUTE_UNIT_LIMIT):
+        """Compute unit limit for a transaction of this shape: peak usage plus a margin, or `default`."""
+        entry = self.get(shape)
+        if entry is None or not entry[0]:
+            return default
+        return min(default, int(entry[0] * COMPUTE_UNIT_MARGIN))
+
+    def compute_limit_instruction(self, instructions, default=DEFAULT_COMPUTE_UNIT_LIMIT):
+        return set_compute_unit_limit(self.compute_limit(instruction_shape(instructions), default))
+
+
+simulation_cache = SimulationCache()
+
+
+async def _simulate_with_jito(url, encoded):
+    """Simulate the whole bundle, in order, with Jito's simulateBundle."""
+    payload = {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "simulateBundle",
+        "params": [{"encodedTransactions": encoded}, {"skipSigVerify": False, "replaceRecentBlockhash": False}],
+    }
+    response = await ahttp_request(SOLANA_RPC, "POST", url, json=payload)
+    body = response.json()
+    if "error" in body:
+        raise RuntimeError(f"simulateBundle failed: {body['error']}")
+    value = body["result"]["value"]
+    summary = value.get("summary")
+    error = None if summary == "succeeded" else summary
+    return error, value.get("transactionResults") or []
+
+
+async def _simulate_each(encoded):
+    """Simulate every transaction on its own with simulateTransaction, in parallel."""
+    options = {"encoding": "base64", "commitment": "processed", "sigVerify": True, "replaceRecentBlockhash": False}
+    results = await asyncio.gather(*(rpc_call("simulateTransaction", [tx, options]) for tx in encoded))
+    values = [result["value"] for result in results]
+    failed = next((v for v in values if v.get("err")), None)
+    return (failed["err"] if failed else None), values
+
+
+async def simulate_bundle(transactions):
+    """
+    Simulate the bundle's transactions before submission.
+
+    Uses simulateBundle on BUNDLE_SIMULATION_URL (a Jito-enabled RPC) when it
+    is set, otherwise simulates each transaction against SOLANA_RPC_URL.
+    Records compute usage per transaction shape. Raises BundleSimulationError
+    if a transaction would fail; if the simulator itself is unreachable the
+    bundle is let through, as before simulation existed.
+    """
+    encoded = [base64.b64encode(bytes(tx)).decode() for tx in transactions]
+    url = get_settings().BUNDLE_SIMULATION_URL
+    try:
+        if url:
+            error, results = await _simulate_with_jito(url, encoded)
+        else:
+            error, results = await _simulate_each(encoded)
+    except Exception as e:
+        # Breaker open, bulkhead full, RPC error or anything else: simulation is best effort
+        logger.warning("Bundle simulation unavailable, sending unsimulated", extra={"error": str(e)})
+        return
+
+    for tx, result in zip(transactions, results):
+        simulation_cache.record(transaction_shape(tx), result.get("unitsConsumed"), result.get("err"))
+
+    if error:
+        logs = next((r.get("logs") for r in results if r.get("err")), None) or []
+        logger.warning("Bundle failed simulation", extra={"error": str(error), "logs": logs[-5:]})
+        raise BundleSimulationError(f"Bundle simulation failed: {error}", logs)
+    logger.debug("Bundle simulated", extra={"units": [r.get("unitsConsumed") for r in results]})
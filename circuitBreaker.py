@@ -0,0 +1,219 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+
+import requests
+
+from constants import (
+    FAILURE_THRESHOLD,
+    RESET_TIMEOUT,
+    BULKHEAD_LIMITS,
+    BULKHEAD_WAIT_TIMEOUT,
+    REQUEST_TIMEOUT,
+)
+from metrics import track_upstream_call, count_rejected_call, export_breaker
+
+# Upstream names (keys of BULKHEAD_LIMITS)
+COINGECKO = "coingecko"
+CHANGENOW = "changenow"
+JUPITER_QUOTE = "jupiter_quote"
+JUPITER_SWAP = "jupiter_swap"
+SOLANA_RPC = "solana_rpc"
+JITO = "jito"
+
+
+class BreakerState(Enum):
+    CLOSED = "closed"        # Calls flow normally
+    OPEN = "open"            # Calls are rejected until the reset timeout passes
+    HALF_OPEN = "half_open"  # A single trial call decides whether to close again
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the upstream's breaker is open."""
+    pass
+
+
+class BulkheadFullError(Exception):
+    """Raised when an upstream has no free concurrency slot within the wait timeout."""
+    pass
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker plus bulkhead for a single upstream.
+
+    The breaker opens after `failure_threshold` consecutive failures and rejects
+    calls for `reset_timeout` seconds, after which one trial call is let through.
+    The bulkhead caps the number of concurrent in-flight calls to the upstream.
+    """
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT,
+                 max_concurrent=4, wait_timeout=BULKHEAD_WAIT_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_concurrent = max_concurrent
+        self.wait_timeout = wait_timeout
+
+        self.state = BreakerState.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.in_flight = 0
+        self.rejected = 0
+
+        self._lock = threading.Lock()
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix=f"upstream-{name}")
+        export_breaker(self)
+        self._trial_in_flight = False
+
+    def _before_call(self):
+        with self._lock:
+            if self.state == BreakerState.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"Circuit for {self.name} is open")
+                self.state = BreakerState.HALF_OPEN
+                self._trial_in_flight = False
+
+            if self.state == BreakerState.HALF_OPEN:
+                if self._trial_in_flight:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"Circuit for {self.name} is half-open, trial call in progress")
+                self._trial_in_flight = True
+
+    def _record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self.state = BreakerState.CLOSED
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def _record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if (self.state == BreakerState.HALF_OPEN
+                    or self.consecutive_failures >= self.failure_threshold):
+                self.state = BreakerState.OPEN
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def _release_slot(self, _future):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    async def acall(self, fn, *args, is_failure=None, **kwargs):
+        """
+        Run the blocking `fn(*args, **kwargs)` through the breaker and bulkhead.
+
+        A free slot is awaited on the event loop, so a call rejected by a full
+        bulkhead never takes a thread; admitted calls run on this upstream's
+        own executor, so a slow upstream cannot starve the others (or any other
+        `asyncio.to_thread` user) of the default executor.
+
+        Exceptions raised by `fn` count as failures and are re-raised. If
+        `is_failure` is given, it is called with the result to decide whether a
+        returned value (e.g. an HTTP 5xx response) should also count as one.
+        """
+        try:
+            self._before_call()
+        except CircuitOpenError:
+            count_rejected_call(self.name)
+            raise
+
+        try:
+            if self._slots.locked():
+                await asyncio.wait_for(self._slots.acquire(), self.wait_timeout)
+            else:
+                await self._slots.acquire()
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.rejected += 1
+                self._trial_in_flight = False
+            count_rejected_call(self.name)
+            raise BulkheadFullError(f"Too many concurrent calls to {self.name}") from None
+        except asyncio.CancelledError:
+            with self._lock:
+                self._trial_in_flight = False
+            raise
+
+        with self._lock:
+            self.in_flight += 1
+        future = asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        # The slot is held until the thread is done, even if the caller stops waiting for it
+        future.add_done_callback(self._release_slot)
+        with track_upstream_call(self.name) as call:
+            try:
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                with self._lock:
+                    self._trial_in_flight = False
+                call["outcome"] = "cancelled"
+                raise
+            except Exception:
+                self._record_failure()
+                raise
+
+            if is_failure is not None and is_failure(result):
+                self._record_failure()
+                call["outcome"] = "failure"
+            else:
+                self._record_success()
+                call["outcome"] = "success"
+        return result
+
+    def snapshot(self):
+        """Return the current breaker state as a plain dict."""
+        with self._lock:
+            state = self.state
+            if state == BreakerState.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                state = BreakerState.HALF_OPEN
+            return {
+                "state": state.value,
+                "consecutive_failures": self.consecutive_failures,
+                "in_flight": self.in_flight,
+                "max_concurrent": self.max_concurrent,
+                "rejected": self.rejected,
+            }
+
+
+_breakers = {
+    name: CircuitBreaker(name, max_concurrent=limit)
+    for name, limit in BULKHEAD_LIMITS.items()
+}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(upstream):
+    """
+    Return the breaker guarding the given upstream. Scoped names such as
+    "jito:<region>" get a breaker of their own with the base upstream's limit.
+    """
+    breaker = _breakers.get(upstream)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(upstream)
+            if breaker is None:
+                base = upstream.split(":", 1)[0]
+                breaker = _breakers[upstream] = CircuitBreaker(upstream, max_concurrent=BULKHEAD_LIMITS[base])
+    return breaker
+
+
+def breaker_states():
+    """Return a snapshot of every upstream's breaker state."""
+    return {name: breaker.snapshot() for name, breaker in list(_breakers.items())}
+
+
+def _is_server_error(response):
+    # 5xx and 429 mean the upstream is unhealthy or shedding load; 4xx are our own bad requests
+    return response.status_code >= 500 or response.status_code == 429
+
+
+async def ahttp_request(upstream, method, url, **kwargs):
+    """HTTP request guarded by the upstream's breaker and bulkhead, run on the upstream's own threads."""
+    kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+    return await get_breaker(upstream).acall(requests.request, method, url, is_failure=_is_server_error, **kwargs)
@@ -1,39 +1,223 @@
 from pydantic_settings import BaseSettings
-from pydantic import SecretStr, validator
+from pydantic import AliasChoices, Field, SecretStr, validator
+from typing import Optional
 import logging
+import threading
+
+from constants import (
+    CHANGE_NOW_API_BASE,
+    COINGECKO_API_BASE,
+    JUPITER_API_BASE,
+    USDC_DECIMALS,
+    USDC_MINT,
+)
 
 logger = logging.getLogger(__name__)
 
 class Settings(BaseSettings):
-    # API Keys and Secrets
-    TELEGRAM_BOT_TOKEN: SecretStr
-    CHANGE_NOW_API_KEY: SecretStr
-    PRIVATE_KEY: SecretStr
-    
+    # API Keys and Secrets (optional here so modules import without them;
+    # code that needs one calls settings.require(...))
+    TELEGRAM_BOT_TOKEN: Optional[SecretStr] = None
+    CHANGE_NOW_API_KEY: Optional[SecretStr] = None
+    PRIVATE_KEY: Optional[SecretStr] = None
+
     # Connection URLs
-    MONGO_URI: SecretStr
-    SOLANA_RPC_URL: str
-    
+    MONGO_URI: Optional[SecretStr] = None
+    MONGO_DB_NAME: str = "telegram_bot"
+    SOLANA_RPC_URL: Optional[str] = None
+    # Comma-separated RPC endpoints the router balances and hedges across; defaults to SOLANA_RPC_URL
+    SOLANA_RPC_URLS: Optional[str] = None
+    BLOCK_ENGINE_URL: Optional[str] = None
+    # Comma-separated block engine regions bundles are fanned out to; defaults to BLOCK_ENGINE_URL
+    BLOCK_ENGINE_URLS: Optional[str] = None
+    # Jito-enabled RPC used for simulateBundle; without it each transaction is simulated on SOLANA_RPC_URL
+    BUNDLE_SIMULATION_URL: Optional[str] = None
+    # Comma-separated address lookup tables to compile bundle transactions against
+    ADDRESS_LOOKUP_TABLES: Optional[str] = None
+    # Comma-separated durable nonce accounts, each with a pool wallet as its authority
+    NONCE_ACCOUNTS: Optional[str] = None
+    CHANGE_NOW_API_BASE: str = CHANGE_NOW_API_BASE
+    JUPITER_API_BASE: str = JUPITER_API_BASE
+    COINGECKO_API_BASE: str = COINGECKO_API_BASE
+
     # Wallet and Token Settings
-    INTERMEDIARY_SOL_WALLET: str
-    TARGET_TOKEN_ADDRESS: str
-    
+    # Comma-separated base58 keys of the intermediary wallet pool; defaults to PRIVATE_KEY alone
+    INTERMEDIARY_PRIVATE_KEYS: Optional[SecretStr] = None
+    TARGET_TOKEN_MINT_ADDRESS: Optional[str] = Field(
+        default=None, validation_alias=AliasChoices("TARGET_TOKEN_MINT_ADDRESS", "TARGET_TOKEN_ADDRESS")
+    )
+    USDC_MINT: str = USDC_MINT
+    USDC_DECIMALS: int = USDC_DECIMALS
+
+    # Operations
+    LOG_LEVEL: str = "INFO"
+    LOG_SAMPLE_RATE: float = 0.01
+    METRICS_PORT: int = 9108
+    RATE_LIMIT_BACKEND: str = "memory"
+    # Set when several bot processes share the Mongo conversation state, so each re-reads user_data per update
+    PERSISTENCE_SHARED: bool = False
+    # Comma-separated Telegram user ids allowed to run admin commands (/health, /profile, /looplag)
+    ADMIN_USER_IDS: Optional[str] = None
+
     @validator('TELEGRAM_BOT_TOKEN')
     def validate_telegram_token(cls, v):
+        if v is None:
+            return v
         token = v.get_secret_value()
         parts = token.split(':')
-        
+
         if len(parts) != 2:
             raise ValueError("Token must contain exactly one colon")
         if not parts[0].isdigit():
             raise ValueError("Token prefix must be numeric")
         if len(parts[1]) < 20:
             raise ValueError("Token suffix too short")
-            
+
         return v
-    
+
+    def require(self, *names):
+        """Raise if any of the given settings is unset."""
+        for name in names:
+            if getattr(self, name) is None:
+                raise ValueError(f"Missing required environment variable: {name}")
+
+    def rpc_urls(self):
+        """Solana RPC endpoints to route calls across."""
+        urls = [u.strip() for u in (self.SOLANA_RPC_URLS or "").split(",") if u.strip()]
+        if not urls:
+            self.require("SOLANA_RPC_URL")
+            urls = [self.SOLANA_RPC_URL]
+        return urls
+
+    def block_engine_urls(self):
+        """Block engine regions to submit bundles to."""
+        urls = [u.strip() for u in (self.BLOCK_ENGINE_URLS or "").split(",") if u.strip()]
+        if not urls:
+            self.require("BLOCK_ENGINE_URL")
+            urls = [self.BLOCK_ENGINE_URL]
+        return urls
+
+    def admin_ids(self):
+        """Telegram user ids of the bot's admins."""
+        return {int(i) for i in (self.ADMIN_USER_IDS or "").split(",") if i.strip()}
+
+    def secret(self, name):
+        """Return the plain value of a required secret setting."""
+        self.require(name)
+        return getattr(self, name).get_secret_value()
+
     class Config:
         env_file = ".env"
         case_sensitive = True
+        extra = "ignore"
+
+
+# Lazily created shared objects. Nothing heavy is built (or imported) until
+# first use, so importing any module needs neither secrets nor network access.
+_instances = {}
+_lock = threading.RLock()
+
+
+def _lazy(name, factory):
+    instance = _instances.get(name)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = _instances[name] = factory()
+    return instance
+
+
+def override(name, value):
+    """Replace a lazily created object (e.g. with a stand-in for load tests)."""
+    with _lock:
+        _instances[name] = value
+
+
+def get_settings():
+    return _lazy("settings", Settings)
+
+
+def get_keypair():
+    """The hot wallet keypair that signs transfers, swaps and tips."""
+    def build():
+        from solders.keypair import Keypair
+        return Keypair.from_base58_string(get_settings().secret("PRIVATE_KEY"))
+    return _lazy("keypair", build)
+
+
+def get_wallet_pool():
+    """Intermediary wallets that receive deposits and sign each swap's transactions."""
+    def build():
+        from walletPool import build_wallet_pool
+        return build_wallet_pool(get_settings())
+    return _lazy("wallet_pool", build)
+
+
+def get_nonce_pool():
+    """Durable nonce accounts leased by swaps so their transfers can be pre-signed."""
+    def build():
+        from noncePool import NoncePool
+        from rpcRouter import rpc_call
+        configured = get_settings().NONCE_ACCOUNTS or ""
+        return NoncePool([a.strip() for a in configured.split(",") if a.strip()], rpc_call)
+    return _lazy("nonce_pool", build)
+
+
+def get_rpc_router():
+    """Latency-aware router over the configured Solana RPC endpoints."""
+    def build():
+        from rpcRouter import RpcRouter
+        return RpcRouter(get_settings().rpc_urls())
+    return _lazy("rpc_router", build)
+
+
+def get_jito_clients():
+    """One searcher client per block engine region, keyed by region URL."""
+    def build():
+        from jito_searcher_client.searcher import get_searcher_client
+        return {url: get_searcher_client(url) for url in get_settings().block_engine_urls()}
+    return _lazy("jito_clients", build)
+
+
+def get_mongo_db():
+    def build():
+        from pymongo import MongoClient
+        settings = get_settings()
+        client = MongoClient(settings.secret("MONGO_URI"), tls=True, tlsAllowInvalidCertificates=True)
+        return client[settings.MONGO_DB_NAME]
+    return _lazy("mongo_db", build)
+
+
+def get_users_collection():
+    return _lazy("users_collection", lambda: get_mongo_db()["users"])
+
+
+def get_deposits_collection():
+    """Every decoded transfer into an intermediary wallet, as rebuilt by backfill.py."""
+    return _lazy("deposits_collection", lambda: get_mongo_db()["deposits"])
+
+
+def get_fees_collection():
+    """Fees left in the pool wallets by landed swaps, one document per deposit signature."""
+    def build():
+        collection = get_mongo_db()["fees"]
+        collection.create_index([("fee_processed", 1), ("wallet", 1)])
+        return collection
+    return _lazy("fees_collection", build)
+
+
+def get_fees_writes():
+    """Write-behind buffer for fee records."""
+    def build():
+        from writeBuffer import WriteBuffer
+        return WriteBuffer(get_fees_collection())
+    return _lazy("fees_writes", build)
+
 
-settings = Settings() 
\ No newline at end of file
+def get_users_writes():
+    """Write-behind buffer batching updates to the users collection."""
+    def build():
+        from writeBuffer import WriteBuffer
+        return WriteBuffer(get_users_collection())
+    return _lazy("users_writes", build)
@@ -1,12 +1,16 @@
-# API URLs
-CHANGE_NOW_URL = "https://api.changenow.io/v2/exchange"
-JUPITER_QUOTE_API_URL = "https://quote-api.jup.ag/v6/quote"
-JUPITER_SWAP_API_URL = "https://quote-api.jup.ag/v6/swap"
+# API URLs (defaults; override the base URLs through Settings)
+CHANGE_NOW_API_BASE = "https://api.changenow.io/v2"
+JUPITER_API_BASE = "https://quote-api.jup.ag/v6"
+COINGECKO_API_BASE = "https://api.coingecko.com/api/v3"
 
 # Token Constants
 USDC_MINT = "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v"
 USDC_DECIMALS = 6
 
+# Wrapped BTC (Portal) on Solana, quoted through Jupiter as a BTC price source
+WBTC_MINT = "3NZ9JMVBmGAqocybic2c7LQCJScmgsAZ6vQqTDzcqmJh"
+WBTC_DECIMALS = 8
+
 # Rate Limiting
 MAX_REQUESTS_PER_MINUTE = 5
 CACHE_TTL = 60  # seconds
@@ -15,12 +19,105 @@ CACHE_TTL = 60  # seconds
 FAILURE_THRESHOLD = 5
 RESET_TIMEOUT = 60  # seconds
 
+# Bulkheads (max concurrent in-flight calls per upstream)
+BULKHEAD_LIMITS = {
+    "coingecko": 4,
+    "changenow": 8,
+    "jupiter_quote": 8,
+    "jupiter_swap": 8,
+    "solana_rpc": 16,
+    "jito": 4,
+}
+BULKHEAD_WAIT_TIMEOUT = 5  # seconds to wait for a free slot before failing fast
+REQUEST_TIMEOUT = 10  # seconds
+
 # Swap Settings
 MAX_RETRIES = 3
 RETRY_DELAY = 2  # seconds
 MAX_SWAP_AMOUNT = 1000000
 SWAP_FEE_PERCENTAGE = 0.05
 SLIPPAGE_BPS = 100
+JITO_TIP_LAMPORTS = 1000000
+# Lamports kept aside per swap on top of the tip: signature and priority
+# fees plus rent for a recipient ATA the transfer may have to create
+SWAP_NETWORK_FEE_LAMPORTS = 3000000
+
+# BTC pricing
+PRICE_QUORUM = 2  # answers to take the median of before returning early
+PRICE_DEADLINE = 1.5  # seconds to wait for a quorum before settling for fewer answers
+PRICE_REFERENCE_USDC = 1000  # amount quoted by sources that price a swap rather than the spot rate
+PRICE_CACHE_SECONDS = 10  # a price this fresh is reused without asking the sources again
+PRICE_MAX_AGE = 300  # seconds a last known price may be used when every source fails
+PRICE_SERIES_SIZE = 720  # samples kept in the rolling price series
+MAX_RATE_DEVIATION = 0.20  # ChangeNOW's quote may differ this much from the previewed amount
+
+# Bundle simulation
+DEFAULT_COMPUTE_UNIT_LIMIT = 200000  # until a transaction shape has been simulated
+COMPUTE_UNIT_MARGIN = 1.2  # headroom over the peak simulated compute usage
+SIMULATION_CACHE_SIZE = 256  # transaction shapes remembered
+SIMULATION_CACHE_TTL = 3600  # seconds
+
+# Solana RPC router
+RPC_TIMEOUT = 5  # seconds per attempt
+RPC_EWMA_ALPHA = 0.1
+RPC_ERROR_PENALTY = 10  # an endpoint failing every call scores as 11x slower
+RPC_LATENCY_WINDOW = 200  # recent samples kept per endpoint for the hedge delay
+HEDGE_DEFAULT_DELAY = 0.25  # seconds, until an endpoint has enough samples
+HEDGE_MIN_DELAY = 0.05
+HEDGE_MAX_DELAY = 1.0
+
+# Block engine regions
+REGION_LATENCY_ALPHA = 0.2  # weight of the newest sample in a region's acceptance latency average
+
+# Address lookup tables
+LOOKUP_TABLE_CACHE_TTL = 600  # seconds
+
+# Balance ledger
+BALANCE_RECONCILE_INTERVAL = 30  # seconds between on-chain balance refreshes
+
+# Deadline scheduler
+DEADLINE_RESOLUTION = 1.0  # seconds; deadlines in the same tick expire together
+
+# User profile cache
+PROFILE_CACHE_SIZE = 10000  # users kept in memory
+PROFILE_CACHE_TTL = 300  # seconds before a cached profile is re-read
+
+# Mongo write-behind buffer
+WRITE_BUFFER_MAX_OPS = 100  # writes per bulk_write batch
+WRITE_BUFFER_MAX_DELAY = 0.5  # seconds a queued write may wait before it is flushed
+
+# Deposit backfill
+BACKFILL_PAGE_SIZE = 1000  # getSignaturesForAddress maximum
+BACKFILL_CONCURRENCY = 16  # getTransaction calls in flight per address
+
+# Profiling
+PROFILE_SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+PROFILE_MAX_SECONDS = 300  # a profile stops by itself after this long
+PROFILE_OUTPUT_DIR = "profiles"  # collapsed-stack files for flame graphs
+LOOP_LAG_INTERVAL = 0.1  # seconds between event loop lag probes
+LOOP_LAG_WINDOW = 3000  # probes kept (5 minutes)
+
+# ChangeNOW minimum amounts
+MIN_AMOUNT_CACHE_TTL = 300  # seconds
+
+# Warm start snapshot
+WARM_START_PATH = "state/warmstart.json.gz"
+WARM_START_INTERVAL = 60  # seconds between snapshots
+WARM_START_MAX_AGE = 6 * 3600  # older snapshots are ignored entirely
+
+# Fee sweeps
+FEE_SWEEP_INTERVAL = 600  # seconds between sweeps
+FEE_SWEEP_MIN_USDC = 25  # a wallet's unswept fees are swapped once they reach this
+FEE_SWEEP_MAX_BATCH = 1000  # fee records read per sweep
+FEE_SWEEP_LANDING_WINDOW = 180  # seconds a pending sweep can still land (its blockhash validity plus margin)
+
+# Conversation persistence
+PERSISTENCE_UPDATE_INTERVAL = 5  # seconds between python-telegram-bot's persistence passes
+PERSISTENCE_FLUSH_DELAY = 1  # seconds changes are coalesced before one bulk write
+PERSISTENCE_FALLBACK_PATH = "state/persistence.pickle"  # parked writes while Mongo is unreachable
+
+# Address validation
+ADDRESS_CACHE_SIZE = 4096  # addresses whose validity is remembered
 
 # Transaction status
 TX_STATUS_PENDING = "pending"
@@ -1,65 +1,56 @@
 import asyncio
-import os
-from solana.rpc.api import Client
+import logging
 from spl.token.instructions import create_associated_token_account
-from solders.transaction import VersionedTransaction
-from solders.message import MessageV0
 from spl.token.instructions import get_associated_token_address, transfer_checked, TransferCheckedParams
 from spl.token.constants import TOKEN_PROGRAM_ID
-from solders.keypair import Keypair
+from solders.hash import Hash
 from solders.pubkey import Pubkey
-from dotenv import load_dotenv
+from config import get_keypair
+from rpcRouter import rpc_call
+from bundleBuilder import compile_transaction
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-# Load and validate environment variables
-def validate_env_variables():
-    required_vars = ["SOLANA_RPC_URL", "PRIVATE_KEY"]
-    for var in required_vars:
-        if not os.getenv(var):
-            raise ValueError(f"Missing required environment variable: {var}")
-
-validate_env_variables()
-
-SOLANA_RPC_URL = os.getenv("SOLANA_RPC_URL")
-PRIVATE_KEY = os.getenv("PRIVATE_KEY")
-SENDER_KEYPAIR = Keypair.from_base58_string(PRIVATE_KEY)
-
-async def create_signed_usdc_transfer_tx(mint, decimals, destination_address, amount):
-    """Creates and returns a signed USDC transfer transaction without sending it."""
+async def create_signed_usdc_transfer_tx(mint, decimals, destination_address, amount, sender_keypair=None,
+                                         tip_lamports=None, nonce=None):
+    """Creates and returns a signed USDC transfer transaction without sending it.
+    Signed by `sender_keypair` (the swap's intermediary wallet), defaulting to PRIVATE_KEY.
+    With `tip_lamports`, the Jito tip is folded in, making this the bundle's last transaction.
+    With a leased durable `nonce`, no blockhash is fetched."""
     # Convert decimals and amount to proper types
     decimals = int(decimals)
     amount = float(amount) if isinstance(amount, str) else amount
     amount_in_smallest_units = int(amount * (10 ** decimals))
     
-    print("\n=== Preparing USDC Transfer Transaction ===")
-    print(f"Destination: {destination_address}")
-    print(f"Amount: {amount} (in smallest units: {amount_in_smallest_units})")
+    logger.info("Preparing USDC transfer transaction", extra={"destination": destination_address, "amount": amount})
 
-    client = Client(SOLANA_RPC_URL)
+    sender_keypair = sender_keypair or get_keypair()
     MINT_PUBKEY = Pubkey.from_string(mint)
 
     # Get sender and recipient ATA
-    sender_ata = get_associated_token_address(SENDER_KEYPAIR.pubkey(), MINT_PUBKEY)
+    sender_ata = get_associated_token_address(sender_keypair.pubkey(), MINT_PUBKEY)
     recipient_pubkey = Pubkey.from_string(destination_address)
     recipient_ata = get_associated_token_address(recipient_pubkey, MINT_PUBKEY)
 
-    print(f"Sender ATA: {sender_ata}")
-    print(f"Recipient ATA: {recipient_ata}")
+    logger.debug("Sender ATA %s, recipient ATA %s", sender_ata, recipient_ata)
 
-    # Get recent blockhash
-    recent_blockhash_response = client.get_latest_blockhash(commitment="confirmed")
-    blockhash = recent_blockhash_response.value.blockhash
+    # Get recent blockhash (not needed when signing against a durable nonce)
+    blockhash = None
+    if nonce is None:
+        recent_blockhash_response = await rpc_call("getLatestBlockhash", [{"commitment": "confirmed"}])
+        blockhash = Hash.from_string(recent_blockhash_response["value"]["blockhash"])
 
     # Create instructions list
     instructions = []
     
     # Check if recipient ATA exists
-    response = client.get_account_info(recipient_ata)
-    if response.value is None:
-        print("Recipient ATA does not exist. Adding ATA creation instruction.")
+    response = await rpc_call("getAccountInfo", [
+        str(recipient_ata), {"encoding": "base64", "commitment": "confirmed"},
+    ])
+    if response["value"] is None:
+        logger.info("Recipient ATA does not exist, adding ATA creation instruction")
         create_ata_ix = create_associated_token_account(
-            payer=SENDER_KEYPAIR.pubkey(),
+            payer=sender_keypair.pubkey(),
             owner=recipient_pubkey,
             mint=MINT_PUBKEY
         )
@@ -72,7 +63,7 @@ async def create_signed_usdc_transfer_tx(mint, decimals, destination_address, am
             source=sender_ata,
             mint=MINT_PUBKEY,
             dest=recipient_ata,
-            owner=SENDER_KEYPAIR.pubkey(),
+            owner=sender_keypair.pubkey(),
             amount=amount_in_smallest_units,
             decimals=decimals,
             signers=[]
@@ -80,16 +71,10 @@ async def create_signed_usdc_transfer_tx(mint, decimals, destination_address, am
     )
     instructions.append(transfer_ix)
 
-    # Create versioned transaction
-    message = MessageV0.try_compile(
-        payer=SENDER_KEYPAIR.pubkey(),
-        instructions=instructions,
-        recent_blockhash=blockhash,
-        address_lookup_table_accounts=[]
-    )
-    versioned_tx = VersionedTransaction(message, [SENDER_KEYPAIR])
+    # Compile against our lookup tables, with a right-sized compute limit
+    versioned_tx = await compile_transaction(sender_keypair, instructions, blockhash, tip_lamports, nonce)
     
-    print("Transaction prepared and signed.")
+    logger.debug("USDC transfer transaction prepared and signed")
     return versioned_tx
 
 # if __name__ == "__main__":
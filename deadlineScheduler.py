@@ -0,0 +1,98 @@
+import asyncio
+import heapq
+import logging
+import math
+
+from constants import DEADLINE_RESOLUTION
+
+logger = logging.getLogger(__name__)
+
+
+class Deadline:
+    """One scheduled expiry: `future` fails with asyncio.TimeoutError at `when` unless cancelled first."""
+
+    __slots__ = ("when", "future")
+
+    def __init__(self, when, future):
+        self.when = when
+        self.future = future  # None once cancelled or fired
+
+    def __lt__(self, other):
+        return self.when < other.when
+
+
+class DeadlineScheduler:
+    """
+    Expires many futures from one heap and one event loop timer.
+
+    Instead of an asyncio.wait_for (a timer handle plus a wrapper) per
+    waiting swap, each wait is a small Deadline record in a heap. Deadlines
+    are rounded up to `resolution` seconds so those falling in the same tick
+    fire together, and cancelled records are dropped lazily, so the cost
+    follows the number of expiries rather than the number of waiters.
+    """
+
+    def __init__(self, resolution=DEADLINE_RESOLUTION):
+        self.resolution = resolution
+        self._heap = []
+        self._cancelled = 0
+        self._timer = None
+        self._timer_at = None
+        self.fired = 0
+
+    def schedule(self, future, timeout):
+        """Fail `future` with asyncio.TimeoutError after `timeout` seconds; returns the Deadline to cancel."""
+        loop = asyncio.get_running_loop()
+        when = math.ceil((loop.time() + timeout) / self.resolution) * self.resolution
+        deadline = Deadline(when, future)
+        heapq.heappush(self._heap, deadline)
+        if self._timer_at is None or when < self._timer_at:
+            self._arm(loop)
+        return deadline
+
+    def cancel(self, deadline):
+        """Forget a deadline whose future no longer needs it (no-op once fired)."""
+        if deadline.future is None:
+            return
+        deadline.future = None
+        self._cancelled += 1
+        # Most waits end before their deadline; rebuild once dead records dominate the heap
+        if self._cancelled > 64 and self._cancelled * 2 > len(self._heap):
+            self._heap = [d for d in self._heap if d.future is not None]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    def _arm(self, loop):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = self._timer_at = None
+        while self._heap and self._heap[0].future is None:
+            heapq.heappop(self._heap)
+            self._cancelled -= 1
+        if self._heap:
+            self._timer_at = self._heap[0].when
+            self._timer = loop.call_at(self._timer_at, self._fire, loop)
+
+    def _fire(self, loop):
+        self._timer = self._timer_at = None
+        now = loop.time()
+        expired = 0
+        while self._heap and self._heap[0].when <= now:
+            deadline = heapq.heappop(self._heap)
+            if deadline.future is None:
+                self._cancelled -= 1
+                continue
+            future, deadline.future = deadline.future, None
+            if not future.done():
+                future.set_exception(asyncio.TimeoutError())
+                expired += 1
+        if expired:
+            self.fired += expired
+            logger.info("Deadlines expired", extra={"count": expired, "pending": self.pending()})
+        self._arm(loop)
+
+    def pending(self):
+        return len(self._heap) - self._cancelled
+
+    def snapshot(self):
+        return {"pending": self.pending(), "fired": self.fired, "next": self._timer_at}
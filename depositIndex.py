@@ -0,0 +1,125 @@
+import math
+import random
+import time
+import uuid
+from collections import namedtuple
+
+from constants import USDC_DECIMALS
+
+# A decoded SPL token transfer into one of our deposit accounts
+TokenTransfer = namedtuple(
+    "TokenTransfer", ["signature", "source", "destination", "raw_amount", "memo", "block_time"]
+)
+
+MEMO_PREFIX = "lockout:"
+MAX_AMOUNT_OFFSET = 9999  # micro-USDC; the unique suffix always stays below one cent
+DEPOSIT_GRACE_SECONDS = 60  # accept transfers landed slightly before the swap was registered
+
+
+def to_raw_amount(amount, decimals=USDC_DECIMALS):
+    return int(round(amount * 10 ** decimals))
+
+
+def from_raw_amount(raw_amount, decimals=USDC_DECIMALS):
+    return raw_amount / 10 ** decimals
+
+
+class PendingDeposit:
+    """A swap waiting for its USDC deposit."""
+
+    def __init__(self, swap_id, user_sol_address, source_ata, expected_raw, reference_raw, memo,
+                 deposit_address=None):
+        self.swap_id = swap_id
+        self.user_sol_address = user_sol_address
+        self.source_ata = source_ata
+        self.expected_raw = expected_raw
+        self.reference_raw = reference_raw
+        self.memo = memo
+        self.deposit_address = deposit_address  # intermediary USDC account the user pays into
+        self.created_at = time.time()
+        self.transfer = None  # the matched TokenTransfer
+
+    @property
+    def reference_amount(self):
+        """The exact amount the user is asked to send."""
+        return from_raw_amount(self.reference_raw)
+
+
+class PendingDepositIndex:
+    """
+    Hash index from deposit reference to pending swap.
+
+    Every pending swap gets a unique exact amount (the requested amount plus a
+    sub-cent micro-USDC suffix) and a memo. An incoming transfer is matched in
+    constant time by memo, then by exact amount, then (for users who send a
+    round amount from their own ATA) by source account.
+    """
+
+    def __init__(self):
+        self.by_amount = {}
+        self.by_memo = {}
+        self.by_source = {}  # source ATA -> {swap_id: PendingDeposit}
+
+    def __len__(self):
+        return len(self.by_memo)
+
+    def register(self, user_sol_address, source_ata, amount, minimum_amount=None, swap_id=None,
+                 deposit_address=None):
+        """
+        Reserve a unique reference for a new pending swap.
+
+        The user is asked to send `amount` plus a unique micro-USDC suffix;
+        transfers of at least `minimum_amount` (default `amount`) are accepted.
+        """
+        swap_id = swap_id or uuid.uuid4().hex[:12]
+        base_raw = math.ceil(amount * 10 ** USDC_DECIMALS)
+        expected_raw = math.ceil((minimum_amount if minimum_amount is not None else amount) * 10 ** USDC_DECIMALS)
+
+        offsets = random.sample(range(1, MAX_AMOUNT_OFFSET + 1), k=min(64, MAX_AMOUNT_OFFSET))
+        reference_raw = next((base_raw + o for o in offsets if base_raw + o not in self.by_amount), None)
+        if reference_raw is None:
+            reference_raw = next(
+                (base_raw + o for o in range(1, MAX_AMOUNT_OFFSET + 1) if base_raw + o not in self.by_amount),
+                None,
+            )
+        if reference_raw is None:
+            raise RuntimeError("No unique deposit amount available for this swap size")
+
+        pending = PendingDeposit(swap_id, user_sol_address, source_ata, expected_raw, reference_raw,
+                                 f"{MEMO_PREFIX}{swap_id}", deposit_address)
+        self.by_amount[reference_raw] = pending
+        self.by_memo[pending.memo] = pending
+        self.by_source.setdefault(source_ata, {})[swap_id] = pending
+        return pending
+
+    def remove(self, pending):
+        self.by_amount.pop(pending.reference_raw, None)
+        self.by_memo.pop(pending.memo, None)
+        by_source = self.by_source.get(pending.source_ata)
+        if by_source is not None:
+            by_source.pop(pending.swap_id, None)
+            if not by_source:
+                del self.by_source[pending.source_ata]
+
+    def match(self, transfer):
+        """Return the pending swap this transfer pays for, or None."""
+        candidates = []
+        if transfer.memo:
+            candidates.append(self.by_memo.get(transfer.memo.strip()))
+        candidates.append(self.by_amount.get(transfer.raw_amount))
+        # Legacy path: round amount sent from the registered wallet's ATA, oldest swap first
+        by_source = self.by_source.get(transfer.source)
+        if by_source:
+            candidates.extend(sorted(by_source.values(), key=lambda p: p.created_at))
+
+        for pending in candidates:
+            if pending is None or pending.transfer is not None:
+                continue
+            if pending.deposit_address and transfer.destination != pending.deposit_address:
+                continue
+            if transfer.raw_amount < pending.expected_raw:
+                continue
+            if transfer.block_time and transfer.block_time < pending.created_at - DEPOSIT_GRACE_SECONDS:
+                continue
+            return pending
+        return None
@@ -0,0 +1,202 @@
+import asyncio
+import datetime
+import logging
+
+from config import get_fees_collection, get_fees_writes, get_wallet_pool
+from constants import (
+    FEE_SWEEP_INTERVAL,
+    FEE_SWEEP_LANDING_WINDOW,
+    FEE_SWEEP_MAX_BATCH,
+    FEE_SWEEP_MIN_USDC,
+    JITO_TIP_LAMPORTS,
+    SWAP_NETWORK_FEE_LAMPORTS,
+)
+from depositIndex import from_raw_amount, to_raw_amount
+from rpcRouter import rpc_call
+from walletPool import InsufficientBalanceError
+
+logger = logging.getLogger(__name__)
+
+
+async def record_fee(deposit_signature, user_id, swap_id, wallet, fee_raw):
+    """
+    Note the fee a landed swap left in `wallet`. Keyed by deposit signature,
+    so recording it twice never resets a fee that was already swept.
+    """
+    await get_fees_writes().update_one(
+        {"_id": deposit_signature},
+        {"$setOnInsert": {
+            "user_id": user_id,
+            "swap_id": swap_id,
+            "wallet": wallet.usdc_address,
+            "fee_raw": fee_raw,
+            "fee_processed": False,
+            "created_at": datetime.datetime.now(datetime.UTC),
+        }},
+        upsert=True,
+    )
+
+
+class FeeSweeper:
+    """
+    Swaps accumulated fees into the target token, one Jupiter swap per
+    wallet and batch instead of one per user swap.
+
+    Every FEE_SWEEP_INTERVAL seconds, unprocessed fees are summed per pool
+    wallet; a wallet holding at least FEE_SWEEP_MIN_USDC gets one swap of the
+    whole batch, and the batch's fees are marked processed together once it
+    lands. A batch whose bundle is still pending is held out of the queue,
+    tied to its bundle, and settled on a later tick from the swap's on-chain
+    status: processed if it landed, queued again once it no longer can.
+    """
+
+    def __init__(self, interval=FEE_SWEEP_INTERVAL, min_usdc=FEE_SWEEP_MIN_USDC):
+        self.interval = interval
+        self.min_raw = to_raw_amount(min_usdc)
+        self._task = None
+        self._lock = asyncio.Lock()
+        self._reservations = {}  # bundle id -> wallet reservation of a sweep still pending
+
+    def ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep_once()
+            except Exception:
+                logger.exception("Fee sweep failed")
+
+    async def pending_fees(self):
+        """Unprocessed fees not tied to a pending sweep, grouped by wallet USDC address: {address: [fee docs]}."""
+        # Fees recorded moments ago may still sit in the write buffer
+        await get_fees_writes().flush()
+        docs = await asyncio.to_thread(
+            lambda: list(get_fees_collection().find(
+                {"fee_processed": False, "sweep_bundle_id": None}, {"wallet": 1, "fee_raw": 1}
+            ).limit(FEE_SWEEP_MAX_BATCH))
+        )
+        by_wallet = {}
+        for doc in docs:
+            by_wallet.setdefault(doc["wallet"], []).append(doc)
+        return by_wallet
+
+    async def sweep_once(self):
+        async with self._lock:
+            await self.settle_pending_sweeps()
+            by_wallet = await self.pending_fees()
+            results = await asyncio.gather(
+                *(self._sweep_wallet(address, docs) for address, docs in by_wallet.items()),
+                return_exceptions=True,
+            )
+            for address, result in zip(by_wallet, results):
+                if isinstance(result, Exception):
+                    logger.error("Fee sweep of wallet failed", extra={"wallet": address, "error": str(result)})
+
+    async def settle_pending_sweeps(self):
+        """Resolve every sweep whose bundle was still pending when it was sent."""
+        docs = await asyncio.to_thread(
+            lambda: list(get_fees_collection().find(
+                {"fee_processed": False, "sweep_bundle_id": {"$ne": None}},
+                {"sweep_bundle_id": 1, "sweep_signature": 1, "sweep_started_at": 1},
+            ))
+        )
+        sweeps = {doc["sweep_bundle_id"]: doc for doc in docs}
+        for bundle_id, doc in sweeps.items():
+            try:
+                await self._settle_sweep(bundle_id, doc["sweep_signature"], doc["sweep_started_at"])
+            except Exception as e:
+                logger.warning("Pending fee sweep not settled", extra={"bundle_id": bundle_id, "error": str(e)})
+
+    async def _settle_sweep(self, bundle_id, signature, started_at):
+        # Jito only remembers bundles for minutes; the swap's own signature status is authoritative
+        result = await rpc_call("getSignatureStatuses", [[signature], {"searchTransactionHistory": True}])
+        status = ((result or {}).get("value") or [None])[0]
+        wallet_pool = get_wallet_pool()
+        reservation = self._reservations.get(bundle_id)
+
+        if status is not None and status.get("err") is None:
+            if reservation is not None:
+                wallet_pool.commit(reservation)
+            await self._mark_swept({"sweep_bundle_id": bundle_id}, bundle_id, "Landed")
+            logger.info("Pending fee sweep landed", extra={"bundle_id": bundle_id})
+        else:
+            age = (datetime.datetime.now(datetime.UTC) - started_at.replace(tzinfo=datetime.UTC)).total_seconds()
+            if status is None and age < FEE_SWEEP_LANDING_WINDOW:
+                return  # its blockhash may still be valid
+            if reservation is not None:
+                wallet_pool.cancel(reservation)
+            await asyncio.to_thread(
+                get_fees_collection().update_many,
+                {"sweep_bundle_id": bundle_id, "fee_processed": False},
+                {"$unset": {"sweep_bundle_id": "", "sweep_signature": "", "sweep_started_at": ""}},
+            )
+            logger.warning("Pending fee sweep never landed, fees queued again", extra={"bundle_id": bundle_id})
+        self._reservations.pop(bundle_id, None)
+
+    async def _mark_swept(self, filter, bundle_id, status):
+        await asyncio.to_thread(
+            get_fees_collection().update_many,
+            filter,
+            {"$set": {
+                "fee_processed": True,
+                "sweep_bundle_id": bundle_id,
+                "sweep_status": status,
+                "swept_at": datetime.datetime.now(datetime.UTC),
+            }},
+        )
+
+    async def _sweep_wallet(self, address, docs):
+        from bundle import BundleStatus, send_bundle_with_tip
+        from createSwap import create_signed_jupiter_swap_tx
+
+        total_raw = sum(doc["fee_raw"] for doc in docs)
+        if total_raw < self.min_raw:
+            return
+        wallet_pool = get_wallet_pool()
+        wallet = wallet_pool.get(address)
+        if wallet is None:
+            logger.warning("Fees held by a wallet no longer in the pool", extra={"wallet": address})
+            return
+
+        try:
+            reservation = await wallet_pool.reserve(
+                wallet, total_raw, JITO_TIP_LAMPORTS + SWAP_NETWORK_FEE_LAMPORTS, rpc_call
+            )
+        except InsufficientBalanceError as e:
+            logger.warning("Fee sweep postponed", extra={"wallet": wallet.pubkey, "error": str(e)})
+            return
+        try:
+            signed_tx = await create_signed_jupiter_swap_tx(from_raw_amount(total_raw), wallet.keypair)
+            bundle_id, status, landed_slot = await send_bundle_with_tip([signed_tx], JITO_TIP_LAMPORTS, wallet.keypair)
+        except BaseException:
+            wallet_pool.cancel(reservation)
+            raise
+
+        ids = [doc["_id"] for doc in docs]
+        if status == BundleStatus.LANDED:
+            wallet_pool.commit(reservation)
+            await self._mark_swept({"_id": {"$in": ids}}, bundle_id, status.value)
+            logger.info("Fees swept", extra={"wallet": wallet.pubkey, "fees": len(docs),
+                                             "usdc": from_raw_amount(total_raw), "bundle_id": bundle_id})
+        elif status == BundleStatus.PENDING:
+            # It may still land: hold the funds and keep the fees out of the queue until a later tick settles it
+            self._reservations[bundle_id] = reservation
+            await asyncio.to_thread(
+                get_fees_collection().update_many,
+                {"_id": {"$in": ids}},
+                {"$set": {
+                    "sweep_bundle_id": bundle_id,
+                    "sweep_signature": str(signed_tx.signatures[0]),
+                    "sweep_started_at": datetime.datetime.now(datetime.UTC),
+                }},
+            )
+            logger.info("Fee sweep pending", extra={"wallet": wallet.pubkey, "fees": len(docs), "bundle_id": bundle_id})
+        else:
+            wallet_pool.cancel(reservation)
+            logger.warning("Fee sweep bundle did not land", extra={"bundle_id": bundle_id, "status": status.value})
+
+
+fee_sweeper = FeeSweeper()
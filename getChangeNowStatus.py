@@ -1,13 +1,8 @@
-import requests
+from circuitBreaker import ahttp_request, CHANGENOW
+from config import get_settings
 import datetime
 from telegram import Update
 from telegram.ext import ContextTypes
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-CHANGE_NOW_API_KEY = os.getenv("CHANGE_NOW_API_KEY")
 
 async def get_status(tx_id):
     """Get the status of a ChangeNOW transaction by ID"""
@@ -15,12 +10,13 @@ async def get_status(tx_id):
         # Check if an ID was provided
         
         # Call ChangeNOW API to get status
+        settings = get_settings()
         headers = {
-            "x-changenow-api-key": CHANGE_NOW_API_KEY
+            "x-changenow-api-key": settings.secret("CHANGE_NOW_API_KEY")
         }
-        status_url = f"https://api.changenow.io/v2/exchange/by-id?id={tx_id}"
+        status_url = f"{settings.CHANGE_NOW_API_BASE}/exchange/by-id?id={tx_id}"
         
-        response = requests.get(status_url, headers=headers)
+        response = await ahttp_request(CHANGENOW, "GET", status_url, headers=headers)
         
         if response.status_code == 200:
             data = response.json()
@@ -1,17 +1,37 @@
-import requests
-import os
-from dotenv import load_dotenv
+from circuitBreaker import ahttp_request, CHANGENOW
+from config import get_settings
+from constants import MIN_AMOUNT_CACHE_TTL
+import logging
+import time
 
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+# (from_currency, to_currency, from_network, to_network) -> (minimum, fetched_at)
+min_amounts = {}
+
+
+def dump_state():
+    return [[*pair, minimum, fetched_at] for pair, (minimum, fetched_at) in min_amounts.items()]
+
+
+def load_state(state):
+    for *pair, minimum, fetched_at in state:
+        if time.time() - fetched_at < MIN_AMOUNT_CACHE_TTL:
+            min_amounts.setdefault(tuple(pair), (minimum, fetched_at))
 
-CHANGE_NOW_API_KEY = os.getenv("CHANGE_NOW_API_KEY")
 
 async def get_min_amount(from_currency, to_currency, from_network, to_network):
     """
-    Check minimum allowed amount for exchange using ChangeNOW API
+    Check minimum allowed amount for exchange using ChangeNOW API.
+    Answers are reused for MIN_AMOUNT_CACHE_TTL seconds.
     """
+    pair = (from_currency, to_currency, from_network, to_network)
+    cached = min_amounts.get(pair)
+    if cached is not None and time.time() - cached[1] < MIN_AMOUNT_CACHE_TTL:
+        return cached[0]
     try:
-        min_amount_url = "https://api.changenow.io/v2/exchange/min-amount"
+        settings = get_settings()
+        min_amount_url = f"{settings.CHANGE_NOW_API_BASE}/exchange/min-amount"
         params = {
             "fromCurrency": from_currency,
             "toCurrency": to_currency,
@@ -20,22 +40,23 @@ async def get_min_amount(from_currency, to_currency, from_network, to_network):
             "flow": "standard"
         }
         headers = {
-            "x-changenow-api-key": CHANGE_NOW_API_KEY
+            "x-changenow-api-key": settings.secret("CHANGE_NOW_API_KEY")
         }
 
-        print("\n=== Checking Minimum Amount ===")
-        print(f"Parameters: {params}")
-        
-        response = requests.get(min_amount_url, params=params, headers=headers)
-        print(f"Min amount response status: {response.status_code}")
-        print(f"Min amount response: {response.text}")
+        logger.debug("Checking minimum amount: %s", params)
+
+        response = await ahttp_request(CHANGENOW, "GET", min_amount_url, params=params, headers=headers)
+        logger.debug("Min amount response %s: %s", response.status_code, response.text)
 
         if response.status_code == 200:
             data = response.json()
-            return data.get('minAmount')
+            minimum = data.get('minAmount')
+            if minimum is not None:
+                min_amounts[pair] = (minimum, time.time())
+            return minimum
         else:
-            print(f"Error getting minimum amount: {response.text}")
+            logger.warning("Error getting minimum amount: %s", response.text)
             return None
     except Exception as e:
-        print(f"Error checking minimum amount: {str(e)}")
+        logger.exception("Error checking minimum amount")
         return None
\ No newline at end of file
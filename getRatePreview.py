@@ -1,12 +1,183 @@
-import requests
-    
-async def get_rate_preview(usdc_amount):
-    """Get current exchange rate preview"""
-    try:
-        response = requests.get(f"https://api.coingecko.com/api/v3/simple/price?ids=bitcoin&vs_currencies=usd")
-        data = response.json()
-        btc_price_usd = data['bitcoin']['usd']
-        estimated_btc = usdc_amount / btc_price_usd
-        return estimated_btc
-    except Exception:
-        return None
\ No newline at end of file
+import asyncio
+import logging
+import statistics
+import time
+from collections import deque
+
+from circuitBreaker import ahttp_request, CHANGENOW, COINGECKO, JUPITER_QUOTE
+from config import get_settings
+from constants import (
+    PRICE_CACHE_SECONDS,
+    PRICE_DEADLINE,
+    PRICE_MAX_AGE,
+    PRICE_QUORUM,
+    PRICE_REFERENCE_USDC,
+    PRICE_SERIES_SIZE,
+    REQUEST_TIMEOUT,
+    WBTC_DECIMALS,
+    WBTC_MINT,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PriceUnavailableError(Exception):
+    """Raised when no price source answered and there is no recent price to fall back on."""
+    pass
+
+
+async def coingecko_price():
+    """BTC/USD spot price from CoinGecko."""
+    settings = get_settings()
+    response = await ahttp_request(COINGECKO, "GET", f"{settings.COINGECKO_API_BASE}/simple/price",
+                                   params={"ids": "bitcoin", "vs_currencies": "usd"})
+    response.raise_for_status()
+    return float(response.json()["bitcoin"]["usd"])
+
+
+async def changenow_price():
+    """BTC/USDC implied by ChangeNOW's estimate for PRICE_REFERENCE_USDC (what a swap would actually get)."""
+    settings = get_settings()
+    params = {
+        "fromCurrency": "usdc",
+        "toCurrency": "btc",
+        "fromNetwork": "sol",
+        "toNetwork": "btc",
+        "fromAmount": PRICE_REFERENCE_USDC,
+        "flow": "standard",
+    }
+    headers = {"x-changenow-api-key": settings.secret("CHANGE_NOW_API_KEY")}
+    response = await ahttp_request(CHANGENOW, "GET", f"{settings.CHANGE_NOW_API_BASE}/exchange/estimated-amount",
+                                   params=params, headers=headers)
+    response.raise_for_status()
+    return PRICE_REFERENCE_USDC / float(response.json()["toAmount"])
+
+
+async def jupiter_price():
+    """BTC/USDC implied by a Jupiter quote from USDC into wrapped BTC."""
+    settings = get_settings()
+    params = {
+        "inputMint": settings.USDC_MINT,
+        "outputMint": WBTC_MINT,
+        "amount": str(int(PRICE_REFERENCE_USDC * 10**settings.USDC_DECIMALS)),
+        "slippageBps": "100",
+    }
+    response = await ahttp_request(JUPITER_QUOTE, "GET", f"{settings.JUPITER_API_BASE}/quote", params=params)
+    response.raise_for_status()
+    return PRICE_REFERENCE_USDC / (int(response.json()["outAmount"]) / 10**WBTC_DECIMALS)
+
+
+PRICE_SOURCES = {
+    "coingecko": coingecko_price,
+    "changenow": changenow_price,
+    "jupiter": jupiter_price,
+}
+
+
+class PriceEngine:
+    """
+    BTC price from several sources queried concurrently.
+
+    Returns the median of the first PRICE_QUORUM valid answers, or of whatever
+    has arrived by PRICE_DEADLINE; if nothing has arrived by then, the first
+    valid answer wins. Every price is appended to a rolling in-memory series,
+    and a price younger than `max_age` is served from it without asking again.
+    """
+
+    def __init__(self, sources=None, max_samples=PRICE_SERIES_SIZE):
+        self.sources = sources or PRICE_SOURCES
+        self.series = deque(maxlen=max_samples)  # (timestamp, price, source names)
+        self._inflight = None
+
+    def latest(self, max_age=PRICE_MAX_AGE):
+        """Most recent (timestamp, price, sources) no older than `max_age` seconds, or None."""
+        if not self.series:
+            return None
+        sample = self.series[-1]
+        return sample if time.time() - sample[0] <= max_age else None
+
+    def change(self, window):
+        """Relative price change over the last `window` seconds of the series, or None."""
+        if len(self.series) < 2:
+            return None
+        now = time.time()
+        oldest = next((s for s in self.series if now - s[0] <= window), None)
+        if oldest is None or oldest is self.series[-1]:
+            return None
+        return (self.series[-1][1] - oldest[1]) / oldest[1]
+
+    async def get_price(self, max_age=PRICE_CACHE_SECONDS):
+        cached = self.latest(max_age)
+        if cached is not None:
+            return cached[1]
+        # Concurrent callers share one round of requests
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.ensure_future(self._fetch())
+        return await asyncio.shield(self._inflight)
+
+    async def _fetch(self):
+        tasks = {asyncio.create_task(source()): name for name, source in self.sources.items()}
+        answers = {}
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + PRICE_DEADLINE
+        hard_deadline = loop.time() + REQUEST_TIMEOUT
+        pending = set(tasks)
+        try:
+            while pending and len(answers) < PRICE_QUORUM:
+                now = loop.time()
+                # Past the soft deadline, settle for what has arrived; if nothing has, take the first answer
+                if now >= deadline and answers or now >= hard_deadline:
+                    break
+                limit = deadline if now < deadline else hard_deadline
+                done, pending = await asyncio.wait(pending, timeout=limit - now, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = tasks[task]
+                    try:
+                        price = task.result()
+                    except Exception as e:
+                        logger.warning("Price source failed", extra={"source": name, "error": str(e)})
+                        continue
+                    if price > 0:
+                        answers[name] = price
+                    else:
+                        logger.warning("Price source returned an invalid price", extra={"source": name, "price": price})
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if not answers:
+            stale = self.latest()
+            if stale is None:
+                raise PriceUnavailableError("No BTC price source is available")
+            logger.warning("All price sources failed, using last known price", extra={"age": time.time() - stale[0]})
+            return stale[1]
+
+        price = statistics.median(answers.values())
+        self.series.append((time.time(), price, tuple(sorted(answers))))
+        logger.debug("BTC price", extra={"price": price, "sources": answers})
+        return price
+
+    def dump_state(self):
+        return [[ts, price, list(sources)] for ts, price, sources in self.series]
+
+    def load_state(self, state):
+        """Restore a saved series; `latest` keeps old samples from being served as fresh."""
+        for ts, price, sources in state:
+            self.series.append((ts, price, tuple(sources)))
+
+    def snapshot(self):
+        latest = self.latest(float("inf"))
+        return {
+            "price": latest[1] if latest else None,
+            "age": time.time() - latest[0] if latest else None,
+            "sources": list(latest[2]) if latest else [],
+            "samples": len(self.series),
+        }
+
+
+price_engine = PriceEngine()
+
+
+async def get_rate_preview(usdc_amount, max_age=PRICE_CACHE_SECONDS):
+    """BTC expected for `usdc_amount`. Raises PriceUnavailableError when no price can be had."""
+    return usdc_amount / await price_engine.get_price(max_age)
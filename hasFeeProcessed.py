@@ -1,23 +1,6 @@
-import pymongo
-from dotenv import load_dotenv
-import os
+from config import get_fees_collection
 
-load_dotenv()
-
-MONGO_URI = os.getenv("MONGO_URI")
-
-def has_fee_been_processed(user_sol_address: str, original_tx_sig: str) -> bool:
-    """Check if the fee has already been processed for this transaction"""
-    client = pymongo.MongoClient(MONGO_URI)
-    db = client["swap_bot"]
-    users_collection = db["users"]
-    user = users_collection.find_one({
-        "sol_wallet": user_sol_address,
-        "transaction_history": {
-            "$elemMatch": {
-                "signature": original_tx_sig,
-                "fee_processed": True
-            }
-        }
-    })
-    return bool(user)
\ No newline at end of file
+def has_fee_been_processed(original_tx_sig: str) -> bool:
+    """Check if the fee taken from this deposit has been swept (see feeSweeper)"""
+    fee = get_fees_collection().find_one({"_id": original_tx_sig, "fee_processed": True}, {"_id": 1})
+    return bool(fee)
\ No newline at end of file
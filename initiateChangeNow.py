@@ -1,13 +1,11 @@
-import requests
-import os
-from dotenv import load_dotenv
+from circuitBreaker import ahttp_request, CHANGENOW
+from config import get_settings
+import logging
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-CHANGE_NOW_API_KEY = os.getenv("CHANGE_NOW_API_KEY")
-CHANGE_NOW_URL = "https://api.changenow.io/v2/exchange"
-
-def initiate_change_now_swap(amount_after_fee, btc_address):
+async def initiate_change_now_swap(amount_after_fee, btc_address):
+    settings = get_settings()
     payload = {
         "fromCurrency": "usdc",
         "toCurrency": "btc",
@@ -21,18 +19,18 @@ def initiate_change_now_swap(amount_after_fee, btc_address):
 
     headers = {
             "Content-Type": "application/json",
-            "x-changenow-api-key": CHANGE_NOW_API_KEY,
+            "x-changenow-api-key": settings.secret("CHANGE_NOW_API_KEY"),
         }
 
         # Make API request to initiate exchange
-    response = requests.post(CHANGE_NOW_URL, json=payload, headers=headers)
+    response = await ahttp_request(CHANGENOW, "POST", f"{settings.CHANGE_NOW_API_BASE}/exchange", json=payload, headers=headers)
     response_data = response.json()
-    print(f"ChangeNOW data: {response_data}")
+    logger.debug("ChangeNOW data: %s", response_data)
     if response.status_code == 200:
         amount_received = response_data.get("toAmount")
         tx_id = response_data.get("id")
         payin_address = response_data.get("payinAddress")
         return tx_id, payin_address, amount_received
     else:
-        print(f"Failed to initiate ChangeNOW swap: {response.status_code}")
+        logger.warning("Failed to initiate ChangeNOW swap", extra={"status_code": response.status_code, "body": response_data})
         return None, None, None
\ No newline at end of file
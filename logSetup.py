@@ -0,0 +1,134 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import uuid
+from contextlib import contextmanager
+
+# Correlation id of the swap the current task is working on
+swap_id_var = contextvars.ContextVar("swap_id", default=None)
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+_listener = None
+
+
+class CorrelationFilter(logging.Filter):
+    """Attach the current swap id to every record."""
+
+    def filter(self, record):
+        record.swap_id = swap_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Drop a share of records logged with `extra={"sampled": True}`.
+
+    Used for per-signature debug lines in scan loops, which would otherwise
+    dominate log volume.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if getattr(record, "sampled", False):
+            return random.random() < self.rate
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any `extra` fields included."""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and key != "sampled" and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class JsonQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that renders the JSON line before the record is enqueued.
+
+    The stock prepare() folds the traceback into the message and clears
+    exc_info, so a formatter on the listener side would never see it; here
+    the traceback is formatted into its own "exc" field first.
+    """
+
+    def prepare(self, record):
+        line = self.format(record)
+        record = copy.copy(record)
+        record.message = record.msg = line
+        record.args = None
+        record.exc_info = record.exc_text = record.stack_info = None
+        return record
+
+
+def setup_logging(level=None, sample_rate=None):
+    """
+    Configure root logging once per process.
+
+    Records are put on an in-memory queue by the calling thread and written to
+    stdout by a background listener, so the event loop never blocks on I/O.
+    Filters run before enqueueing, so gated and sampled-out records cost nothing
+    beyond the level check.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    from config import get_settings
+
+    settings = get_settings()
+    level = level or settings.LOG_LEVEL
+    sample_rate = sample_rate if sample_rate is not None else settings.LOG_SAMPLE_RATE
+
+    # Records arrive already rendered as JSON lines
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = JsonQueueHandler(log_queue)
+    queue_handler.setFormatter(JsonFormatter())
+    queue_handler.addFilter(CorrelationFilter())
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level)
+    # Third-party clients log every request at INFO
+    for noisy in ("httpx", "urllib3", "telegram", "apscheduler"):
+        logging.getLogger(noisy).setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def new_swap_id():
+    return uuid.uuid4().hex[:12]
+
+
+@contextmanager
+def swap_context(swap_id=None):
+    """Tag every log line emitted inside this block (and tasks it spawns) with a swap id."""
+    token = swap_id_var.set(swap_id or new_swap_id())
+    try:
+        yield swap_id_var.get()
+    finally:
+        swap_id_var.reset(token)
@@ -1,5 +1,7 @@
-import os
-from dotenv import load_dotenv
+import asyncio
+import functools
+import logging
+import time
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application, 
@@ -10,19 +12,48 @@ from telegram.ext import (
     ContextTypes,
     CallbackQueryHandler
 )
-from pymongo import MongoClient
-from solana.rpc.api import Client
 from datetime import datetime, UTC
 from validateBtcAddress import is_valid_bitcoin_address
 from validateSolAddress import is_valid_solana_address
-from getRatePreview import get_rate_preview
-from createSwap import create_signed_jupiter_swap_tx
+from getRatePreview import PriceUnavailableError, get_rate_preview, price_engine
 from initiateChangeNow import initiate_change_now_swap
 from createTransfer import create_signed_usdc_transfer_tx
 from getMinimumAmt import get_min_amount
-from bundle import BundleStatus, send_bundle_with_tip
+from bundle import BundleStatus, region_rankings, send_bundle_with_tip
+from bundleSimulation import BundleSimulationError
 from getChangeNowStatus import get_status
-from verifyDeposit import verify_usdc_deposit
+from verifyDeposit import deposit_deadlines, deposit_index, register_deposit, verify_usdc_deposit
+from rpcRouter import rpc_call
+from circuitBreaker import breaker_states
+from config import (
+    get_mongo_db,
+    get_nonce_pool,
+    get_rpc_router,
+    get_settings,
+    get_users_collection,
+    get_fees_writes,
+    get_users_writes,
+    get_wallet_pool,
+)
+from constants import (
+    JITO_TIP_LAMPORTS,
+    MAX_HISTORY_ITEMS,
+    MAX_RATE_DEVIATION,
+    SWAP_NETWORK_FEE_LAMPORTS,
+)
+from depositIndex import to_raw_amount
+from walletPool import InsufficientBalanceError
+from userProfiles import profile_cache
+import metrics
+from metrics import track_stage
+from logSetup import setup_logging, swap_context, swap_id_var
+from profiling import handler_timings, loop_lag, profiler, timed
+from warmStart import warm_start
+from feeSweeper import fee_sweeper, record_fee
+from persistence import build_persistence
+from rateLimiter import RateLimiter, InMemoryBucketStore, MongoBucketStore, callback_command
+
+logger = logging.getLogger(__name__)
 
 class ChangeNowError(Exception):
     pass
@@ -30,27 +61,16 @@ class ChangeNowError(Exception):
 class SolanaTransactionError(Exception):
     pass
 
-# Load environment variables
-load_dotenv()
-
-# Constants and Configurations
-SOLANA_RPC_URL = os.getenv("SOLANA_RPC_URL")
-client = Client(SOLANA_RPC_URL)
-CHANGE_NOW_URL = "https://api.changenow.io/v2/exchange"
-CHANGE_NOW_API_KEY = os.getenv("CHANGE_NOW_API_KEY")
-MONGO_URI = os.getenv("MONGO_URI")
-INTERMEDIARY_SOL_WALLET = os.getenv("INTERMEDIARY_SOL_WALLET")
-USDC_MINT = os.getenv("USDC_MINT")
-TARGET_TOKEN_MINT_ADDRESS = os.getenv("TARGET_TOKEN_MINT_ADDRESS")
-USDC_DECIMALS = os.getenv("USDC_DECIMALS")
+# Constants and Configurations (environment-driven settings live in config.Settings)
 PRESET_AMOUNTS = [100, 500, 1000, 5000]
 MAX_AMOUNT = 1000000
 FEE_PERCENTAGE = 0.05
 
-# MongoDB setup
-client_db = MongoClient(MONGO_URI, tls=True, tlsAllowInvalidCertificates=True)
-db = client_db["telegram_bot"]
-users_collection = db["users"]
+def build_rate_limiter():
+    """Rate limiting (set RATE_LIMIT_BACKEND=mongo to share buckets across worker processes)"""
+    if get_settings().RATE_LIMIT_BACKEND == "mongo":
+        return RateLimiter(MongoBucketStore(get_mongo_db()["rate_limits"]))
+    return RateLimiter(InMemoryBucketStore())
 
 # Conversation states
 SOLANA_WALLET, BITCOIN_ADDRESS, CUSTOM_AMOUNT = range(3)
@@ -107,7 +127,7 @@ async def bitcoin_address_input(update: Update, context: ContextTypes.DEFAULT_TY
     solana_address = context.user_data.get('solana_address')
     
     # Store both addresses in MongoDB
-    users_collection.update_one(
+    await get_users_writes().update_one(
         {"_id": user_id},
         {
             "$set": {
@@ -116,8 +136,10 @@ async def bitcoin_address_input(update: Update, context: ContextTypes.DEFAULT_TY
                 "updated_at": datetime.now(UTC)
             }
         },
-        upsert=True
+        upsert=True,
+        critical=True
     )
+    profile_cache.invalidate(user_id)
     
     # Clear temporary data
     context.user_data.clear()
@@ -143,7 +165,7 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def swap(update, context):
     user_id = update.effective_user.id
-    user = users_collection.find_one({"_id": user_id})
+    user = await profile_cache.get(user_id)
 
     if not user:
         await update.message.reply_text(
@@ -219,13 +241,21 @@ async def check_rate(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         amount = float(context.args[0]) if context.args else 100  # Default amount
         rate_preview = await get_rate_preview(amount)
-        await update.message.reply_text(
-            f"Current Rate Preview:\n"
-            f"{amount:,.2f} USDC ≈ {format(rate_preview, '.8f')} BTC"
-        )
+        lines = [
+            "Current Rate Preview:",
+            f"{amount:,.2f} USDC ≈ {format(rate_preview, '.8f')} BTC",
+        ]
+        latest = price_engine.latest()
+        if latest is not None:
+            lines.append(f"Sources: {', '.join(latest[2])}")
+        change = price_engine.change(3600)
+        if change is not None:
+            lines.append(f"1h change: {change:+.2%}")
+        await update.message.reply_text("\n".join(lines))
     except Exception as e:
         await update.message.reply_text("Error fetching rate. Please try again.")
 
+@timed()
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -246,8 +276,10 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             amount = float(query.data.split('_')[2])
             # First remove the inline keyboard
             await query.message.edit_reply_markup(reply_markup=None)
-            # Then process the swap
-            await process_swap(query.message, amount, context)
+            # Then process the swap, tagging its log lines with a correlation id
+            with swap_context():
+                logger.info("Swap confirmed", extra={"user_id": query.from_user.id, "amount": amount})
+                await process_swap(query.message, amount, context)
         except Exception as e:
             await query.message.reply_text(f"❌ Error processing swap: {str(e)}")
         
@@ -262,9 +294,8 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return SOLANA_WALLET
         
     elif query.data == 'swap':
-        print(query)
         user_id = query.from_user.id
-        user = users_collection.find_one({"_id": user_id})
+        user = await profile_cache.get(user_id)
         if not user:
             await query.message.reply_text("Please register first using /register")
             return
@@ -282,7 +313,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle errors in the telegram bot."""
     # Log the error
-    print(f"Update {update} caused error {context.error}")
+    logger.error("Update caused error", exc_info=context.error, extra={"update": str(update)})
     
     # Send a message to the user
     error_message = (
@@ -294,19 +325,21 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if update and update.effective_message:
             await update.effective_message.reply_text(error_message)
     except Exception as e:
-        print(f"Failed to send error message: {e}")
+        logger.warning("Failed to send error message: %s", e)
 
 async def get_history(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     
-    user = users_collection.find_one({"_id": user_id})
+    user = await asyncio.to_thread(
+        get_users_collection().find_one, {"_id": user_id}, {"transactions": {"$slice": -MAX_HISTORY_ITEMS}}
+    )
     
     if not user or "transactions" not in user:
         await update.message.reply_text("No transaction history found.")
         return
         
     history = "📜 Transaction History:\n\n"
-    for tx in user["transactions"][-5:]:  # Show last 5 transactions
+    for tx in user["transactions"][-MAX_HISTORY_ITEMS:]:
         history += (
             f"Amount: {tx['amount_usdc']} USDC → {tx['amount_btc']} BTC\n"
             f"Status: {tx['status'].upper()}\n"
@@ -332,36 +365,169 @@ async def get_status_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
     except Exception as e:
         await update.message.reply_text(f"❌ Error fetching status: {str(e)}")
 
+def admin_only(handler):
+    """Ignore the command unless it comes from one of ADMIN_USER_IDS."""
+    @functools.wraps(handler)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if update.effective_user is None or update.effective_user.id not in get_settings().admin_ids():
+            logger.warning("Admin command refused", extra={"user_id": getattr(update.effective_user, "id", None)})
+            return
+        return await handler(update, context)
+    return wrapper
+
+@admin_only
+async def health(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Report the circuit breaker state of every upstream and the intermediary wallet balances"""
+    lines = ["🩺 Upstream Health:\n"]
+    for name, state in breaker_states().items():
+        icon = {"closed": "🟢", "half_open": "🟡", "open": "🔴"}[state["state"]]
+        lines.append(
+            f"{icon} {name}: {state['state'].upper()} "
+            f"(in flight {state['in_flight']}/{state['max_concurrent']}, "
+            f"failures {state['consecutive_failures']}, rejected {state['rejected']})"
+        )
+
+    price = price_engine.snapshot()
+    if price["price"] is not None:
+        lines.append(
+            f"\n₿ BTC price: ${price['price']:,.2f} from {', '.join(price['sources'])} "
+            f"({price['age']:.0f}s ago, {price['samples']} samples)"
+        )
+
+    lines.append("\n📡 Solana RPC Endpoints:\n")
+    for endpoint in get_rpc_router().snapshot():
+        latency = "?" if endpoint["latency"] is None else f"{endpoint['latency'] * 1000:.0f} ms"
+        lines.append(
+            f"{endpoint['endpoint']}: {endpoint['state'].upper()}, {latency}, errors {endpoint['error_rate']:.0%}"
+        )
+
+    deadlines = deposit_deadlines.snapshot()
+    lines.append(f"\n⏳ Deposits awaited: {deadlines['pending']} (timed out so far: {deadlines['fired']})")
+
+    # Balances as last reconciled; /health itself never queries the chain
+    lines.append("\n👛 Intermediary Wallets:\n")
+    for wallet in get_wallet_pool().snapshot():
+        usdc = "?" if wallet["usdc_raw_balance"] is None else f"{wallet['usdc_raw_balance'] / 10**6:.2f}"
+        sol = "?" if wallet["lamports"] is None else f"{wallet['lamports'] / 10**9:.4f}"
+        read = f"read {time.time() - wallet['reconciled_at']:.0f}s ago" if wallet["reconciled_at"] else "to be re-read"
+        lines.append(
+            f"{wallet['wallet'][:8]}…: {usdc} USDC, {sol} SOL ({read}), {wallet['active_swaps']} active swaps, "
+            f"reserved {wallet['reserved_usdc_raw'] / 10**6:.2f} USDC / {wallet['reserved_lamports'] / 10**9:.4f} SOL"
+        )
+
+    rankings = region_rankings()
+    if rankings:
+        lines.append("\n🌍 Block Engine Regions:\n")
+        for rank, region in enumerate(rankings, 1):
+            latency = "?" if region["accept_seconds"] is None else f"{region['accept_seconds'] * 1000:.0f} ms"
+            lines.append(
+                f"{rank}. {region['region']}: landed {region['landed']}/{region['accepted']} "
+                f"({region['landing_rate']:.0%}), accept {latency}, rejected {region['submitted'] - region['accepted']}"
+            )
+    await update.message.reply_text("\n".join(lines))
+
+@admin_only
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/profile start [seconds] | /profile stop: sample the running bot's stacks."""
+    action = context.args[0] if context.args else ""
+    if action == "start":
+        try:
+            seconds = float(context.args[1]) if len(context.args) > 1 else 60
+        except ValueError:
+            await update.message.reply_text("❌ Please enter a valid number of seconds\nUsage: /profile start [seconds] | /profile stop")
+            return
+        try:
+            profiler.start(seconds)
+        except RuntimeError as e:
+            await update.message.reply_text(f"❌ {e}")
+            return
+        await update.message.reply_text(f"🔬 Profiling for up to {seconds:.0f}s. Send /profile stop for the report.")
+    elif action == "stop":
+        if profiler.started_at is None:
+            await update.message.reply_text("❌ No profile has been started")
+            return
+        path = profiler.stop()
+        lines = [f"🔬 Profile: {sum(profiler.stacks.values())} samples, collapsed stacks in {path}\n"]
+        lines.append("Hottest functions (share of samples on stack):")
+        for name, share in profiler.top_functions():
+            lines.append(f"{share:6.1%}  {name}")
+        lines.append("\nSlowest handlers (calls, mean, max):")
+        for name, calls, mean, worst in handler_timings.slowest():
+            lines.append(f"{name}: {calls}, {mean * 1000:.0f} ms, {worst * 1000:.0f} ms")
+        await update.message.reply_text("\n".join(lines))
+    else:
+        await update.message.reply_text("Usage: /profile start [seconds] | /profile stop")
+
+@admin_only
+async def looplag_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    lag = loop_lag.snapshot()
+    if not lag["samples"]:
+        await update.message.reply_text("No event loop lag samples yet")
+        return
+    await update.message.reply_text(
+        f"⏱ Event loop lag over {lag['samples']} probes:\n"
+        f"p50 {lag['p50'] * 1000:.1f} ms, p99 {lag['p99'] * 1000:.1f} ms, max {lag['max'] * 1000:.1f} ms"
+    )
+
 # New function to process the actual swap
+@timed()
 async def process_swap(message, amount, context):
     user_id = message.chat.id  # Changed from message.from_user.id
-    user = users_collection.find_one({"_id": user_id})
+    user = await profile_cache.get(user_id)
     
     if not user:
         await message.reply_text("❌ Please register first using /register")
         return
         
-    if "sol_wallet" not in user or "btc_address" not in user:
+    if not user.registered:
         await message.reply_text("❌ Please register both your Solana and Bitcoin addresses first")
         return
 
-    progress_message = await message.reply_text(
-        f"🔄 Processing swap\.\.\.\n\n⏳ Step 1/4: Verifying deposit\.\.\.\nPlease send USDC to the address below:\n```{INTERMEDIARY_SOL_WALLET}```",
-        parse_mode="MarkdownV2"
-    )
+    fee = amount * FEE_PERCENTAGE
+    amount_after_fee = amount - fee
+
+    # Assign the least busy intermediary wallet; it receives the deposit and signs every transaction of this swap
+    wallet_pool = get_wallet_pool()
+    wallet = wallet_pool.assign()
+
+    # Give this swap a unique deposit amount and memo so its transfer can be attributed
+    try:
+        pending_deposit = register_deposit(
+            amount, amount_after_fee, user.sol_wallet, swap_id_var.get(), wallet, user.usdc_address
+        )
+    except Exception:
+        wallet_pool.release(wallet)
+        raise
+    try:
+        progress_message = await message.reply_text(
+            f"🔄 Processing swap\.\.\.\n\n⏳ Step 1/4: Verifying deposit\.\.\.\n"
+            f"Please send exactly\n```{pending_deposit.reference_amount:.6f}```USDC to the address below:\n"
+            f"```{wallet.pubkey}```\n"
+            f"If your wallet supports a memo, add:\n```{pending_deposit.memo}```",
+            parse_mode="MarkdownV2"
+        )
+    except Exception:
+        deposit_index.remove(pending_deposit)
+        wallet_pool.release(wallet)
+        raise
     
+    reservation = None
+    nonce_lease = None
+    nonce_settled = False
+    landed = False
+    # Lease and read a durable nonce while the user deposits, so the transfer is signed without a blockhash fetch
+    nonce_task = asyncio.create_task(get_nonce_pool().acquire(wallet))
+    metrics.SWAPS_IN_FLIGHT.inc()
     try:
-        fee = amount * FEE_PERCENTAGE
-        amount_after_fee = amount - fee
-
-        # Verify deposit - updated to use correct field name
-        deposit_verified = await verify_usdc_deposit(amount_after_fee, user["sol_wallet"], users_collection)
+        with track_stage(metrics.DEPOSIT_WAIT):
+            deposit_verified = await verify_usdc_deposit(pending_deposit, get_users_writes(), user_id)
         
         if not deposit_verified:
             await progress_message.edit_text(
                 "❌ Deposit verification timed out after 10 minutes.\n"
                 "The swap has been cancelled. Please try again with a new swap."
             )
+            metrics.SWAPS_TOTAL.labels("deposit_timeout").inc()
             return
 
         await progress_message.edit_text(
@@ -370,7 +536,8 @@ async def process_swap(message, amount, context):
             "⏳ Step 2/4: Getting rate preview..."
         )
 
-        rate_preview = await get_rate_preview(amount_after_fee)
+        with track_stage(metrics.RATE_PREVIEW):
+            rate_preview = await get_rate_preview(amount_after_fee)
         
         await progress_message.edit_text(
             "🔄 Processing swap...\n\n"
@@ -379,19 +546,42 @@ async def process_swap(message, amount, context):
             "⏳ Step 3/4: Creating transactions..."
         )
 
-        # Execute transactions
-        signed_tx = await create_signed_jupiter_swap_tx(3)
-        
+        # Hold the USDC and lamports this swap's bundle spends so concurrent swaps cannot over-commit the wallet
+        try:
+            reservation = await wallet_pool.reserve(
+                wallet,
+                to_raw_amount(amount_after_fee),
+                JITO_TIP_LAMPORTS + SWAP_NETWORK_FEE_LAMPORTS,
+                rpc_call,
+            )
+        except InsufficientBalanceError as e:
+            logger.error("Swap wallet cannot cover bundle", extra={"wallet": wallet.pubkey, "error": str(e)})
+            await progress_message.edit_text(
+                "❌ The swap wallet is temporarily short of funds.\n"
+                "Your deposit was received; please contact support to complete the swap."
+            )
+            metrics.SWAPS_TOTAL.labels("insufficient_balance").inc()
+            return
+
+        try:
+            nonce_lease = await nonce_task
+        except Exception as e:
+            logger.warning("No durable nonce, signing with a recent blockhash", extra={"error": str(e)})
+
         # Initialize ChangeNOW Swap
-        tx_id, payin_address, amount_received = initiate_change_now_swap(amount_after_fee, user["btc_address"])
+        with track_stage(metrics.CHANGENOW_INITIATE):
+            tx_id, payin_address, amount_received = await initiate_change_now_swap(amount_after_fee, user.btc_address)
+        if tx_id is None or amount_received is None:
+            raise ChangeNowError("Failed to initiate the ChangeNOW exchange")
 
-        if abs(amount_received - rate_preview) / rate_preview > 0.20:
+        if abs(amount_received - rate_preview) / rate_preview > MAX_RATE_DEVIATION:
             await progress_message.edit_text(
                 "❌ Rate changed significantly. Please try again.\n"
                 f"Expected: {format(rate_preview, '.8f')} BTC\n"
                 f"Current: {format(amount_received, '.8f')} BTC\n"
                 f"Percentage difference: {abs(amount_received - rate_preview) / rate_preview * 100:.2f}%"
             )
+            metrics.SWAPS_TOTAL.labels("rate_changed").inc()
             return
 
         await progress_message.edit_text(
@@ -402,50 +592,120 @@ async def process_swap(message, amount, context):
             "⏳ Step 4/4: Executing swap..."
         )
 
-        signed_transfer_tx = await create_signed_usdc_transfer_tx(
-            USDC_MINT, 
-            USDC_DECIMALS, 
-            payin_address, 
-            amount_after_fee
-        )
+        with track_stage(metrics.TRANSFER_BUILD):
+            settings = get_settings()
+            signed_transfer_tx = await create_signed_usdc_transfer_tx(
+                settings.USDC_MINT, 
+                settings.USDC_DECIMALS, 
+                payin_address, 
+                amount_after_fee,
+                wallet.keypair,
+                tip_lamports=JITO_TIP_LAMPORTS,
+                nonce=nonce_lease
+            )
         
-        bundle_id, status, landed_slot = await send_bundle_with_tip([signed_tx, signed_transfer_tx], 1000000)
+        bundle_id, status, landed_slot = await send_bundle_with_tip(
+            [signed_transfer_tx], JITO_TIP_LAMPORTS, wallet.keypair, tip_included=True
+        )
         
+        if status == BundleStatus.PENDING and nonce_lease is not None:
+            # Outcome unknown: advance the nonce so the transfer can never land later, then see whether it
+            # already did. Either answer is final, so the reservation is settled the right way
+            try:
+                transfer_landed = await get_nonce_pool().settle(nonce_lease, str(signed_transfer_tx.signatures[0]))
+                nonce_settled = True
+                status = BundleStatus.LANDED if transfer_landed else BundleStatus.FAILED
+            except Exception as e:
+                nonce_settled = True  # the account stays out of the pool until its nonce is known to be advanced
+                logger.error("Pending transfer could not be settled", extra={"bundle_id": bundle_id, "error": str(e)})
+
+        if status in (BundleStatus.LANDED, BundleStatus.PENDING):
+            # Spent, or (without a nonce to settle it) may still be: debited until the next reconciliation
+            wallet_pool.commit(reservation)
+
         if status == BundleStatus.LANDED:
+            landed = True
+            metrics.SWAPS_TOTAL.labels("landed").inc()
+            # Record the landed swap before telling the user; it links their deposit to the ChangeNOW exchange
+            try:
+                await get_users_writes().update_one(
+                    {"_id": user_id},
+                    {
+                        "$push": {
+                            "transactions": {
+                                "amount_usdc": amount,
+                                "amount_btc": rate_preview,
+                                "status": "pending",
+                                "timestamp": datetime.now(UTC),
+                                "bundle_id": bundle_id,
+                                "change_now_tx_id": tx_id,
+                                "landed_slot": landed_slot
+                            }
+                        }
+                    },
+                    critical=True
+                )
+            except Exception as e:
+                # Unless Mongo rejected it outright, the write stays queued and is retried; the swap has landed
+                logger.error("Landed swap not yet recorded", extra={"bundle_id": bundle_id, "error": str(e)})
+            # The fee stays in the wallet until the next batched sweep swaps it. Deposits down to
+            # amount_after_fee are accepted, so the fee is whatever arrived beyond what was sent on
+            fee_raw = max(0, pending_deposit.transfer.raw_amount - to_raw_amount(amount_after_fee))
+            if fee_raw:
+                await record_fee(
+                    pending_deposit.transfer.signature, user_id, pending_deposit.swap_id, wallet, fee_raw
+                )
             await progress_message.edit_text(
                 "✅ Swap initiated successfully!\n\n"
                 f"Transaction ID: `{tx_id}`\n\n"
                 "Use /getstatus {tx_id} to check the status of your swap.",
                 parse_mode='Markdown'
             )
-            # Update database - use correct field names in the query
-            users_collection.update_one(
-                {"_id": user_id},
-                {
-                    "$push": {
-                        "transactions": {
-                            "amount_usdc": amount,
-                            "amount_btc": rate_preview,
-                            "status": "pending",
-                            "timestamp": datetime.now(UTC),
-                            "bundle_id": bundle_id,
-                            "change_now_tx_id": tx_id,
-                            "landed_slot": landed_slot
-                        }
-                    }
-                }
+        elif status == BundleStatus.PENDING:
+            metrics.SWAPS_TOTAL.labels("unconfirmed").inc()
+            await progress_message.edit_text(
+                "⏳ Swap submitted but not confirmed yet.\n\n"
+                f"Transaction ID: `{tx_id}`\n\n"
+                f"Use /getstatus {tx_id} to follow it, and contact support if it does not complete.",
+                parse_mode='Markdown'
             )
         else:
+            metrics.SWAPS_TOTAL.labels("not_landed").inc()
             await progress_message.edit_text(
                 "❌ Swap failed. Please try again."
             )
 
+    except PriceUnavailableError:
+        metrics.SWAPS_TOTAL.labels("price_unavailable").inc()
+        await progress_message.edit_text(
+            "❌ Could not get a BTC price from any source, so the swap was not started.\n"
+            "Your deposit was received; please contact support to complete the swap."
+        )
+    except BundleSimulationError as e:
+        metrics.SWAPS_TOTAL.labels("simulation_failed").inc()
+        await progress_message.edit_text(
+            "❌ Swap failed before submission: a transaction did not pass simulation.\n\n"
+            f"Error: {str(e)}\n\n"
+            "No tip was paid. Please try again or contact support if the issue persists."
+        )
     except Exception as e:
+        metrics.SWAPS_TOTAL.labels("error").inc()
         await progress_message.edit_text(
             f"❌ Swap failed\n\n"
             f"Error: {str(e)}\n\n"
             f"Please try again or contact support if the issue persists."
         )
+    finally:
+        metrics.SWAPS_IN_FLIGHT.dec()
+        if reservation is not None:
+            # No-op once committed; a failed or unsent bundle spent nothing
+            wallet_pool.cancel(reservation)
+        if not nonce_task.done():
+            nonce_task.cancel()
+        elif (not nonce_settled and not nonce_task.cancelled() and nonce_task.exception() is None
+              and nonce_task.result() is not None):
+            get_nonce_pool().release(nonce_task.result(), landed)
+        wallet_pool.release(wallet)
 
 # Add this new handler function
 async def custom_amount_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -457,17 +717,43 @@ async def custom_amount_input(update: Update, context: ContextTypes.DEFAULT_TYPE
         await update.message.reply_text("❌ Please enter a valid number")
     return ConversationHandler.END
 
+async def start_background(application):
+    warm_start.load()
+    warm_start.ensure_running()
+    loop_lag.ensure_running()
+    fee_sweeper.ensure_running()
+
+async def shutdown(application):
+    """Write out buffered Mongo updates and a last warm start snapshot before the process exits."""
+    await get_users_writes().flush()
+    await get_fees_writes().flush()
+    await warm_start.save()
+
 # Main Application Setup
 def main():
-    TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-    application = Application.builder().token(TOKEN).build()
+    setup_logging()
+    settings = get_settings()
+    application = (
+        Application.builder()
+        .token(settings.secret("TELEGRAM_BOT_TOKEN"))
+        .persistence(build_persistence())
+        .post_init(start_background)
+        .post_shutdown(shutdown)
+        .build()
+    )
+    rate_limiter = build_rate_limiter()
+
+    metrics.start_metrics_server(settings.METRICS_PORT)
 
     # Core handlers
     application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("swap", swap))
-    application.add_handler(CommandHandler("getstatus", get_status_command))
-    application.add_handler(CommandHandler("checkrate", check_rate))
-    application.add_handler(CommandHandler("history", get_history))
+    application.add_handler(CommandHandler("swap", rate_limiter.limit("swap")(swap)))
+    application.add_handler(CommandHandler("getstatus", rate_limiter.limit("getstatus")(get_status_command)))
+    application.add_handler(CommandHandler("checkrate", rate_limiter.limit("checkrate")(check_rate)))
+    application.add_handler(CommandHandler("history", rate_limiter.limit("history")(get_history)))
+    application.add_handler(CommandHandler("health", rate_limiter.limit("health")(health)))
+    application.add_handler(CommandHandler("profile", profile_command))
+    application.add_handler(CommandHandler("looplag", looplag_command))
 
     # Registration conversation handler
     register_handler = ConversationHandler(
@@ -480,12 +766,14 @@ def main():
             BITCOIN_ADDRESS: [MessageHandler(filters.TEXT & ~filters.COMMAND, bitcoin_address_input)],
             CUSTOM_AMOUNT: [MessageHandler(filters.TEXT & ~filters.COMMAND, custom_amount_input)]
         },
-        fallbacks=[CommandHandler('cancel', cancel)]
+        fallbacks=[CommandHandler('cancel', cancel)],
+        name="registration",
+        persistent=True
     )
     application.add_handler(register_handler)
 
     # Button callbacks and error handling
-    application.add_handler(CallbackQueryHandler(button_callback))
+    application.add_handler(CallbackQueryHandler(rate_limiter.limit(callback_command)(button_callback)))
     application.add_error_handler(error_handler)
 
     application.run_polling()
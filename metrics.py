@@ -0,0 +1,122 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+# Swap stages, in pipeline order
+DEPOSIT_WAIT = "deposit_wait"
+RATE_PREVIEW = "rate_preview"
+CHANGENOW_INITIATE = "changenow_initiate"
+TRANSFER_BUILD = "transfer_build"
+SIMULATION = "simulation"
+BUNDLE_SEND = "bundle_send"
+LANDING = "landing"
+
+# Deposit waits run for minutes, upstream calls for milliseconds
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+CALL_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+SWAP_STAGE_SECONDS = Histogram(
+    "lockout_swap_stage_seconds", "Time spent in each swap stage", ["stage"], buckets=STAGE_BUCKETS
+)
+SWAP_STAGE_ERRORS = Counter(
+    "lockout_swap_stage_errors_total", "Swap stages that raised an exception", ["stage"]
+)
+SWAP_STAGES_IN_FLIGHT = Gauge(
+    "lockout_swap_stages_in_flight", "Swaps currently inside each stage", ["stage"]
+)
+SWAPS_IN_FLIGHT = Gauge("lockout_swaps_in_flight", "Swaps currently being processed")
+SWAPS_TOTAL = Counter("lockout_swaps_total", "Finished swaps by outcome", ["outcome"])
+
+UPSTREAM_CALL_SECONDS = Histogram(
+    "lockout_upstream_call_seconds", "Latency of external calls", ["upstream"], buckets=CALL_BUCKETS
+)
+UPSTREAM_CALLS_TOTAL = Counter(
+    "lockout_upstream_calls_total", "External calls by outcome", ["upstream", "outcome"]
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "lockout_upstream_in_flight", "External calls currently in flight", ["upstream"]
+)
+JITO_REGION_ACCEPT_SECONDS = Histogram(
+    "lockout_jito_region_accept_seconds", "SendBundle latency per block engine region", ["region"],
+    buckets=CALL_BUCKETS,
+)
+JITO_REGION_BUNDLES_TOTAL = Counter(
+    "lockout_jito_region_bundles_total", "Bundles per block engine region by outcome", ["region", "outcome"]
+)
+RPC_HEDGES_TOTAL = Counter(
+    "lockout_rpc_hedges_total", "Hedged RPC reads by which request answered first", ["winner"]
+)
+MONGO_BULK_WRITE_SIZE = Histogram(
+    "lockout_mongo_bulk_write_size", "Writes applied per Mongo bulk_write batch",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+HANDLER_SECONDS = Histogram(
+    "lockout_handler_seconds", "Duration of timed Telegram handlers", ["handler"], buckets=STAGE_BUCKETS
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "lockout_event_loop_lag_seconds", "How late the event loop ran a periodic probe", buckets=CALL_BUCKETS
+)
+BREAKER_OPEN = Gauge(
+    "lockout_breaker_open", "1 if the upstream's circuit breaker is not closed", ["upstream"]
+)
+
+logger = logging.getLogger(__name__)
+
+_stage_listeners = []
+
+
+def add_stage_listener(listener):
+    """Register a callable(stage, seconds, ok) invoked after every stage (used by the benchmark harness)."""
+    _stage_listeners.append(listener)
+
+
+@contextmanager
+def track_stage(stage):
+    """Time a swap stage and count failures. Usable inside coroutines."""
+    SWAP_STAGES_IN_FLIGHT.labels(stage).inc()
+    start = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        elapsed = time.perf_counter() - start
+        SWAP_STAGES_IN_FLIGHT.labels(stage).dec()
+        SWAP_STAGE_SECONDS.labels(stage).observe(elapsed)
+        if not ok:
+            SWAP_STAGE_ERRORS.labels(stage).inc()
+        for listener in _stage_listeners:
+            listener(stage, elapsed, ok)
+
+
+@contextmanager
+def track_upstream_call(upstream):
+    """Time an external call; the caller reports the outcome via the yielded dict."""
+    UPSTREAM_IN_FLIGHT.labels(upstream).inc()
+    start = time.perf_counter()
+    result = {"outcome": "error"}
+    try:
+        yield result
+    finally:
+        UPSTREAM_IN_FLIGHT.labels(upstream).dec()
+        UPSTREAM_CALL_SECONDS.labels(upstream).observe(time.perf_counter() - start)
+        UPSTREAM_CALLS_TOTAL.labels(upstream, result["outcome"]).inc()
+
+
+def count_rejected_call(upstream):
+    UPSTREAM_CALLS_TOTAL.labels(upstream, "rejected").inc()
+
+
+def export_breaker(breaker):
+    """Publish a breaker's open/closed state; called for every breaker, including scoped ones created later."""
+    BREAKER_OPEN.labels(breaker.name).set_function(
+        lambda: 0 if breaker.snapshot()["state"] == "closed" else 1
+    )
+
+
+def start_metrics_server(port, addr="127.0.0.1"):
+    """Expose /metrics on a local HTTP port."""
+    start_http_server(port, addr=addr)
+    logger.info("Metrics available at http://%s:%s/metrics", addr, port)
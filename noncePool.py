@@ -0,0 +1,182 @@
+import asyncio
+import base64
+import logging
+
+from solders.hash import Hash
+from solders.message import MessageV0
+from solders.pubkey import Pubkey
+from solders.system_program import AdvanceNonceAccountParams, advance_nonce_account
+from solders.transaction import VersionedTransaction
+
+logger = logging.getLogger(__name__)
+
+NONCE_ACCOUNT_SIZE = 80
+NONCE_INITIALIZED = 1
+ADVANCE_CONFIRM_ATTEMPTS = 30
+ADVANCE_CONFIRM_INTERVAL = 1  # seconds
+
+
+def decode_nonce_account(data: bytes):
+    """Return (authority, nonce value) of an initialized nonce account, or None."""
+    if len(data) < NONCE_ACCOUNT_SIZE:
+        return None
+    state = int.from_bytes(data[4:8], "little")
+    if state != NONCE_INITIALIZED:
+        return None
+    return Pubkey.from_bytes(data[8:40]), Hash.from_bytes(data[40:72])
+
+
+class NonceAccount:
+    def __init__(self, pubkey):
+        self.pubkey = pubkey
+        self.authority = None
+        self.value = None  # current durable nonce; None when it must be re-read
+        self.leased = False
+
+
+class NonceLease:
+    """A nonce account held by one swap. Transactions signed against it never expire until it advances."""
+
+    def __init__(self, account, wallet):
+        self.account = account
+        self.wallet = wallet
+        self.signed = False  # a transaction using this nonce has been handed out
+
+    @property
+    def blockhash(self):
+        return self.account.value
+
+    def advance_instruction(self):
+        """Must be the first instruction of any transaction using the nonce."""
+        return advance_nonce_account(AdvanceNonceAccountParams(
+            nonce_pubkey=self.account.pubkey,
+            authorized_pubkey=self.wallet.keypair.pubkey(),
+        ))
+
+
+class NoncePool:
+    """
+    Durable nonce accounts from NONCE_ACCOUNTS, grouped by the pool wallet
+    that is their authority.
+
+    A swap leases a nonce while it waits for its deposit and reads the nonce
+    value then; since nobody else can advance a leased nonce, the value stays
+    valid for as long as the swap needs it, so the transfer can be signed
+    right after the deposit arrives without fetching a blockhash or racing
+    blockhash expiry.
+    """
+
+    def __init__(self, pubkeys, rpc_call):
+        self.accounts = [NonceAccount(Pubkey.from_string(p)) for p in pubkeys]
+        self.rpc_call = rpc_call
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self._invalidations = set()
+
+    async def _read(self, account):
+        result = await self.rpc_call("getAccountInfo", [
+            str(account.pubkey), {"encoding": "base64", "commitment": "confirmed"},
+        ])
+        value = (result or {}).get("value")
+        decoded = decode_nonce_account(base64.b64decode(value["data"][0])) if value else None
+        if decoded is None:
+            logger.warning("Not an initialized nonce account", extra={"nonce_account": str(account.pubkey)})
+            account.authority, account.value = None, None
+            return
+        account.authority, account.value = decoded
+
+    async def _load(self):
+        async with self._lock:
+            if not self._loaded:
+                await asyncio.gather(*(self._read(a) for a in self.accounts))
+                self._loaded = True
+
+    async def acquire(self, wallet):
+        """Lease a free nonce account whose authority is `wallet`, or return None if there is none."""
+        if not self.accounts:
+            return None
+        await self._load()
+        for account in self.accounts:
+            if account.leased or account.authority != wallet.keypair.pubkey():
+                continue
+            account.leased = True
+            try:
+                if account.value is None:
+                    await self._read(account)
+            except asyncio.CancelledError:
+                account.leased = False
+                raise
+            except Exception as e:
+                account.leased = False
+                logger.warning("Nonce read failed", extra={"nonce_account": str(account.pubkey), "error": str(e)})
+                continue
+            if account.value is None:
+                account.leased = False
+                continue
+            return NonceLease(account, wallet)
+        return None
+
+    def release(self, lease, landed):
+        """
+        Return the nonce account to the pool. A transaction signed against a
+        nonce stays valid until the nonce advances, so if one was handed out
+        and did not land, the nonce is advanced in the background first and
+        the account only rejoins the pool once that is confirmed.
+        """
+        if lease.signed and not landed:
+            task = asyncio.create_task(self._invalidate(lease))
+            self._invalidations.add(task)
+            task.add_done_callback(self._invalidations.discard)
+            return
+        self._return(lease)
+
+    async def settle(self, lease, signature):
+        """
+        Resolve a transaction signed against `lease` whose bundle outcome is
+        unknown: advance the nonce so it can never land later, then report
+        whether it already had. The lease rejoins the pool. Raises if the
+        advance is not confirmed; the account then stays out of the pool.
+        """
+        await self._advance(lease)
+        self._return(lease)
+        statuses = await self.rpc_call("getSignatureStatuses", [[signature], {"searchTransactionHistory": True}])
+        status = ((statuses or {}).get("value") or [None])[0]
+        return status is not None and status.get("err") is None
+
+    def _return(self, lease):
+        # Landing (or advancing) moved the nonce on; re-read it on the next lease
+        if lease.signed:
+            lease.account.value = None
+        lease.account.leased = False
+
+    async def _invalidate(self, lease):
+        try:
+            await self._advance(lease)
+        except Exception as e:
+            logger.error("Nonce advance failed; keeping account out of the pool",
+                         extra={"nonce_account": str(lease.account.pubkey), "error": str(e)})
+            return
+        self._return(lease)
+
+    async def _advance(self, lease):
+        latest = await self.rpc_call("getLatestBlockhash", [{"commitment": "confirmed"}])
+        keypair = lease.wallet.keypair
+        message = MessageV0.try_compile(
+            payer=keypair.pubkey(),
+            instructions=[lease.advance_instruction()],
+            recent_blockhash=Hash.from_string(latest["value"]["blockhash"]),
+            address_lookup_table_accounts=[],
+        )
+        tx = VersionedTransaction(message, [keypair])
+        signature = await self.rpc_call(
+            "sendTransaction", [base64.b64encode(bytes(tx)).decode(), {"encoding": "base64"}]
+        )
+        for _ in range(ADVANCE_CONFIRM_ATTEMPTS):
+            await asyncio.sleep(ADVANCE_CONFIRM_INTERVAL)
+            statuses = await self.rpc_call("getSignatureStatuses", [[signature]])
+            status = (statuses or {}).get("value", [None])[0]
+            if status and status.get("confirmationStatus") in ("confirmed", "finalized"):
+                logger.info("Nonce advanced to invalidate unlanded transaction",
+                            extra={"nonce_account": str(lease.account.pubkey)})
+                return
+        raise RuntimeError(f"Nonce advance {signature} not confirmed")
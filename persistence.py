@@ -0,0 +1,193 @@
+import asyncio
+import json
+import logging
+import os
+import pickle
+from copy import deepcopy
+
+from telegram.ext import BasePersistence, PersistenceInput, PicklePersistence
+
+from config import get_mongo_db, get_settings
+from constants import PERSISTENCE_FALLBACK_PATH, PERSISTENCE_FLUSH_DELAY, PERSISTENCE_UPDATE_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+def _conversation_id(name, key):
+    return f"conv:{name}:{json.dumps(list(key))}"
+
+
+class MongoPersistence(BasePersistence):
+    """
+    python-telegram-bot persistence in a Mongo collection, so conversation
+    state and user_data survive restarts and are shared by every worker.
+
+    Changes are coalesced per document (only the latest value of each is
+    kept) and written as one bulk_write shortly after they stop arriving.
+    If Mongo cannot be reached, pending documents are saved to a local file
+    instead and pushed to Mongo on the next start.
+
+    Only with `shared` (several workers on one collection) is user_data
+    re-read from Mongo on each update; a single worker's copy is always the
+    newest, so it never pays that read.
+    """
+
+    def __init__(self, collection, fallback_path=PERSISTENCE_FALLBACK_PATH, shared=False,
+                 update_interval=PERSISTENCE_UPDATE_INTERVAL, flush_delay=PERSISTENCE_FLUSH_DELAY):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=True, chat_data=True, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.collection = collection
+        self.fallback_path = fallback_path
+        self.shared = shared
+        self.flush_delay = flush_delay
+        self._dirty = {}  # document _id -> document, or None to delete it
+        self._flush_task = None
+        self._lock = asyncio.Lock()
+        self._loaded_fallback = False
+
+    # Reading
+
+    async def _find(self, filter):
+        await self._push_fallback()
+        return await asyncio.to_thread(lambda: list(self.collection.find(filter)))
+
+    async def get_user_data(self):
+        return {doc["key"]: doc["data"] for doc in await self._find({"kind": "user"})}
+
+    async def get_chat_data(self):
+        return {doc["key"]: doc["data"] for doc in await self._find({"kind": "chat"})}
+
+    async def get_bot_data(self):
+        docs = await self._find({"_id": "bot"})
+        return docs[0]["data"] if docs else {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        return {tuple(doc["key"]): doc["state"] for doc in await self._find({"kind": "conv", "name": name})}
+
+    async def refresh_user_data(self, user_id, user_data):
+        """Pick up what another worker stored for this user, unless we hold newer unwritten data."""
+        if not self.shared or f"user:{user_id}" in self._dirty:
+            return
+        doc = await asyncio.to_thread(self.collection.find_one, {"_id": f"user:{user_id}"})
+        if doc is not None and doc["data"] != user_data:
+            user_data.clear()
+            user_data.update(doc["data"])
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    # Writing
+
+    def _mark(self, doc_id, doc):
+        self._dirty[doc_id] = doc
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_delay)
+        await self.flush()
+
+    async def update_user_data(self, user_id, data):
+        self._mark(f"user:{user_id}", {"_id": f"user:{user_id}", "kind": "user", "key": user_id, "data": deepcopy(data)})
+
+    async def update_chat_data(self, chat_id, data):
+        self._mark(f"chat:{chat_id}", {"_id": f"chat:{chat_id}", "kind": "chat", "key": chat_id, "data": deepcopy(data)})
+
+    async def update_bot_data(self, data):
+        self._mark("bot", {"_id": "bot", "kind": "bot", "data": deepcopy(data)})
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def update_conversation(self, name, key, new_state):
+        doc_id = _conversation_id(name, key)
+        if new_state is None:
+            self._mark(doc_id, None)
+        else:
+            self._mark(doc_id, {"_id": doc_id, "kind": "conv", "name": name, "key": list(key), "state": new_state})
+
+    async def drop_user_data(self, user_id):
+        self._mark(f"user:{user_id}", None)
+
+    async def drop_chat_data(self, chat_id):
+        self._mark(f"chat:{chat_id}", None)
+
+    async def flush(self):
+        """Write every pending change in one bulk_write (or to the fallback file if Mongo fails)."""
+        async with self._lock:
+            if not self._dirty:
+                return
+            pending, self._dirty = self._dirty, {}
+            try:
+                await asyncio.to_thread(self._bulk_write, pending)
+            except Exception as e:
+                logger.error("Persistence write failed, saving to fallback file",
+                             extra={"documents": len(pending), "error": str(e)})
+                # Newer changes made while writing win over the ones that failed
+                pending.update(self._dirty)
+                self._dirty = {}
+                try:
+                    await asyncio.to_thread(self._write_fallback, pending)
+                except Exception:
+                    logger.exception("Persistence fallback write failed, keeping changes in memory")
+                    pending.update(self._dirty)
+                    self._dirty = pending
+
+    def _bulk_write(self, pending):
+        from pymongo import DeleteOne, ReplaceOne
+
+        requests = [
+            DeleteOne({"_id": doc_id}) if doc is None else ReplaceOne({"_id": doc_id}, doc, upsert=True)
+            for doc_id, doc in pending.items()
+        ]
+        self.collection.bulk_write(requests, ordered=False)
+
+    def _write_fallback(self, pending):
+        stored = self._read_fallback()
+        stored.update(pending)
+        os.makedirs(os.path.dirname(self.fallback_path) or ".", exist_ok=True)
+        tmp = f"{self.fallback_path}.tmp"
+        # Pickle, since user_data may hold values JSON cannot encode
+        with open(tmp, "wb") as f:
+            pickle.dump(stored, f)
+        os.replace(tmp, self.fallback_path)
+
+    def _read_fallback(self):
+        try:
+            with open(self.fallback_path, "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return {}
+
+    async def _push_fallback(self):
+        """Replay changes that were parked in the fallback file before anything is read."""
+        if self._loaded_fallback:
+            return
+        parked = await asyncio.to_thread(self._read_fallback)
+        if parked:
+            await asyncio.to_thread(self._bulk_write, parked)
+            os.remove(self.fallback_path)
+            logger.info("Replayed parked persistence writes", extra={"documents": len(parked)})
+        self._loaded_fallback = True
+
+
+def build_persistence():
+    """Mongo-backed persistence, or a local pickle file when no MONGO_URI is configured."""
+    settings = get_settings()
+    if settings.MONGO_URI is None:
+        logger.warning("MONGO_URI not set, persisting conversations to a local file")
+        state_dir = os.path.dirname(PERSISTENCE_FALLBACK_PATH) or "."
+        os.makedirs(state_dir, exist_ok=True)
+        return PicklePersistence(filepath=os.path.join(state_dir, "conversations.pickle"),
+                                 update_interval=PERSISTENCE_UPDATE_INTERVAL)
+    collection = get_mongo_db()["bot_state"]
+    collection.create_index([("kind", 1), ("name", 1)])
+    return MongoPersistence(collection, shared=settings.PERSISTENCE_SHARED)
@@ -0,0 +1,166 @@
+import asyncio
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+import metrics
+from constants import (
+    LOOP_LAG_INTERVAL,
+    LOOP_LAG_WINDOW,
+    PROFILE_MAX_SECONDS,
+    PROFILE_OUTPUT_DIR,
+    PROFILE_SAMPLE_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """
+    Samples the event loop thread's stack from a background thread.
+
+    Nothing is traced in between samples, so it can be switched on in a
+    running bot. Stacks are kept in collapsed form (`a;b;c count`), the input
+    format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.started_at = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._timer = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds=PROFILE_MAX_SECONDS):
+        """Profile the calling thread (the event loop) for at most `seconds`."""
+        if self.running:
+            raise RuntimeError("Profiler is already running")
+        self.stacks = Counter()
+        self.started_at = time.time()
+        self._stop.clear()
+        target = threading.get_ident()
+        self._thread = threading.Thread(target=self._sample, args=(target,), name="profiler", daemon=True)
+        self._thread.start()
+        self._timer = asyncio.get_running_loop().call_later(min(seconds, PROFILE_MAX_SECONDS), self._stop.set)
+
+    def _sample(self, target):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(target)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        """Stop sampling and write the collapsed stacks; returns the file path."""
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        os.makedirs(PROFILE_OUTPUT_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_OUTPUT_DIR, f"profile-{int(self.started_at or time.time())}.collapsed")
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.info("Profile written", extra={"path": path, "samples": sum(self.stacks.values())})
+        return path
+
+    def top_functions(self, limit=10):
+        """Functions by share of samples in which they were on the stack (inclusive time)."""
+        total = sum(self.stacks.values())
+        inclusive = Counter()
+        for stack, count in self.stacks.items():
+            for name in set(stack.split(";")):
+                inclusive[name] += count
+        return [(name, count / total) for name, count in inclusive.most_common(limit)] if total else []
+
+
+class LoopLagMonitor:
+    """Measures how late a periodic sleep wakes up: time the event loop spent blocked."""
+
+    def __init__(self, interval=LOOP_LAG_INTERVAL, window=LOOP_LAG_WINDOW):
+        self.interval = interval
+        self.samples = deque(maxlen=window)
+        self._task = None
+
+    def ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.samples.append(lag)
+            metrics.EVENT_LOOP_LAG_SECONDS.observe(lag)
+
+    def snapshot(self):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {"samples": 0, "p50": None, "p99": None, "max": None}
+        return {
+            "samples": len(ordered),
+            "p50": ordered[len(ordered) // 2],
+            "p99": ordered[int(0.99 * (len(ordered) - 1))],
+            "max": ordered[-1],
+        }
+
+
+class HandlerTimings:
+    """Call count, total and worst duration per timed handler."""
+
+    def __init__(self):
+        self.stats = {}  # name -> [calls, total seconds, max seconds]
+
+    def record(self, name, seconds):
+        entry = self.stats.setdefault(name, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+        metrics.HANDLER_SECONDS.labels(name).observe(seconds)
+
+    def slowest(self, limit=10):
+        """(name, calls, mean seconds, max seconds), worst first."""
+        rows = [(name, calls, total / calls, worst) for name, (calls, total, worst) in self.stats.items()]
+        return sorted(rows, key=lambda row: row[3], reverse=True)[:limit]
+
+
+profiler = SamplingProfiler()
+loop_lag = LoopLagMonitor()
+handler_timings = HandlerTimings()
+
+
+def timed(name=None):
+    """Decorator recording an async handler's duration in handler_timings."""
+    def decorator(handler):
+        label = name or handler.__name__
+
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await handler(*args, **kwargs)
+            finally:
+                handler_timings.record(label, time.perf_counter() - start)
+        return wrapper
+    return decorator
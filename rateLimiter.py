@@ -0,0 +1,149 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+
+from constants import MAX_REQUESTS_PER_MINUTE
+
+RATE_LIMIT_MESSAGE = "⏳ You're sending requests too quickly. Please wait a moment and try again."
+IDLE_BUCKET_TTL = 600  # seconds before an idle in-memory bucket is dropped
+MAX_BUCKETS = 10000
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryBucketStore:
+    """Token buckets held in process memory (single-process mode)."""
+
+    def __init__(self):
+        self._buckets = {}  # key -> [tokens, last_refill]
+        self._lock = threading.Lock()
+
+    async def take(self, key, capacity, refill_per_second):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= MAX_BUCKETS:
+                    self._prune(now)
+                bucket = self._buckets[key] = [capacity, now]
+
+            tokens, last = bucket
+            tokens = min(capacity, tokens + (now - last) * refill_per_second)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            bucket[0], bucket[1] = tokens, now
+            return allowed
+
+    def _prune(self, now):
+        stale = [key for key, (_, last) in self._buckets.items() if now - last > IDLE_BUCKET_TTL]
+        for key in stale:
+            del self._buckets[key]
+
+
+class MongoBucketStore:
+    """
+    Token buckets shared across processes through a MongoDB collection.
+
+    Refill and take happen in a single atomic pipeline update using the server
+    clock, so concurrent workers never double-spend a token. The update runs
+    in a worker thread so the event loop never waits on Mongo.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.collection.create_index("updated_at", expireAfterSeconds=IDLE_BUCKET_TTL)
+
+    async def take(self, key, capacity, refill_per_second):
+        return await asyncio.to_thread(self._take, key, capacity, refill_per_second)
+
+    def _take(self, key, capacity, refill_per_second):
+        from pymongo import ReturnDocument
+
+        elapsed_seconds = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000]}
+        doc = self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {
+                    "tokens": {"$min": [
+                        capacity,
+                        {"$add": [{"$ifNull": ["$tokens", capacity]},
+                                  {"$multiply": [elapsed_seconds, refill_per_second]}]},
+                    ]},
+                    "updated_at": "$$NOW",
+                }},
+                {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+                {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]}}},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc["allowed"]
+
+
+class RateLimiter:
+    """Per-user, per-command token bucket rate limiter."""
+
+    def __init__(self, store=None, capacity=MAX_REQUESTS_PER_MINUTE, period_seconds=60):
+        self.store = store or InMemoryBucketStore()
+        self.capacity = capacity
+        self.refill_per_second = capacity / period_seconds
+        self._notified = set()  # (user_id, command) already told they are limited
+
+    async def allow(self, user_id, command):
+        """Take a token for this user and command. Returns False if the bucket is empty."""
+        key = f"{user_id}:{command}"
+        try:
+            allowed = await self.store.take(key, self.capacity, self.refill_per_second)
+        except Exception as e:
+            # Never lock users out because the shared store is unavailable
+            logger.warning("Rate limit store error, allowing request: %s", e)
+            return True
+        if allowed:
+            self._notified.discard((user_id, command))
+        return allowed
+
+    def limit(self, command):
+        """
+        Decorator for telegram handlers.
+
+        `command` is either a fixed command name or a callable taking the update
+        and returning the command name to charge (or None to skip limiting).
+        """
+        def decorator(handler):
+            @functools.wraps(handler)
+            async def wrapper(update, context, *args, **kwargs):
+                name = command(update) if callable(command) else command
+                user = update.effective_user
+                if name is None or user is None or await self.allow(user.id, name):
+                    return await handler(update, context, *args, **kwargs)
+                await self._reply_limited(update, user.id, name)
+                return None
+            return wrapper
+        return decorator
+
+    async def _reply_limited(self, update, user_id, command):
+        # Callback queries get a toast, which costs no new message; chat commands
+        # get the notice once per limited stretch and are dropped silently after.
+        if update.callback_query:
+            await update.callback_query.answer(RATE_LIMIT_MESSAGE)
+            return
+        if (user_id, command) in self._notified:
+            return
+        if len(self._notified) >= MAX_BUCKETS:
+            self._notified.clear()
+        self._notified.add((user_id, command))
+        if update.effective_message:
+            await update.effective_message.reply_text(RATE_LIMIT_MESSAGE)
+
+
+def callback_command(update):
+    """Map callback data to the command it should be charged against."""
+    data = update.callback_query.data if update.callback_query else ""
+    if data.startswith("confirm_swap_"):
+        return "confirm_swap"
+    if data.startswith("swap_"):
+        return "swap"
+    return None
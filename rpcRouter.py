@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+import metrics
+from circuitBreaker import ahttp_request, get_breaker, SOLANA_RPC
+from config import get_rpc_router
+from constants import (
+    HEDGE_DEFAULT_DELAY,
+    HEDGE_MAX_DELAY,
+    HEDGE_MIN_DELAY,
+    RPC_ERROR_PENALTY,
+    RPC_EWMA_ALPHA,
+    RPC_LATENCY_WINDOW,
+    RPC_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+# Latency-critical reads that get a hedged duplicate request when the first endpoint is slow
+HEDGED_METHODS = {"getLatestBlockhash", "getTransaction", "getAccountInfo"}
+
+
+class RpcError(RuntimeError):
+    """The endpoint answered with a JSON-RPC error (the request itself was bad or unanswerable)."""
+    pass
+
+
+class RpcEndpoint:
+    """One Solana RPC endpoint with its moving-average latency and error rate."""
+
+    def __init__(self, url):
+        self.url = url
+        self.name = urlparse(url).netloc or url
+        self.upstream = f"{SOLANA_RPC}:{self.name}"
+        self.latency = None  # EWMA of successful call latency, seconds
+        self.error_rate = 0.0  # EWMA of transport failures
+        self.samples = deque(maxlen=RPC_LATENCY_WINDOW)
+
+    def record(self, seconds, ok):
+        self.error_rate += RPC_EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        if not ok:
+            return
+        self.samples.append(seconds)
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += RPC_EWMA_ALPHA * (seconds - self.latency)
+
+    def record_censored(self, seconds):
+        """
+        A request abandoned after `seconds` because it lost a hedge race. Its
+        real latency is unknown but at least that long, so the sample can only
+        raise the estimates; the error rate is left alone.
+        """
+        bound = max(seconds, self.p95() or 0.0, self.latency or 0.0)
+        self.samples.append(bound)
+        if self.latency is None:
+            self.latency = bound
+        else:
+            self.latency += RPC_EWMA_ALPHA * (bound - self.latency)
+
+    def p95(self):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def score(self):
+        """Lower is better. Endpoints without samples score 0 so they get tried."""
+        if self.latency is None:
+            return 0.0
+        return self.latency * (1 + RPC_ERROR_PENALTY * self.error_rate)
+
+    def hedge_delay(self):
+        """How long to wait on this endpoint before hedging: its p95 latency, clamped."""
+        if len(self.samples) < 20:
+            return HEDGE_DEFAULT_DELAY
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, self.p95()))
+
+    def snapshot(self):
+        return {
+            "endpoint": self.name,
+            "latency": self.latency,
+            "error_rate": self.error_rate,
+            "state": get_breaker(self.upstream).snapshot()["state"],
+        }
+
+
+class RpcRouter:
+    """
+    Routes JSON-RPC calls across several endpoints.
+
+    Each call goes to the endpoint with the best latency/error score. For
+    HEDGED_METHODS a duplicate is sent to the runner-up once the first has
+    been outstanding for its p95 latency, and whichever answers first wins.
+    A transport failure falls through to the next endpoint.
+    """
+
+    def __init__(self, urls):
+        if not urls:
+            raise ValueError("RPC router needs at least one endpoint")
+        self.endpoints = [RpcEndpoint(url) for url in urls]
+
+    def ranked(self):
+        def key(endpoint):
+            is_open = get_breaker(endpoint.upstream).snapshot()["state"] == "open"
+            return (is_open, endpoint.score())
+        return sorted(self.endpoints, key=key)
+
+    async def _call_endpoint(self, endpoint, method, params):
+        headers = {"accept": "application/json", "content-type": "application/json"}
+        payload = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+        start = time.perf_counter()
+        try:
+            response = await ahttp_request(
+                endpoint.upstream, "POST", endpoint.url, headers=headers, json=payload, timeout=RPC_TIMEOUT
+            )
+            response.raise_for_status()
+            body = response.json()
+        except asyncio.CancelledError:
+            # Lost a hedge race: the time it had taken so far is only a lower bound on its latency
+            endpoint.record_censored(time.perf_counter() - start)
+            raise
+        except Exception:
+            endpoint.record(time.perf_counter() - start, False)
+            raise
+        endpoint.record(time.perf_counter() - start, True)
+        if "error" in body:
+            raise RpcError(f"{method} failed: {body['error']}")
+        return body.get("result")
+
+    async def call(self, method, params, hedge=None):
+        hedge = method in HEDGED_METHODS if hedge is None else hedge
+        ranked = self.ranked()
+        if not hedge or len(ranked) == 1:
+            return await self._call_with_fallback(ranked, method, params)
+
+        primary_endpoint, backup_endpoint = ranked[0], ranked[1]
+        primary = asyncio.create_task(self._call_endpoint(primary_endpoint, method, params))
+        done, _ = await asyncio.wait({primary}, timeout=primary_endpoint.hedge_delay())
+        if done and (primary.exception() is None or isinstance(primary.exception(), RpcError)):
+            return primary.result()
+
+        # Slow or failed: race the runner-up against the (possibly still running) first request
+        backup = asyncio.create_task(self._call_endpoint(backup_endpoint, method, params))
+        pending = {backup} if done else {primary, backup}
+        error = primary.exception() if done else None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    metrics.RPC_HEDGES_TOTAL.labels("backup" if task is backup else "primary").inc()
+                    return task.result()
+                error = task.exception()
+        raise error
+
+    async def _call_with_fallback(self, ranked, method, params):
+        error = None
+        for endpoint in ranked[:2]:
+            try:
+                return await self._call_endpoint(endpoint, method, params)
+            except RpcError:
+                raise
+            except Exception as e:
+                logger.warning("RPC endpoint failed", extra={"endpoint": endpoint.name, "method": method,
+                                                             "error": str(e)})
+                error = e
+        raise error
+
+    def snapshot(self):
+        return [endpoint.snapshot() for endpoint in self.ranked()]
+
+
+async def rpc_call(method, params, hedge=None):
+    """Single Solana JSON-RPC call through the router; returns the `result` field."""
+    return await get_rpc_router().call(method, params, hedge)
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from base58Codec import b58decode, b58encode
+from validateBtcAddress import is_valid_bitcoin_address, validate_bitcoin_addresses
+
+
+def test_base58_round_trip():
+    for data in (b"", b"\0\0\1", os.urandom(32), b"\0" + os.urandom(24)):
+        assert b58decode(b58encode(data)) == data
+
+
+def test_base58_rejects_characters_outside_the_alphabet():
+    with pytest.raises(ValueError):
+        b58decode("0OIl")
+
+
+@pytest.mark.parametrize("address", [
+    "1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa",
+    "3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy",
+    "bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4",
+    "BC1QW508D6QEJXTDG4Y5R3ZARVARY0C5XW7KV8F3T4",
+    "bc1qrp33g0q5c5txsp9arysrx4k6zdkfs4nce4xj0gdcccefvpysxf3qccfmv3",
+    "bc1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vqzk5jj0",
+])
+def test_valid_bitcoin_addresses(address):
+    assert is_valid_bitcoin_address(address)
+
+
+@pytest.mark.parametrize("address", [
+    "",
+    "1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNb",  # bad base58check checksum
+    "bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t5",  # bad bech32 checksum
+    "bc1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vqh2y7hd",  # taproot with a bech32 checksum
+    "bC1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4",  # mixed case
+    "tb1qw508d6qejxtdg4y5r3zarvary0c5xw7kxpjzsx",  # testnet
+])
+def test_invalid_bitcoin_addresses(address):
+    assert not is_valid_bitcoin_address(address)
+
+
+def test_batch_validation_keeps_order():
+    assert validate_bitcoin_addresses(["1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa", "nope"]) == [True, False]
@@ -0,0 +1,73 @@
+import asyncio
+import struct
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("solders")
+pytest.importorskip("spl")
+
+from solders.hash import Hash
+from solders.keypair import Keypair
+from solders.system_program import ID as SYSTEM_PROGRAM_ID, TransferParams, transfer
+
+import bundleBuilder
+from bundleSimulation import COMPUTE_BUDGET_PROGRAM, SimulationCache, transaction_shape
+from constants import COMPUTE_UNIT_MARGIN, DEFAULT_COMPUTE_UNIT_LIMIT
+from noncePool import NonceAccount, NonceLease
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = SimulationCache()
+    monkeypatch.setattr(bundleBuilder, "simulation_cache", cache)
+    # No lookup tables, and no RPC to fetch them
+    monkeypatch.setattr(bundleBuilder.lookup_tables, "_tables", [])
+    monkeypatch.setattr(bundleBuilder.lookup_tables, "_fetched_at", time.monotonic())
+    return cache
+
+
+def _nonce_lease(payer):
+    account = NonceAccount(Keypair().pubkey())
+    account.value = Hash.new_unique()
+    return NonceLease(account, SimpleNamespace(keypair=payer))
+
+
+def _compute_limit(tx):
+    keys = tx.message.account_keys
+    for ix in tx.message.instructions:
+        if str(keys[ix.program_id_index]) == COMPUTE_BUDGET_PROGRAM:
+            return struct.unpack_from("<I", bytes(ix.data), 1)[0]
+    return None
+
+
+def _compile(payer, nonce=None, blockhash=None):
+    instructions = [transfer(TransferParams(from_pubkey=payer.pubkey(), to_pubkey=Keypair().pubkey(), lamports=1))]
+    return asyncio.run(bundleBuilder.compile_transaction(payer, instructions, blockhash, nonce=nonce))
+
+
+def test_nonce_transaction_hits_the_compute_limit_cache(cache):
+    payer = Keypair()
+    first = _compile(payer, nonce=_nonce_lease(payer))
+    assert _compute_limit(first) == DEFAULT_COMPUTE_UNIT_LIMIT
+
+    cache.record(transaction_shape(first), 10000)
+    second = _compile(payer, nonce=_nonce_lease(payer))
+    assert _compute_limit(second) == int(10000 * COMPUTE_UNIT_MARGIN)
+
+
+def test_nonce_advance_stays_first(cache):
+    payer = Keypair()
+    tx = _compile(payer, nonce=_nonce_lease(payer))
+    first = tx.message.instructions[0]
+    assert tx.message.account_keys[first.program_id_index] == SYSTEM_PROGRAM_ID
+    assert str(tx.message.account_keys[tx.message.instructions[1].program_id_index]) == COMPUTE_BUDGET_PROGRAM
+
+
+def test_blockhash_transaction_hits_the_compute_limit_cache(cache):
+    payer = Keypair()
+    first = _compile(payer, blockhash=Hash.new_unique())
+    cache.record(transaction_shape(first), 10000)
+    second = _compile(payer, blockhash=Hash.new_unique())
+    assert _compute_limit(second) == int(10000 * COMPUTE_UNIT_MARGIN)
@@ -0,0 +1,101 @@
+import pytest
+
+pytest.importorskip("solders")
+pytest.importorskip("spl")
+
+from solders.address_lookup_table_account import AddressLookupTableAccount
+from solders.instruction import AccountMeta, Instruction
+from solders.keypair import Keypair
+from solders.pubkey import Pubkey
+from solders.signature import Signature
+from spl.token.instructions import TransferCheckedParams, TransferParams, transfer, transfer_checked
+
+from benchmarks.fakeUpstreams import TOKEN_PROGRAM_ID, encode_transaction
+from constants import USDC_DECIMALS, USDC_MINT
+from transferDecoder import decode_transfers
+
+TOKEN_PROGRAM = Pubkey.from_string(TOKEN_PROGRAM_ID)
+MEMO_PROGRAM = Pubkey.from_string("MemoSq4gqABAXKb96qnH8TysNcwxMyWCqXgDLGmfcHr")
+MINT = Pubkey.from_string(USDC_MINT)
+SIGNATURE = str(Signature.new_unique())
+
+
+@pytest.fixture
+def source():
+    return Keypair().pubkey()
+
+
+@pytest.fixture
+def destination():
+    return Keypair().pubkey()
+
+
+def _transfer_checked(source, destination, amount, mint=MINT):
+    return transfer_checked(TransferCheckedParams(
+        program_id=TOKEN_PROGRAM, source=source, mint=mint, dest=destination,
+        owner=source, amount=amount, decimals=USDC_DECIMALS,
+    ))
+
+
+def _decode(tx_data, destination):
+    return decode_transfers(tx_data, SIGNATURE, str(destination), USDC_MINT)
+
+
+def test_transfer_checked(source, destination):
+    tx_data = encode_transaction(source, [_transfer_checked(source, destination, 1234567)], SIGNATURE,
+                                 block_time=1700000000)
+    [found] = _decode(tx_data, destination)
+    assert found.signature == SIGNATURE
+    assert found.source == str(source)
+    assert found.destination == str(destination)
+    assert found.raw_amount == 1234567
+    assert found.memo is None
+    assert found.block_time == 1700000000
+
+
+def test_plain_transfer(source, destination):
+    instruction = transfer(TransferParams(program_id=TOKEN_PROGRAM, source=source, dest=destination,
+                                          owner=source, amount=42))
+    [found] = _decode(encode_transaction(source, [instruction], SIGNATURE), destination)
+    assert (found.source, found.raw_amount) == (str(source), 42)
+
+
+def test_ignores_other_mints_and_destinations(source, destination):
+    instructions = [
+        _transfer_checked(source, destination, 1, mint=Keypair().pubkey()),
+        _transfer_checked(source, Keypair().pubkey(), 2),
+    ]
+    assert _decode(encode_transaction(source, instructions, SIGNATURE), destination) == []
+
+
+def test_inner_instruction(source, destination):
+    router = Keypair().pubkey()
+    outer = Instruction(router, b"\x01", [
+        AccountMeta(TOKEN_PROGRAM, is_signer=False, is_writable=False),
+        AccountMeta(source, is_signer=True, is_writable=True),
+        AccountMeta(MINT, is_signer=False, is_writable=False),
+        AccountMeta(destination, is_signer=False, is_writable=True),
+    ])
+    tx_data = encode_transaction(source, [outer], SIGNATURE,
+                                 inner_instructions={0: [_transfer_checked(source, destination, 500)]})
+    [found] = _decode(tx_data, destination)
+    assert (found.source, found.raw_amount) == (str(source), 500)
+
+
+def test_accounts_loaded_from_lookup_tables(source, destination):
+    table = AddressLookupTableAccount(Keypair().pubkey(), [Keypair().pubkey(), MINT, destination])
+    tx_data = encode_transaction(source, [_transfer_checked(source, destination, 77)], SIGNATURE,
+                                 lookup_tables=[table])
+    assert tx_data["meta"]["loadedAddresses"]["writable"] == [str(destination)]
+    assert tx_data["meta"]["loadedAddresses"]["readonly"] == [USDC_MINT]
+    [found] = _decode(tx_data, destination)
+    assert found.raw_amount == 77
+
+
+def test_memo_is_attached(source, destination):
+    instructions = [
+        _transfer_checked(source, destination, 10),
+        Instruction(MEMO_PROGRAM, b"lockout:abc123", []),
+    ]
+    [found] = _decode(encode_transaction(source, instructions, SIGNATURE), destination)
+    assert found.memo == "lockout:abc123"
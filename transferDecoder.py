@@ -0,0 +1,73 @@
+import base64
+import struct
+
+from solders.transaction import VersionedTransaction
+
+from base58Codec import b58decode
+from depositIndex import TokenTransfer
+
+TOKEN_PROGRAMS = {
+    "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA",
+    "TokenzQdBNbLqP5VEhdkAS6EPFLC1PHnBqCXEpPxuEb",
+}
+MEMO_PROGRAMS = {
+    "MemoSq4gqABAXKb96qnH8TysNcwxMyWCqXgDLGmfcHr",
+    "Memo1UhkJRfHyvLMcVucJwxXeuD728EqVDDwQDxFMNo",
+}
+TRANSFER = 3  # SPL Token instruction tags
+TRANSFER_CHECKED = 12
+
+
+def _account_keys(tx, meta):
+    """Static keys followed by the keys loaded from lookup tables, as instruction indexes expect."""
+    keys = [str(k) for k in tx.message.account_keys]
+    loaded = meta.get("loadedAddresses") or {}
+    return keys + loaded.get("writable", []) + loaded.get("readonly", [])
+
+
+def _instructions(tx, meta):
+    """(program index, account indexes, data bytes) of every instruction, inner ones after their parent."""
+    inner = {group["index"]: group["instructions"] for group in meta.get("innerInstructions") or []}
+    for index, ix in enumerate(tx.message.instructions):
+        yield ix.program_id_index, bytes(ix.accounts), bytes(ix.data)
+        for inner_ix in inner.get(index, []):
+            yield inner_ix["programIdIndex"], inner_ix["accounts"], b58decode(inner_ix["data"])
+
+
+def decode_transfers(tx_data, signature, destination, mint):
+    """
+    Extract SPL token transfers into `destination` from a base64-encoded
+    getTransaction result, including inner instructions, without a
+    jsonParsed round trip. A memo anywhere in the transaction is attached to
+    each transfer.
+    """
+    tx = VersionedTransaction.from_bytes(base64.b64decode(tx_data["transaction"][0]))
+    meta = tx_data.get("meta") or {}
+    keys = _account_keys(tx, meta)
+
+    memo = None
+    transfers = []
+    for program_index, accounts, data in _instructions(tx, meta):
+        program = keys[program_index]
+        if program in MEMO_PROGRAMS:
+            memo = data.decode("utf-8", errors="replace")
+            continue
+        if program not in TOKEN_PROGRAMS or not data:
+            continue
+        if data[0] == TRANSFER and len(data) >= 9 and len(accounts) >= 3:
+            # Plain transfers carry no mint; the destination is our USDC account
+            source, target = keys[accounts[0]], keys[accounts[1]]
+        elif data[0] == TRANSFER_CHECKED and len(data) >= 10 and len(accounts) >= 4:
+            if keys[accounts[1]] != mint:
+                continue
+            source, target = keys[accounts[0]], keys[accounts[2]]
+        else:
+            continue
+        if target != destination:
+            continue
+        transfers.append((source, struct.unpack_from("<Q", data, 1)[0]))
+
+    return [
+        TokenTransfer(signature, source, destination, raw_amount, memo, tx_data.get("blockTime"))
+        for source, raw_amount in transfers
+    ]
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from config import get_settings, get_users_collection
+from constants import PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+# Only these fields are read; the transaction history arrays stay in Mongo.
+# Registration has written solana_address/bitcoin_address while swaps read
+# sol_wallet/btc_address, so both spellings are fetched.
+PROFILE_PROJECTION = {"sol_wallet": 1, "btc_address": 1, "solana_address": 1, "bitcoin_address": 1}
+
+
+class UserProfile:
+    """A registered user's addresses, with the USDC ATA their deposits come from."""
+
+    __slots__ = ("user_id", "sol_wallet", "btc_address", "usdc_address")
+
+    def __init__(self, user_id, sol_wallet, btc_address, usdc_address=None):
+        self.user_id = user_id
+        self.sol_wallet = sol_wallet
+        self.btc_address = btc_address
+        self.usdc_address = usdc_address
+
+    @classmethod
+    def from_doc(cls, doc):
+        sol_wallet = doc.get("sol_wallet") or doc.get("solana_address")
+        btc_address = doc.get("btc_address") or doc.get("bitcoin_address")
+        usdc_address = None
+        if sol_wallet:
+            from solders.pubkey import Pubkey
+            from spl.token.instructions import get_associated_token_address
+            try:
+                usdc_address = str(get_associated_token_address(
+                    Pubkey.from_string(sol_wallet), Pubkey.from_string(get_settings().USDC_MINT)
+                ))
+            except ValueError:
+                logger.warning("Stored Solana address is invalid", extra={"user_id": doc.get("_id")})
+        return cls(doc.get("_id"), sol_wallet, btc_address, usdc_address)
+
+    @property
+    def registered(self):
+        """Both addresses are on file, so the user can swap."""
+        return bool(self.sol_wallet and self.btc_address)
+
+
+class UserProfileCache:
+    """
+    Read-through LRU cache of user profiles, keyed by Telegram user id.
+
+    A swap looks its user up from several handlers within seconds; only the
+    first lookup reads Mongo. Entries expire after `ttl` seconds so edits made
+    by another process are picked up, and registration invalidates them.
+    Unknown users are not cached, so a user who registers elsewhere is seen
+    straight away.
+    """
+
+    def __init__(self, max_entries=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user_id -> (profile, fetched_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, user_id):
+        """The user's profile, or None if they never registered."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        doc = await asyncio.to_thread(get_users_collection().find_one, {"_id": user_id}, PROFILE_PROJECTION)
+        if doc is None:
+            return None
+        profile = UserProfile.from_doc(doc)
+        with self._lock:
+            self._entries[user_id] = (profile, time.monotonic())
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return profile
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def dump_state(self):
+        """Unexpired profiles with the wall-clock time they were read."""
+        now, wall = time.monotonic(), time.time()
+        with self._lock:
+            return [
+                [p.user_id, p.sol_wallet, p.btc_address, p.usdc_address, wall - (now - fetched_at)]
+                for p, fetched_at in self._entries.values()
+                if now - fetched_at < self.ttl
+            ]
+
+    def load_state(self, state):
+        now, wall = time.monotonic(), time.time()
+        with self._lock:
+            for user_id, sol_wallet, btc_address, usdc_address, read_at in state:
+                age = wall - read_at
+                if age < self.ttl and user_id not in self._entries:
+                    self._entries[user_id] = (UserProfile(user_id, sol_wallet, btc_address, usdc_address), now - age)
+
+    def snapshot(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+profile_cache = UserProfileCache()
@@ -1,5 +1,90 @@
-import re
+import hashlib
+from functools import lru_cache
 
+from constants import ADDRESS_CACHE_SIZE
+from base58Codec import b58decode
+
+# Mainnet only: ChangeNOW pays out on the Bitcoin mainnet
+BECH32_HRP = "bc"
+BASE58_VERSIONS = {0x00, 0x05}  # P2PKH, P2SH
+
+BECH32_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+BECH32_CONST = 1
+BECH32M_CONST = 0x2BC830A3
+
+
+def _bech32_polymod(values):
+    generator = [0x3B6A57B2, 0x26508E6D, 0x1EA119FA, 0x3D4233DD, 0x2A1462B3]
+    chk = 1
+    for value in values:
+        top = chk >> 25
+        chk = (chk & 0x1FFFFFF) << 5 ^ value
+        for i in range(5):
+            chk ^= generator[i] if (top >> i) & 1 else 0
+    return chk
+
+
+def _convert_bits(data, from_bits, to_bits):
+    """Regroup 5-bit words into bytes (BIP-173); None if the padding is invalid."""
+    acc = bits = 0
+    out = []
+    max_value = (1 << to_bits) - 1
+    for value in data:
+        acc = (acc << from_bits) | value
+        bits += from_bits
+        while bits >= to_bits:
+            bits -= to_bits
+            out.append((acc >> bits) & max_value)
+    if bits >= from_bits or (acc << (to_bits - bits)) & max_value:
+        return None
+    return out
+
+
+def _is_valid_segwit(address):
+    """bech32 (witness v0) or bech32m (v1+, e.g. taproot) per BIP-173/BIP-350."""
+    if address.lower() != address and address.upper() != address or len(address) > 90:
+        return False
+    address = address.lower()
+    hrp, sep, data = address.rpartition("1")
+    if hrp != BECH32_HRP or len(data) < 6 or any(c not in BECH32_CHARSET for c in data):
+        return False
+    words = [BECH32_CHARSET.index(c) for c in data]
+    expanded_hrp = [ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp]
+    const = _bech32_polymod(expanded_hrp + words)
+
+    payload = words[:-6]
+    if not payload:
+        return False
+    version, program = payload[0], _convert_bits(payload[1:], 5, 8)
+    if program is None or version > 16 or not 2 <= len(program) <= 40:
+        return False
+    if version == 0:
+        return const == BECH32_CONST and len(program) in (20, 32)
+    return const == BECH32M_CONST
+
+
+def _is_valid_base58check(address):
+    """Legacy P2PKH/P2SH: version byte, 20-byte hash and a double-SHA256 checksum."""
+    try:
+        raw = b58decode(address)
+    except ValueError:
+        return False
+    if len(raw) != 25 or raw[0] not in BASE58_VERSIONS:
+        return False
+    checksum = hashlib.sha256(hashlib.sha256(raw[:-4]).digest()).digest()[:4]
+    return raw[-4:] == checksum
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
 def is_valid_bitcoin_address(address):
-    # Validate Bitcoin address (P2PKH, P2SH, or Bech32)
-    return re.match(r"^(bc1|[13])[a-zA-HJ-NP-Z0-9]{25,39}$", address) is not None
\ No newline at end of file
+    # Validate Bitcoin address (P2PKH, P2SH, or SegWit/Taproot) including its checksum
+    if address[:3].lower() == "bc1":
+        return _is_valid_segwit(address)
+    if address[:1] in ("1", "3") and 26 <= len(address) <= 35:
+        return _is_valid_base58check(address)
+    return False
+
+
+def validate_bitcoin_addresses(addresses):
+    """Validity of each address, in order, for bulk imports."""
+    return [is_valid_bitcoin_address(address) for address in addresses]
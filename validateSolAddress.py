@@ -1,9 +1,30 @@
-import re
+from functools import lru_cache
 
+from solders.pubkey import Pubkey
+
+from constants import ADDRESS_CACHE_SIZE
+from base58Codec import b58decode
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
 def is_valid_solana_address(address):
     """
-    Validates Solana wallet addresses using regex
-    - Must be base58 encoded (1-9, A-H, J-N, P-Z, a-k, m-z)
-    - Length between 32-44 characters
+    Validates a Solana wallet address:
+    - Must be base58 that decodes to exactly 32 bytes
+    - Must be on the ed25519 curve, since a wallet has to be able to sign;
+      program-derived addresses are off-curve and cannot be deposit sources
     """
-    return re.match(r"^[1-9A-HJ-NP-Za-km-z]{32,44}$", address) is not None
\ No newline at end of file
+    if not 32 <= len(address) <= 44:
+        return False
+    try:
+        raw = b58decode(address)
+    except ValueError:
+        return False
+    if len(raw) != 32:
+        return False
+    return Pubkey(raw).is_on_curve()
+
+
+def validate_solana_addresses(addresses):
+    """Validity of each address, in order, for bulk imports."""
+    return [is_valid_solana_address(address) for address in addresses]
@@ -1,166 +1,232 @@
-import requests
 import asyncio
+import logging
 import datetime
+import time
+from collections import OrderedDict
 from solders.pubkey import Pubkey
 from spl.token.instructions import get_associated_token_address
-import os
-from dotenv import load_dotenv
+from config import get_settings, get_wallet_pool
+from deadlineScheduler import DeadlineScheduler
+from rpcRouter import rpc_call
+from depositIndex import PendingDepositIndex, from_raw_amount
+from transferDecoder import decode_transfers
 
-load_dotenv()
+TIMEOUT_MINUTES = 10
+CHECK_INTERVAL_SECONDS = 15
+INITIAL_SCAN_LIMIT = 20  # signatures looked at on the first scan after startup
+PAGE_SIZE = 1000  # getSignaturesForAddress maximum
+MAX_SEEN_SIGNATURES = 50000
+CURSOR_MAX_AGE_SECONDS = 3600  # older saved cursors are dropped; the first scan then looks at INITIAL_SCAN_LIMIT
 
-SOLANA_RPC_URL = os.getenv("SOLANA_RPC_URL")
-USDC_MINT = os.getenv("USDC_MINT")
+logger = logging.getLogger(__name__)
 
 
-async def verify_usdc_deposit(expected_amount, user_sol_address, users_collection):
+class DepositWatcher:
     """
-    Verify that the USDC deposit has been received in the intermediary wallet's USDC address.
-    Checks periodically for 10 minutes before timing out.
-    Returns True if deposit is confirmed, False otherwise.
+    Scans one intermediary USDC account once per interval on behalf of every
+    pending swap assigned to it, and resolves each swap's future when its
+    deposit arrives. Each wallet in the pool has its own watcher and cursor.
+
+    Only signatures newer than the last scan are fetched, and each transaction
+    is decoded once, so the cost per interval depends on deposit traffic rather
+    than on the number of users waiting.
     """
-    TIMEOUT_MINUTES = 10
-    CHECK_INTERVAL_SECONDS = 15
-    max_attempts = (TIMEOUT_MINUTES * 60) // CHECK_INTERVAL_SECONDS
-    INTERMEDIARY_USDC_ADDRESS = "3T8re2uQJvbHLiE5QsfXJKMtj5DmWEoWe23cXsB6gmjo"
-    
-    try:
-        # Get user's USDC ATA
+
+    def __init__(self, index, destination):
+        self.index = index
+        self.destination = destination
+        self.waiters = {}  # swap_id -> asyncio.Future
+        self.cursor = None  # newest signature already listed
+        self.seen = OrderedDict()  # signatures already decoded, oldest first
+        self.retry = set()  # signatures whose getTransaction failed
+        self._task = None
+
+    def ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def dump_state(self):
+        return {"cursor": self.cursor, "seen": list(self.seen), "saved_at": time.time()}
+
+    def load_state(self, state):
+        """Restore the already-decoded signatures, and the cursor unless it is too old to page back to."""
+        for signature in state["seen"]:
+            self.seen[signature] = None
+        if self.cursor is None and time.time() - state["saved_at"] < CURSOR_MAX_AGE_SECONDS:
+            self.cursor = state["cursor"]
+
+    async def _run(self):
+        while self.waiters:
+            try:
+                await self.scan_once()
+            except Exception:
+                logger.exception("Deposit scan failed")
+            await asyncio.sleep(CHECK_INTERVAL_SECONDS)
+
+    async def _new_signatures(self, address):
+        signatures = []
+        before = None
+        while True:
+            options = {"limit": PAGE_SIZE if self.cursor else INITIAL_SCAN_LIMIT, "commitment": "confirmed"}
+            if self.cursor:
+                options["until"] = self.cursor
+            if before:
+                options["before"] = before
+            page = await rpc_call("getSignaturesForAddress", [address, options]) or []
+            signatures.extend(page)
+            if not self.cursor or len(page) < PAGE_SIZE:
+                break
+            before = page[-1]["signature"]
+
+        if signatures:
+            self.cursor = signatures[0]["signature"]
+        return [s["signature"] for s in signatures if s.get("err") is None and s["signature"] not in self.seen]
+
+    async def _fetch_transfers(self, signature, destination, mint):
+        try:
+            tx_data = await rpc_call("getTransaction", [
+                signature,
+                {"encoding": "base64", "commitment": "confirmed", "maxSupportedTransactionVersion": 0},
+            ])
+        except Exception as e:
+            logger.warning("getTransaction failed, will retry", extra={"signature": signature, "error": str(e)})
+            self.retry.add(signature)
+            return []
+
+        self.retry.discard(signature)
+        self.seen[signature] = None
+        while len(self.seen) > MAX_SEEN_SIGNATURES:
+            self.seen.popitem(last=False)
+        if not tx_data or "transaction" not in tx_data:
+            return []
+        try:
+            return decode_transfers(tx_data, signature, destination, mint)
+        except Exception as e:
+            logger.warning("Undecodable transaction", extra={"signature": signature, "error": str(e)})
+            return []
+
+    async def scan_once(self):
+        settings = get_settings()
+        destination = self.destination
+        signatures = await self._new_signatures(destination)
+        signatures.extend(self.retry - set(signatures))
+
+        results = await asyncio.gather(
+            *(self._fetch_transfers(sig, destination, settings.USDC_MINT) for sig in signatures)
+        )
+        for transfers in results:
+            for transfer in transfers:
+                logger.debug("Checking transfer", extra={"signature": transfer.signature, "sampled": True})
+                self._dispatch(transfer)
+
+    def _dispatch(self, transfer):
+        pending = self.index.match(transfer)
+        if pending is None:
+            logger.info("Unattributed USDC transfer", extra={
+                "signature": transfer.signature,
+                "source": transfer.source,
+                "amount": from_raw_amount(transfer.raw_amount),
+            })
+            return
+        pending.transfer = transfer
+        future = self.waiters.get(pending.swap_id)
+        if future is not None and not future.done():
+            future.set_result(transfer)
+
+
+deposit_index = PendingDepositIndex()
+deposit_watchers = {}  # intermediary USDC address -> DepositWatcher
+deposit_deadlines = DeadlineScheduler()
+
+
+def get_deposit_watcher(destination):
+    watcher = deposit_watchers.get(destination)
+    if watcher is None:
+        watcher = deposit_watchers[destination] = DepositWatcher(deposit_index, destination)
+    return watcher
+
+
+def register_deposit(amount, minimum_amount, user_sol_address, swap_id=None, wallet=None, user_usdc_address=None):
+    """
+    Reserve a unique deposit reference (exact amount and memo) for a new swap,
+    payable into `wallet` (default: the first wallet of the pool).
+    `user_usdc_address` is the user's USDC ATA when already known (see userProfiles).
+    Returns the PendingDeposit to show the user and pass to verify_usdc_deposit.
+    """
+    wallet = wallet or get_wallet_pool().wallets[0]
+    if user_usdc_address is None:
         user_pubkey = Pubkey.from_string(user_sol_address)
-        usdc_mint_pubkey = Pubkey.from_string(USDC_MINT)
+        usdc_mint_pubkey = Pubkey.from_string(get_settings().USDC_MINT)
         user_usdc_address = str(get_associated_token_address(user_pubkey, usdc_mint_pubkey))
-        
-        print(f"Looking for transfers from user's USDC address: {user_usdc_address}")
-        
-        # Get user's document from MongoDB
-        user = users_collection.find_one({"sol_wallet": user_sol_address})
-        if not user:
-            print("User not found in database")
-            return False
-            
-        # Initialize processed_transactions array if it doesn't exist
-        if 'processed_transactions' not in user:
-            users_collection.update_one(
-                {"sol_wallet": user_sol_address},
-                {"$set": {"processed_transactions": []}}
-            )
-        
-        for attempt in range(max_attempts):
-            print(f"\nScanning recent transactions...")
-            
-            # Get recent signatures for the intermediary USDC token account
-            headers = {"accept": "application/json", "content-type": "application/json"}
-            payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "getSignaturesForAddress",
-                "params": [
-                    INTERMEDIARY_USDC_ADDRESS,
-                    {
-                        "limit": 20,
-                        "commitment": "confirmed"
-                    }
-                ]
-            }
+    return deposit_index.register(
+        user_sol_address, user_usdc_address, amount, minimum_amount, swap_id, wallet.usdc_address
+    )
 
-            response = requests.post(SOLANA_RPC_URL, headers=headers, json=payload)
-            signatures = response.json().get("result", [])
-
-            for sig_info in signatures:
-                tx_sig = sig_info['signature']
-                
-                # Check if transaction has already been processed
-                user = users_collection.find_one({
-                    "sol_wallet": user_sol_address,
-                    "processed_transactions": tx_sig
-                })
-                
-                if user:
-                    print(f"Transaction {tx_sig} already processed, skipping...")
-                    continue
-                    
-                print(f"Checking tx: {tx_sig}")
-                
-                # Get detailed transaction info
-                tx_payload = {
-                    "jsonrpc": "2.0",
-                    "id": 1,
-                    "method": "getTransaction",
-                    "params": [
-                        tx_sig,
-                        {
-                            "encoding": "jsonParsed",
-                            "commitment": "confirmed",
-                            "maxSupportedTransactionVersion": 0
-                        }
-                    ]
-                }
-                
-                tx_response = requests.post(SOLANA_RPC_URL, headers=headers, json=tx_payload)
-                tx_data = tx_response.json().get("result", {})
-
-                if not tx_data or 'transaction' not in tx_data:
-                    continue
-
-                # Look for token transfers in the transaction
-                message = tx_data['transaction'].get('message', {})
-                instructions = message.get('instructions', [])
-                
-                for instruction in instructions:
-                    if instruction.get('program') == 'spl-token' and 'parsed' in instruction:
-                        parsed = instruction['parsed']
-                        
-                        if parsed.get('type') == 'transferChecked' and 'info' in parsed:
-                            info = parsed['info']
-                            
-                            # Check if this is a USDC transfer from user's USDC address to our intermediary
-                            if (info.get('mint') == USDC_MINT and 
-                                info.get('source') == user_usdc_address and
-                                info.get('destination') == INTERMEDIARY_USDC_ADDRESS):
-                                
-                                amount = float(info['tokenAmount']['uiAmount'])
-                                
-                                print(f"💰 USDC Transfer Found:")
-                                print(f"Amount: {amount} USDC")
-                                print(f"From: {user_usdc_address}")
-                                print(f"To: {INTERMEDIARY_USDC_ADDRESS}")
-                                
-                                # Store transaction details with initial status
-                                tx_details = {
-                                    "signature": tx_sig,
-                                    "amount": amount,
-                                    "timestamp": datetime.datetime.now(),
-                                    "type": "USDC_deposit",
-                                    "status": "processing",
-                                    "changenow_id": None,
-                                    "changenow_status": None,
-                                    "outbound_tx": None
-                                }
-                                
-                                # Add transaction to processed list with processing status
-                                users_collection.update_one(
-                                    {"sol_wallet": user_sol_address},
-                                    {
-                                        "$push": {
-                                            "processed_transactions": tx_sig,
-                                            "transaction_history": tx_details
-                                        }
-                                    }
-                                )
-                                
-                                # Check if this matches our expected amount
-                                if amount >= expected_amount:
-                                    print(f"✅ Expected deposit verified: {amount} USDC")
-                                    return True
-
-            if attempt < max_attempts - 1:
-                remaining_seconds = TIMEOUT_MINUTES * 60 - (attempt + 1) * CHECK_INTERVAL_SECONDS
-                print(f"\nWaiting {CHECK_INTERVAL_SECONDS} seconds... "
-                      f"({remaining_seconds // 60}m {remaining_seconds % 60}s remaining)")
-                await asyncio.sleep(CHECK_INTERVAL_SECONDS)
-            
-        print(f"\nDeposit verification timed out after {TIMEOUT_MINUTES} minutes.")
+
+async def verify_usdc_deposit(pending, users_writes, user_id=None):
+    """
+    Wait for the deposit of a registered swap to arrive in the intermediary wallet's USDC address.
+    Times out after 10 minutes. The deposit is queued on the `users_writes`
+    buffer for the user `user_id`, or for whoever has the depositing wallet
+    when no id is given.
+    Returns True if deposit is confirmed, False otherwise.
+    """
+    future = asyncio.get_running_loop().create_future()
+    deposit_watcher = get_deposit_watcher(pending.deposit_address)
+    deposit_watcher.waiters[pending.swap_id] = future
+    deposit_watcher.ensure_running()
+    deadline = deposit_deadlines.schedule(future, TIMEOUT_MINUTES * 60)
+    logger.info("Waiting for USDC deposit", extra={
+        "source": pending.source_ata,
+        "reference_amount": pending.reference_amount,
+        "memo": pending.memo,
+        "deposit_address": pending.deposit_address,
+    })
+
+    try:
+        transfer = await future
+    except asyncio.TimeoutError:
+        logger.info("Deposit verification timed out", extra={"timeout_minutes": TIMEOUT_MINUTES})
         return False
-        
-    except Exception as e:
-        print(f"Error verifying deposit: {str(e)}")
+    except Exception:
+        logger.exception("Error verifying deposit")
         return False
+    finally:
+        deposit_deadlines.cancel(deadline)
+        deposit_watcher.waiters.pop(pending.swap_id, None)
+        deposit_index.remove(pending)
+
+    wallet = get_wallet_pool().get(pending.deposit_address)
+    if wallet is not None:
+        # The cached balance may or may not include this deposit already; have the next reserve re-read it
+        wallet.reconciled_at = 0
+
+    amount = from_raw_amount(transfer.raw_amount)
+    logger.info("Expected deposit verified", extra={"signature": transfer.signature, "amount": amount})
+
+    # Store transaction details with initial status
+    tx_details = {
+        "signature": transfer.signature,
+        "amount": amount,
+        "timestamp": datetime.datetime.now(),
+        "type": "USDC_deposit",
+        "status": "processing",
+        "swap_id": pending.swap_id,
+        "source": transfer.source,
+        "changenow_id": None,
+        "changenow_status": None,
+        "outbound_tx": None
+    }
+    # Money state: the record that this deposit was consumed must be durable before any funds move,
+    # so it is written now rather than left in the buffer (a rejected write raises and stops the swap)
+    await users_writes.update_one(
+        {"_id": user_id} if user_id is not None else {"sol_wallet": pending.user_sol_address},
+        {
+            "$push": {
+                "processed_transactions": transfer.signature,
+                "transaction_history": tx_details
+            }
+        },
+        critical=True
+    )
+    return True
@@ -0,0 +1,196 @@
+import asyncio
+import itertools
+import logging
+import threading
+import time
+
+from constants import BALANCE_RECONCILE_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientBalanceError(Exception):
+    """Raised when a wallet cannot cover a reservation on top of those already held."""
+    pass
+
+
+class IntermediaryWallet:
+    """One hot wallet that receives deposits and signs the outgoing transfer, fee swap and tip."""
+
+    def __init__(self, index, keypair, usdc_address):
+        self.index = index
+        self.keypair = keypair
+        self.pubkey = str(keypair.pubkey())
+        self.usdc_address = usdc_address
+        self.active_swaps = 0
+        self.usdc_raw_balance = None  # last known on-chain balances
+        self.lamports = None
+        self.reserved_usdc_raw = 0  # held by swaps whose bundle has not settled yet
+        self.reserved_lamports = 0
+        self.reconciled_at = None
+
+    @property
+    def available_usdc_raw(self):
+        return (self.usdc_raw_balance or 0) - self.reserved_usdc_raw
+
+    @property
+    def available_lamports(self):
+        return (self.lamports or 0) - self.reserved_lamports
+
+
+class Reservation:
+    """Funds one swap holds in its wallet until its bundle lands (commit) or fails (cancel)."""
+
+    def __init__(self, wallet, usdc_raw, lamports):
+        self.wallet = wallet
+        self.usdc_raw = usdc_raw
+        self.lamports = lamports
+        self.settled = False
+
+
+class WalletPool:
+    """
+    Pool of intermediary wallets.
+
+    Each swap is assigned the least busy wallet, receives its deposit there and
+    has its transactions signed by it, so no single account is the write-lock
+    and scan hotspot for every swap.
+
+    The pool is also the balance ledger: swaps reserve the USDC and lamports
+    their bundle will spend before building it, so concurrent swaps cannot
+    over-commit a wallet, and known balances are reconciled against the chain
+    every BALANCE_RECONCILE_INTERVAL seconds while reservations are held.
+    """
+
+    def __init__(self, wallets):
+        if not wallets:
+            raise ValueError("Wallet pool needs at least one wallet")
+        self.wallets = wallets
+        self.by_usdc_address = {w.usdc_address: w for w in wallets}
+        self._round_robin = itertools.cycle(range(len(wallets)))
+        self._lock = threading.Lock()
+        self._reconcile_task = None
+
+    def assign(self):
+        """Pick the wallet with the fewest active swaps (round robin between ties) and mark it busy."""
+        with self._lock:
+            start = next(self._round_robin)
+            ordered = self.wallets[start:] + self.wallets[:start]
+            wallet = min(ordered, key=lambda w: w.active_swaps)
+            wallet.active_swaps += 1
+            return wallet
+
+    def release(self, wallet):
+        with self._lock:
+            wallet.active_swaps = max(0, wallet.active_swaps - 1)
+
+    def get(self, usdc_address):
+        return self.by_usdc_address.get(usdc_address)
+
+    async def refresh_balances(self, rpc_call, wallets=None):
+        """Fetch USDC and SOL balances of every wallet (or just `wallets`) in parallel."""
+        async def refresh(wallet):
+            try:
+                token_balance, sol_balance = await asyncio.gather(
+                    rpc_call("getTokenAccountBalance", [wallet.usdc_address, {"commitment": "confirmed"}]),
+                    rpc_call("getBalance", [wallet.pubkey, {"commitment": "confirmed"}]),
+                )
+                with self._lock:
+                    wallet.usdc_raw_balance = int(token_balance["value"]["amount"])
+                    wallet.lamports = int(sol_balance["value"])
+                    wallet.reconciled_at = time.time()
+            except Exception as e:
+                logger.warning("Balance refresh failed", extra={"wallet": wallet.pubkey, "error": str(e)})
+
+        await asyncio.gather(*(refresh(w) for w in (wallets or self.wallets)))
+
+    async def reserve(self, wallet, usdc_raw, lamports, rpc_call):
+        """
+        Hold `usdc_raw` and `lamports` of the wallet's balance for one swap.
+        Raises InsufficientBalanceError if the unreserved balance is too small.
+        """
+        if wallet.reconciled_at is None or time.time() - wallet.reconciled_at > BALANCE_RECONCILE_INTERVAL:
+            await self.refresh_balances(rpc_call, [wallet])
+        with self._lock:
+            if wallet.usdc_raw_balance is None or wallet.lamports is None:
+                raise InsufficientBalanceError(f"Balance of wallet {wallet.pubkey} is unknown")
+            if usdc_raw > wallet.available_usdc_raw or lamports > wallet.available_lamports:
+                raise InsufficientBalanceError(
+                    f"Wallet {wallet.pubkey} cannot cover {usdc_raw} USDC units and {lamports} lamports "
+                    f"(available {wallet.available_usdc_raw} and {wallet.available_lamports})"
+                )
+            wallet.reserved_usdc_raw += usdc_raw
+            wallet.reserved_lamports += lamports
+        self.ensure_reconciling(rpc_call)
+        return Reservation(wallet, usdc_raw, lamports)
+
+    def cancel(self, reservation):
+        """Give the funds back, e.g. when the swap fails before its bundle is sent."""
+        self._settle(reservation, spent=False)
+
+    def commit(self, reservation):
+        """Record the funds as spent once the bundle has landed."""
+        self._settle(reservation, spent=True)
+
+    def _settle(self, reservation, spent):
+        wallet = reservation.wallet
+        with self._lock:
+            if reservation.settled:
+                return
+            reservation.settled = True
+            wallet.reserved_usdc_raw -= reservation.usdc_raw
+            wallet.reserved_lamports -= reservation.lamports
+            if spent:
+                # Debit the known balance until the next reconciliation reads it from the chain
+                wallet.usdc_raw_balance -= reservation.usdc_raw
+                wallet.lamports -= reservation.lamports
+
+    def ensure_reconciling(self, rpc_call):
+        if self._reconcile_task is None or self._reconcile_task.done():
+            self._reconcile_task = asyncio.create_task(self._reconcile(rpc_call))
+
+    async def _reconcile(self, rpc_call):
+        while any(w.reserved_usdc_raw or w.reserved_lamports for w in self.wallets):
+            await asyncio.sleep(BALANCE_RECONCILE_INTERVAL)
+            await self.refresh_balances(rpc_call)
+
+    def snapshot(self):
+        return [
+            {
+                "wallet": w.pubkey,
+                "usdc_address": w.usdc_address,
+                "active_swaps": w.active_swaps,
+                "usdc_raw_balance": w.usdc_raw_balance,
+                "lamports": w.lamports,
+                "reserved_usdc_raw": w.reserved_usdc_raw,
+                "reserved_lamports": w.reserved_lamports,
+                "reconciled_at": w.reconciled_at,
+            }
+            for w in self.wallets
+        ]
+
+
+def build_wallet_pool(settings):
+    """
+    Build the pool from INTERMEDIARY_PRIVATE_KEYS (comma-separated base58 keys),
+    falling back to the single PRIVATE_KEY wallet. Each wallet receives deposits
+    in its own USDC ATA, derived from its key so the address shown to users and
+    the address scanned can never diverge.
+    """
+    from solders.keypair import Keypair
+    from solders.pubkey import Pubkey
+    from spl.token.instructions import get_associated_token_address
+
+    usdc_mint = Pubkey.from_string(settings.USDC_MINT)
+    keys = []
+    if settings.INTERMEDIARY_PRIVATE_KEYS is not None:
+        keys = [k.strip() for k in settings.INTERMEDIARY_PRIVATE_KEYS.get_secret_value().split(",") if k.strip()]
+    if not keys:
+        keys = [settings.secret("PRIVATE_KEY")]
+
+    wallets = []
+    for i, key in enumerate(keys):
+        keypair = Keypair.from_base58_string(key)
+        usdc_address = str(get_associated_token_address(keypair.pubkey(), usdc_mint))
+        wallets.append(IntermediaryWallet(i, keypair, usdc_address))
+    return WalletPool(wallets)
@@ -0,0 +1,108 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+
+import getMinimumAmt
+from bundleSimulation import simulation_cache
+from constants import WARM_START_INTERVAL, WARM_START_MAX_AGE, WARM_START_PATH
+from getRatePreview import price_engine
+from userProfiles import profile_cache
+from verifyDeposit import deposit_watchers, get_deposit_watcher
+
+logger = logging.getLogger(__name__)
+
+
+def _dump_watchers():
+    return {destination: watcher.dump_state() for destination, watcher in deposit_watchers.items()}
+
+
+def _load_watchers(state):
+    for destination, watcher_state in state.items():
+        get_deposit_watcher(destination).load_state(watcher_state)
+
+
+# section -> (dump, load); each section carries its own timestamps and drops what is stale on load
+SECTIONS = {
+    "prices": (price_engine.dump_state, price_engine.load_state),
+    "min_amounts": (getMinimumAmt.dump_state, getMinimumAmt.load_state),
+    "profiles": (profile_cache.dump_state, profile_cache.load_state),
+    "deposit_watchers": (_dump_watchers, _load_watchers),
+    "simulations": (simulation_cache.dump_state, simulation_cache.load_state),
+}
+
+
+class WarmStart:
+    """
+    Periodically saves in-memory caches and scan cursors to a gzipped JSON
+    file and restores them at startup, so a restarted bot neither starts cold
+    nor re-asks every upstream at once. A snapshot older than
+    WARM_START_MAX_AGE is ignored as a whole.
+    """
+
+    def __init__(self, path=WARM_START_PATH, interval=WARM_START_INTERVAL, max_age=WARM_START_MAX_AGE):
+        self.path = path
+        self.interval = interval
+        self.max_age = max_age
+        self._task = None
+
+    def _write(self, snapshot):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with gzip.open(tmp, "wt") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(tmp, self.path)  # never leave a half-written snapshot behind
+
+    async def save(self):
+        snapshot = {"saved_at": time.time()}
+        for name, (dump, _) in SECTIONS.items():
+            try:
+                snapshot[name] = dump()
+            except Exception as e:
+                logger.warning("Warm start section not saved", extra={"section": name, "error": str(e)})
+        await asyncio.to_thread(self._write, snapshot)
+        logger.debug("Warm start snapshot saved", extra={"path": self.path})
+
+    def load(self):
+        """Restore whatever the last snapshot holds that is still fresh; returns the sections restored."""
+        try:
+            with gzip.open(self.path, "rt") as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logger.warning("Unreadable warm start snapshot", extra={"path": self.path, "error": str(e)})
+            return []
+
+        age = time.time() - snapshot.get("saved_at", 0)
+        if age > self.max_age:
+            logger.info("Warm start snapshot too old, starting cold", extra={"age": age})
+            return []
+        restored = []
+        for name, (_, load) in SECTIONS.items():
+            if name not in snapshot:
+                continue
+            try:
+                load(snapshot[name])
+                restored.append(name)
+            except Exception as e:
+                logger.warning("Warm start section not restored", extra={"section": name, "error": str(e)})
+        logger.info("Warm start snapshot restored", extra={"age": age, "sections": restored})
+        return restored
+
+    def ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.save()
+            except Exception:
+                logger.exception("Warm start snapshot failed")
+
+
+warm_start = WarmStart()
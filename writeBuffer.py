@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from collections import deque
+
+import metrics
+from constants import WRITE_BUFFER_MAX_DELAY, WRITE_BUFFER_MAX_OPS
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBuffer:
+    """
+    Write-behind buffer for one Mongo collection.
+
+    Updates are queued and sent as ordered bulk_write batches once
+    WRITE_BUFFER_MAX_OPS are waiting or the oldest has waited
+    WRITE_BUFFER_MAX_DELAY seconds. Batches run in a worker thread, one at a
+    time and in enqueue order, so a later write never lands before an
+    earlier one. A critical write is flushed before update_one returns,
+    together with everything queued ahead of it; concurrent critical writes
+    share one round trip. A failed batch stays at the head of the queue and
+    is retried by the next flush.
+    """
+
+    def __init__(self, collection, max_ops=WRITE_BUFFER_MAX_OPS, max_delay=WRITE_BUFFER_MAX_DELAY):
+        self.collection = collection
+        self.max_ops = max_ops
+        self.max_delay = max_delay
+        self._queue = deque()  # (seq, UpdateOne, critical)
+        self._enqueued = 0  # seq of the newest queued write
+        self._written = 0  # seq of the newest write sent (applied, or rejected by Mongo)
+        self._rejected = set()  # seqs of critical writes Mongo rejected
+        self._lock = asyncio.Lock()
+        self._timer = None
+        self._flushes = set()
+
+    async def update_one(self, filter, update, upsert=False, critical=False):
+        """Queue an update; with `critical`, return only once it is written (raises if it cannot be)."""
+        from pymongo import UpdateOne
+
+        self._enqueued += 1
+        seq = self._enqueued
+        self._queue.append((seq, UpdateOne(filter, update, upsert=upsert), critical))
+        if critical:
+            await self.flush(until=seq)
+            if self._written < seq or seq in self._rejected:
+                self._rejected.discard(seq)
+                raise RuntimeError("Critical write was not applied")
+        elif len(self._queue) >= self.max_ops:
+            self._flush_soon()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush_soon)
+
+    def _flush_soon(self):
+        self._timer = None
+        task = asyncio.create_task(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self, until=None):
+        """Write everything queued (or just up to write `until`, if it is not already written)."""
+        async with self._lock:
+            if until is not None and self._written >= until:
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            while self._queue:
+                batch = [op for _, op, _ in list(self._queue)[:self.max_ops]]
+                try:
+                    consumed, rejected = await self._write(batch)
+                except Exception as e:
+                    logger.error("Bulk write failed, keeping writes queued",
+                                 extra={"queued": len(self._queue), "error": str(e)})
+                    break
+                for i in range(consumed):
+                    seq, _, critical = self._queue.popleft()
+                    if i == rejected and critical:
+                        self._rejected.add(seq)
+                    self._written = seq
+                if until is not None and self._written >= until:
+                    break
+            if self._queue and self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush_soon)
+
+    async def _write(self, batch):
+        """Send one ordered batch; returns how many of its writes were consumed and the index rejected, if any."""
+        from pymongo.errors import BulkWriteError
+
+        try:
+            await asyncio.to_thread(self.collection.bulk_write, batch, ordered=True)
+        except BulkWriteError as e:
+            # Ordered: everything before the failed write was applied, nothing after it
+            error = e.details["writeErrors"][0]
+            logger.error("Dropping write rejected by Mongo",
+                         extra={"index": error["index"], "error": error.get("errmsg")})
+            metrics.MONGO_BULK_WRITE_SIZE.observe(error["index"])
+            return error["index"] + 1, error["index"]
+        metrics.MONGO_BULK_WRITE_SIZE.observe(len(batch))
+        return len(batch), None
+
+    def snapshot(self):
+        return {"queued": len(self._queue), "written": self._written}